@@ -0,0 +1,295 @@
+import threading
+import time
+import wave
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+import numpy as np
+
+
+def sounddevice_input_stream(**kwargs):
+    """
+    Open a real PortAudio input stream.
+
+    sounddevice is imported lazily so the rest of the audio package can be used with the
+    fake backend on machines without PortAudio.
+    """
+    import sounddevice as sd
+
+    return sd.InputStream(**kwargs)
+
+
+def sounddevice_output_stream(**kwargs):
+    """Open a real PortAudio output stream. See sounddevice_input_stream."""
+    import sounddevice as sd
+
+    return sd.OutputStream(**kwargs)
+
+
+class AudioTransport(ABC):
+    """
+    Where a session's audio comes from and where its responses go.
+
+    CaptureService and PlaybackEngine only need a stream factory with the signature of
+    sounddevice.InputStream or sounddevice.OutputStream: the stream calls `callback` with
+    each block and offers start(), stop(), abort(), close() and `active`. A transport
+    supplies the pair, so the sound card can be swapped for a remote client without the
+    session noticing.
+    """
+
+    @abstractmethod
+    def input_stream(self, **kwargs):
+        """Open the stream that delivers microphone blocks to `callback`."""
+
+    @abstractmethod
+    def output_stream(self, **kwargs):
+        """Open the stream that pulls speaker blocks from `callback`."""
+
+
+class SoundDeviceTransport(AudioTransport):
+    """The local sound card through PortAudio."""
+
+    def input_stream(self, **kwargs):
+        return sounddevice_input_stream(**kwargs)
+
+    def output_stream(self, **kwargs):
+        return sounddevice_output_stream(**kwargs)
+
+
+def load_wav(path: str) -> tuple:
+    """
+    Read a mono 16-bit PCM WAV file.
+
+    Args:
+        path: Path to the WAV file.
+
+    Returns:
+        tuple: (float32 samples in [-1.0, 1.0], sample rate)
+    """
+    with wave.open(path, "rb") as wav_file:
+        if wav_file.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        frames = wav_file.readframes(wav_file.getnframes())
+        channels = wav_file.getnchannels()
+        samplerate = wav_file.getframerate()
+
+    samples = np.frombuffer(frames, dtype="<i2")
+    if channels > 1:
+        samples = samples.reshape(-1, channels)[:, 0]
+    return samples.astype(np.float32) / 32768.0, samplerate
+
+
+def save_wav(path: str, samples: np.ndarray, samplerate: int = 24000) -> None:
+    """
+    Write mono float32 or int16 samples as a 16-bit PCM WAV file.
+
+    Args:
+        path: Destination path.
+        samples: Audio samples.
+        samplerate: Sample rate of the audio.
+    """
+    if samples.dtype != np.int16:
+        samples = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(samplerate)
+        wav_file.writeframes(samples.astype("<i2").tobytes())
+
+
+class FakeInputStream:
+    """
+    Stand-in for sounddevice.InputStream that plays a numpy array into the callback.
+
+    Blocks are delivered from a background thread, like PortAudio does, either paced in
+    real time or as fast as possible. Once the source audio is exhausted the stream keeps
+    delivering silence until it is stopped.
+    """
+
+    def __init__(
+        self,
+        audio: np.ndarray,
+        samplerate: int = 24000,
+        blocksize: int = 1024,
+        channels: int = 1,
+        dtype=np.float32,
+        callback: Optional[Callable] = None,
+        device=None,
+        realtime: bool = True,
+        loop_audio: bool = False,
+    ):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.channels = channels
+        self.dtype = dtype
+        self.device = device
+        self._callback = callback
+        self._audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        self._realtime = realtime
+        self._loop_audio = loop_audio
+        self._position = 0
+        self._thread = None
+        self._running = threading.Event()
+        self.closed = False
+        self.blocks_delivered = 0
+
+    @property
+    def active(self) -> bool:
+        return self._running.is_set()
+
+    def feed(self, audio: np.ndarray) -> None:
+        """Replace the remaining source audio, e.g. to script the next turn of a test."""
+        self._audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        self._position = 0
+
+    def start(self) -> None:
+        if self.closed:
+            raise RuntimeError("Stream is closed")
+        if self.active:
+            return
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running.clear()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+        self._thread = None
+
+    def abort(self) -> None:
+        self.stop()
+
+    def close(self) -> None:
+        self.stop()
+        self.closed = True
+
+    def _next_block(self, out: np.ndarray) -> None:
+        out.fill(0)
+        remaining = self._audio.shape[0] - self._position
+        if remaining <= 0 and self._loop_audio and self._audio.shape[0]:
+            self._position = 0
+            remaining = self._audio.shape[0]
+        count = min(self.blocksize, max(remaining, 0))
+        if count:
+            out[:count, 0] = self._audio[self._position:self._position + count]
+            self._position += count
+
+    def _run(self) -> None:
+        block = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+        period = self.blocksize / self.samplerate
+        next_deadline = time.monotonic()
+        while self._running.is_set():
+            self._next_block(block)
+            if self._callback:
+                self._callback(block, self.blocksize, None, None)
+            self.blocks_delivered += 1
+            if self._realtime:
+                next_deadline += period
+                delay = next_deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                # Yield so the consumer can keep up
+                time.sleep(0)
+
+
+def fake_input_stream_factory(audio: np.ndarray, **options) -> Callable:
+    """
+    Build a stream factory for CaptureService that plays `audio` instead of a microphone.
+
+    Args:
+        audio: float32 samples to deliver.
+        **options: Extra FakeInputStream options (realtime, loop_audio).
+
+    Returns:
+        Callable: Factory with the same signature as sounddevice.InputStream.
+    """
+    def factory(**kwargs):
+        kwargs.update(options)
+        return FakeInputStream(audio, **kwargs)
+
+    return factory
+
+
+class FakeOutputStream:
+    """
+    Stand-in for sounddevice.OutputStream that pulls audio from the callback on a
+    background thread, paced in real time or as fast as possible, and keeps what was played.
+    """
+
+    def __init__(
+        self,
+        samplerate: int = 24000,
+        blocksize: int = 480,
+        channels: int = 1,
+        dtype=np.int16,
+        callback: Optional[Callable] = None,
+        device=None,
+        realtime: bool = True,
+        keep_audio: bool = True,
+    ):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.channels = channels
+        self.dtype = dtype
+        self.device = device
+        self.latency = 0.0
+        self._callback = callback
+        self._realtime = realtime
+        self._keep_audio = keep_audio
+        self._played = []
+        self._thread = None
+        self._running = threading.Event()
+        self.closed = False
+        self.blocks_pulled = 0
+
+    @property
+    def active(self) -> bool:
+        return self._running.is_set()
+
+    def played_audio(self) -> np.ndarray:
+        """Everything the callback produced so far, including silence."""
+        if not self._played:
+            return np.zeros(0, dtype=self.dtype)
+        return np.concatenate(self._played)
+
+    def start(self) -> None:
+        if self.closed:
+            raise RuntimeError("Stream is closed")
+        if self.active:
+            return
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running.clear()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+        self._thread = None
+
+    def abort(self) -> None:
+        self.stop()
+
+    def close(self) -> None:
+        self.stop()
+        self.closed = True
+
+    def _run(self) -> None:
+        period = self.blocksize / self.samplerate
+        next_deadline = time.monotonic()
+        while self._running.is_set():
+            block = np.zeros((self.blocksize, self.channels), dtype=self.dtype)
+            if self._callback:
+                self._callback(block, self.blocksize, None, None)
+            if self._keep_audio:
+                self._played.append(block[:, 0].copy())
+            self.blocks_pulled += 1
+            if self._realtime:
+                next_deadline += period
+                delay = next_deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                time.sleep(0)
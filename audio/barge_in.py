@@ -0,0 +1,160 @@
+import time
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+from audio.ring_buffer import AudioRingBuffer
+from audio.vad import EnergyZcrVAD
+
+
+class BargeInDetector:
+    """
+    Detects the user starting to talk while the bot's TTS is playing.
+
+    The microphone also hears the bot through the speaker, so a plain VAD would trigger on
+    the bot's own voice. Every block written to the speaker is passed to note_playback(),
+    which keeps a short history of playback energy. A microphone block only counts towards
+    barge-in when the VAD calls it speech *and* it is louder than the expected echo, i.e.
+    the recent playback level plus the measured speaker-to-microphone coupling. The coupling
+    is learned while the bot is talking alone, so it adapts to the kiosk's volume and room.
+    """
+
+    def __init__(
+        self,
+        samplerate: int = 24000,
+        vad: Optional[EnergyZcrVAD] = None,
+        min_speech_duration: float = 0.2,
+        echo_window: float = 0.5,
+        echo_margin_db: float = 6.0,
+        initial_coupling_db: float = -10.0,
+        coupling_adapt_rate: float = 0.1,
+        coupling_attack_rate: float = 0.5,
+        preroll_duration: float = 1.0,
+    ):
+        """
+        Args:
+            samplerate: Sample rate of both the microphone and playback audio.
+            vad: EnergyZcrVAD used on the microphone signal; its noise floor also gates
+                coupling updates.
+            min_speech_duration: Seconds of echo-free speech needed to trigger.
+            echo_window: Seconds of playback history used for the echo estimate; covers
+                output latency and room reverberation.
+            echo_margin_db: How far above the expected echo the microphone must be.
+            initial_coupling_db: Starting estimate of microphone level relative to playback.
+            coupling_adapt_rate: EMA weight for lowering the coupling from echo-only blocks.
+            coupling_attack_rate: EMA weight for raising it when the echo is louder than expected.
+            preroll_duration: Seconds of microphone audio kept so the next turn includes the
+                words that caused the barge-in.
+        """
+        self.samplerate = samplerate
+        self.vad = vad or EnergyZcrVAD(samplerate=samplerate)
+        self.min_speech_duration = min_speech_duration
+        self.echo_window = echo_window
+        self.echo_margin_db = echo_margin_db
+        self.coupling_db = initial_coupling_db
+        self.coupling_adapt_rate = coupling_adapt_rate
+        self.coupling_attack_rate = coupling_attack_rate
+        self._playback = deque()
+        self._preroll = AudioRingBuffer(max(int(preroll_duration * samplerate), 1))
+        self._speech_time = 0.0
+        self.triggered = False
+        self.triggers = 0
+
+    def reset(self) -> None:
+        """Start monitoring a new response. The learned coupling is kept."""
+        self.vad.reset()
+        self._playback.clear()
+        self._preroll.clear()
+        self._speech_time = 0.0
+        self.triggered = False
+
+    @staticmethod
+    def level_db(samples: np.ndarray) -> float:
+        """RMS level in dBFS of float32 or int16 samples."""
+        if samples.size == 0:
+            return -120.0
+        if samples.dtype == np.int16:
+            samples = samples.astype(np.float32) / 32768.0
+        energy = float(np.dot(samples.reshape(-1), samples.reshape(-1))) / samples.size
+        return 10.0 * np.log10(energy + 1e-12)
+
+    def note_playback(self, frames: np.ndarray, now: Optional[float] = None) -> None:
+        """
+        Record audio sent to the speaker.
+
+        Args:
+            frames: int16 or float32 playback samples.
+            now: time.monotonic() at which the frames play, defaults to now.
+        """
+        now = time.monotonic() if now is None else now
+        self._playback.append((now, self.level_db(frames)))
+        self._prune(now)
+
+    def expected_echo_db(self, now: Optional[float] = None) -> Optional[float]:
+        """Loudest recent playback level plus coupling, or None if nothing is playing."""
+        now = time.monotonic() if now is None else now
+        self._prune(now)
+        # Playback may be queued ahead of time; only audio that has started playing counts
+        levels = [level for played_at, level in self._playback if played_at <= now]
+        if not levels:
+            return None
+        return max(levels) + self.coupling_db
+
+    def process(self, block: np.ndarray, now: Optional[float] = None) -> bool:
+        """
+        Feed one microphone block.
+
+        Args:
+            block: 1-D float32 microphone samples.
+            now: Timestamp, defaults to time.monotonic().
+
+        Returns:
+            bool: True once the user has barged in.
+        """
+        self._preroll.write(block)
+        if self.triggered:
+            return True
+
+        decision = self.vad.process(block)
+        mic_db = self.level_db(block)
+        echo_db = self.expected_echo_db(now)
+
+        duration = block.shape[0] / self.samplerate
+        above_echo = echo_db is None or mic_db > echo_db + self.echo_margin_db
+        if decision.is_speech and above_echo:
+            self._speech_time += duration
+        else:
+            noise_db = self.vad.noise_db
+            if (
+                self._speech_time == 0.0
+                and echo_db is not None
+                and noise_db is not None
+                and mic_db > noise_db + self.echo_margin_db
+            ):
+                # Most likely the bot alone and clearly above room noise; learn how loud it
+                # is at the microphone. Track the loud end of the echo (fast attack, slow
+                # release) so peaks of the bot's speech don't look like the user
+                residual = mic_db - (echo_db - self.coupling_db)
+                rate = self.coupling_attack_rate if residual > self.coupling_db else self.coupling_adapt_rate
+                self.coupling_db += rate * (residual - self.coupling_db)
+            # Leak instead of resetting so short gaps between syllables don't restart the count
+            self._speech_time = max(self._speech_time - 0.5 * duration, 0.0)
+
+        if self._speech_time >= self.min_speech_duration:
+            self.triggered = True
+            self.triggers += 1
+        return self.triggered
+
+    def preroll(self) -> np.ndarray:
+        """
+        Return the most recent microphone audio as float32, oldest first.
+
+        Returns:
+            np.ndarray: float32 samples in [-1.0, 1.0].
+        """
+        return self._preroll.view().astype(np.float32) / 32767.0
+
+    def _prune(self, now: float) -> None:
+        while self._playback and now - self._playback[0][0] > self.echo_window:
+            self._playback.popleft()
@@ -0,0 +1,194 @@
+import asyncio
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+from audio.backends import sounddevice_input_stream
+
+
+class CaptureService:
+    """
+    Keeps one microphone input stream open for the whole conversation.
+
+    The PortAudio callback copies each block into a preallocated single-producer,
+    single-consumer slot queue. No locks are taken on the audio thread: the producer
+    only advances `_tail` and the consumer only advances `_head`, and both are plain
+    integer assignments. The asyncio side is woken with `call_soon_threadsafe` only
+    when it is actually waiting for audio.
+    """
+
+    def __init__(
+        self,
+        samplerate: int = 24000,
+        block_size: int = 1024,
+        device: Optional[int] = None,
+        stream_factory: Optional[Callable] = None,
+        queue_blocks: int = 256,
+    ):
+        """
+        Args:
+            samplerate: Sample rate of the input stream.
+            block_size: Samples per callback block.
+            device: Input device index. None uses the system default input.
+            stream_factory: Callable with the signature of sounddevice.InputStream. Pass
+                fake_input_stream_factory(...) to run without hardware.
+            queue_blocks: Number of blocks the queue can hold before new blocks are dropped
+                (256 blocks is ~11 seconds at 24 kHz).
+        """
+        self.samplerate = samplerate
+        self.block_size = block_size
+        self.device = device
+        self._stream_factory = stream_factory or sounddevice_input_stream
+        self._stream = None
+
+        self._slots = np.zeros((queue_blocks, block_size), dtype=np.float32)
+        self._out = np.zeros(block_size, dtype=np.float32)
+        self._head = 0
+        self._tail = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._data_ready: Optional[asyncio.Event] = None
+        self._waiting = False
+
+        self.overruns = 0
+        self.input_overflows = 0
+        self.blocks_captured = 0
+
+    @property
+    def active(self) -> bool:
+        return self._stream is not None and self._stream.active
+
+    @property
+    def pending(self) -> int:
+        """Number of blocks waiting to be read."""
+        return self._tail - self._head
+
+    @property
+    def block_duration(self) -> float:
+        return self.block_size / self.samplerate
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """
+        Open and start the input stream. Safe to call more than once.
+
+        Args:
+            loop: Event loop that consumes the audio. Defaults to the running loop.
+        """
+        if self.active:
+            return
+
+        self._loop = loop or asyncio.get_running_loop()
+        self._data_ready = asyncio.Event()
+
+        self._stream = self._stream_factory(
+            samplerate=self.samplerate,
+            device=self.device,
+            channels=1,
+            dtype=np.float32,
+            blocksize=self.block_size,
+            callback=self._callback,
+        )
+        self._stream.start()
+
+    def close(self) -> None:
+        """Stop and close the input stream and wake up any pending reader."""
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            try:
+                if stream.active:
+                    stream.stop()
+            finally:
+                stream.close()
+        self._wake_reader()
+
+    def drain(self) -> int:
+        """
+        Discard blocks that were queued before the caller was interested in them,
+        e.g. audio captured while the bot was speaking.
+
+        Returns:
+            int: Number of blocks discarded.
+        """
+        dropped = self._tail - self._head
+        self._head = self._tail
+        return dropped
+
+    def read_nowait(self) -> Optional[np.ndarray]:
+        """
+        Return the next queued block, or None if the queue is empty.
+
+        The returned array is reused by the next read, so copy it if it must be kept.
+        """
+        if self._head == self._tail:
+            return None
+        slot = self._head % self._slots.shape[0]
+        self._out[:] = self._slots[slot]
+        self._head += 1
+        return self._out
+
+    async def read_block(self, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        Wait for the next block without blocking the event loop.
+
+        Args:
+            timeout: Seconds to wait before giving up.
+
+        Returns:
+            np.ndarray or None: A float32 block (reused by the next read), or None on
+            timeout or when the service is closed.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            block = self.read_nowait()
+            if block is not None:
+                return block
+            if self._stream is None:
+                return None
+
+            self._data_ready.clear()
+            self._waiting = True
+            try:
+                # Re-check after publishing `_waiting` so a block that landed in between
+                # is not missed
+                if self._head != self._tail:
+                    continue
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                try:
+                    await asyncio.wait_for(self._data_ready.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return None
+            finally:
+                self._waiting = False
+
+    def _callback(self, indata, frames, time_info, status) -> None:
+        """PortAudio callback, runs on the audio thread."""
+        if status and getattr(status, "input_overflow", False):
+            self.input_overflows += 1
+
+        if self._tail - self._head >= self._slots.shape[0]:
+            # Consumer is behind; drop the newest block rather than touching `_head`
+            self.overruns += 1
+            return
+
+        slot = self._slots[self._tail % self._slots.shape[0]]
+        count = min(frames, self.block_size)
+        slot[:count] = indata[:count, 0]
+        if count < self.block_size:
+            slot[count:] = 0
+        self._tail += 1
+        self.blocks_captured += 1
+
+        if self._waiting:
+            self._wake_reader()
+
+    def _wake_reader(self) -> None:
+        if self._loop is None or self._data_ready is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._data_ready.set)
+        except RuntimeError:
+            # Event loop already closed
+            pass
@@ -0,0 +1,270 @@
+import asyncio
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+from audio.backends import sounddevice_output_stream
+
+
+class PlaybackEngine:
+    """
+    Long-lived output stream fed from a bounded jitter buffer.
+
+    The asyncio side appends TTS frames with `await write(...)`, which returns as soon as
+    the frames are queued, and the PortAudio callback drains the buffer on the audio
+    thread. Like CaptureService, the buffer is a single-producer/single-consumer ring: the
+    writer only advances `_written` and the callback only advances `_played`, so no locks
+    are taken on the audio thread.
+    """
+
+    def __init__(
+        self,
+        samplerate: int = 24000,
+        block_size: int = 480,
+        buffer_seconds: float = 4.0,
+        stream_factory: Optional[Callable] = None,
+    ):
+        """
+        Args:
+            samplerate: Sample rate of the TTS audio.
+            block_size: Frames per output callback (480 is 20 ms at 24 kHz).
+            buffer_seconds: Capacity of the jitter buffer. Writers wait when it is full.
+            stream_factory: Callable with the signature of sounddevice.OutputStream. Pass
+                FakeOutputStream to run without hardware.
+        """
+        self.samplerate = samplerate
+        self.block_size = block_size
+        self.capacity = int(buffer_seconds * samplerate)
+        self._stream_factory = stream_factory or sounddevice_output_stream
+        self._stream = None
+        self._buffer = np.zeros(self.capacity, dtype=np.int16)
+        self._written = 0
+        self._played = 0
+        self._flush_to = 0
+        self._in_response = False
+        self._muted = False
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._progress: Optional[asyncio.Event] = None
+        self._waiting = False
+
+        self.underruns = 0
+        self.overruns = 0
+        self.backpressure_waits = 0
+        self.frames_written = 0
+        self.frames_dropped_muted = 0
+        self.frames_flushed = 0
+        self.max_queued = 0
+        self._latency_total = 0.0
+        self._latency_count = 0
+        self._latency_max = 0.0
+
+    @property
+    def active(self) -> bool:
+        return self._stream is not None and self._stream.active
+
+    @property
+    def queued(self) -> int:
+        """Frames waiting to be played."""
+        return self._written - max(self._played, self._flush_to)
+
+    @property
+    def queued_seconds(self) -> float:
+        return self.queued / self.samplerate
+
+    @property
+    def muted(self) -> bool:
+        return self._muted
+
+    @muted.setter
+    def muted(self, value: bool) -> None:
+        self._muted = value
+        if value:
+            # Go quiet now rather than after the buffered audio has played
+            self.flush()
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """
+        Open and start the output stream. Safe to call more than once.
+
+        Args:
+            loop: Event loop that writes audio. Defaults to the running loop.
+        """
+        if self.active:
+            return
+        self._loop = loop or asyncio.get_running_loop()
+        self._progress = asyncio.Event()
+        self._stream = self._stream_factory(
+            samplerate=self.samplerate,
+            channels=1,
+            dtype=np.int16,
+            blocksize=self.block_size,
+            callback=self._callback,
+        )
+        self._stream.start()
+
+    def close(self) -> None:
+        """Stop and close the output stream, dropping anything still queued."""
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            try:
+                if stream.active:
+                    stream.abort()
+            finally:
+                stream.close()
+        # The callback has stopped, so it is safe to move the read position directly
+        self.flush()
+        self._played = self._written
+        self._wake_waiter()
+
+    def flush(self) -> int:
+        """
+        Drop queued audio, e.g. when the user barges in.
+
+        Returns:
+            int: Number of frames discarded.
+        """
+        # Only the callback advances `_played`; ask it to skip ahead to what has been
+        # written so far instead of touching its position from this thread
+        dropped = self.queued
+        self._flush_to = self._written
+        self._in_response = False
+        self.frames_flushed += dropped
+        return dropped
+
+    async def write(self, frames: np.ndarray, max_wait: Optional[float] = None) -> Optional[float]:
+        """
+        Queue frames for playback without blocking the event loop.
+
+        Args:
+            frames: int16 samples.
+            max_wait: Seconds to wait for space when the buffer is full. Frames that still
+                don't fit are dropped and counted as overruns. None waits as long as needed.
+
+        Returns:
+            float or None: time.monotonic() at which the first frame is expected to play,
+            or None if the frames were dropped.
+        """
+        frames = frames.reshape(-1)
+        if self._muted or self._stream is None:
+            self.frames_dropped_muted += frames.shape[0]
+            return None
+
+        if frames.dtype != np.int16:
+            frames = (np.clip(frames, -1.0, 1.0) * 32767).astype(np.int16)
+        if frames.shape[0] > self.capacity:
+            self.overruns += 1
+            frames = frames[-self.capacity:]
+
+        if self._in_response and self.queued == 0:
+            # The buffer ran dry before the rest of the response arrived: an audible gap
+            self.underruns += 1
+        self._in_response = True
+
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        # Space is what the callback has actually read past. After a flush, frames before
+        # `_flush_to` only become free once the callback has skipped them, since it may be
+        # copying them out right now
+        while self.capacity - (self._written - self._played) < frames.shape[0]:
+            self.backpressure_waits += 1
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if (remaining is not None and remaining <= 0) or not await self._wait_progress(remaining):
+                self.overruns += 1
+                return None
+            if self._stream is None:
+                return None
+
+        play_at = time.monotonic() + self.queued_seconds + self._device_latency()
+        self._record_latency(self.queued_seconds)
+
+        count = frames.shape[0]
+        start = self._written % self.capacity
+        first = min(count, self.capacity - start)
+        self._buffer[start:start + first] = frames[:first]
+        if count > first:
+            self._buffer[:count - first] = frames[first:]
+        self._written += count
+        self.frames_written += count
+        self.max_queued = max(self.max_queued, self.queued)
+        return play_at
+
+    async def wait_drained(self) -> None:
+        """
+        Wait until everything queued so far has been handed to the device. Call this at
+        the end of a response; the next write starts a new response.
+        """
+        while self.queued > 0 and self._stream is not None:
+            await self._wait_progress(None)
+        self._in_response = False
+
+    def metrics(self) -> dict:
+        """Counters and latency figures for logging."""
+        return {
+            "queued_ms": self.queued_seconds * 1000,
+            "max_queued_ms": self.max_queued / self.samplerate * 1000,
+            "device_latency_ms": self._device_latency() * 1000,
+            "avg_queue_latency_ms": (
+                self._latency_total / self._latency_count * 1000 if self._latency_count else 0.0
+            ),
+            "max_queue_latency_ms": self._latency_max * 1000,
+            "underruns": self.underruns,
+            "overruns": self.overruns,
+            "backpressure_waits": self.backpressure_waits,
+            "frames_written": self.frames_written,
+            "frames_played": self._played,
+            "frames_dropped_muted": self.frames_dropped_muted,
+            "frames_flushed": self.frames_flushed,
+        }
+
+    def _device_latency(self) -> float:
+        latency = getattr(self._stream, "latency", 0.0) if self._stream is not None else 0.0
+        return latency if isinstance(latency, float) else 0.0
+
+    def _record_latency(self, seconds: float) -> None:
+        self._latency_total += seconds
+        self._latency_count += 1
+        self._latency_max = max(self._latency_max, seconds)
+
+    async def _wait_progress(self, timeout: Optional[float]) -> bool:
+        """Wait until the callback has consumed audio. Returns False on timeout."""
+        self._progress.clear()
+        self._waiting = True
+        try:
+            await asyncio.wait_for(self._progress.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiting = False
+
+    def _callback(self, outdata, frames, time_info, status) -> None:
+        """PortAudio callback, runs on the audio thread."""
+        out = outdata.reshape(-1)
+        if self._flush_to > self._played:
+            self._played = self._flush_to
+        available = self._written - self._played
+        count = min(frames, available)
+        if count:
+            start = self._played % self.capacity
+            first = min(count, self.capacity - start)
+            out[:first] = self._buffer[start:start + first]
+            if count > first:
+                out[first:count] = self._buffer[:count - first]
+            self._played += count
+        if count < frames:
+            out[count:] = 0
+
+        if self._waiting:
+            # Wake on every callback, not only when audio was consumed, so a waiter that
+            # started just after the last frame was played still sees the buffer is empty
+            self._wake_waiter()
+
+    def _wake_waiter(self) -> None:
+        if self._loop is None or self._progress is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._progress.set)
+        except RuntimeError:
+            # Event loop already closed
+            pass
@@ -0,0 +1,144 @@
+from typing import Optional
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    Preallocated int16 ring buffer for mono microphone audio.
+
+    Float32 blocks coming from the input stream are scaled into int16 and written
+    in place, so capturing a turn never grows a Python list and the captured audio
+    can be handed to AudioInput without another copy.
+    """
+
+    def __init__(self, capacity: int, block_size: int = 1024):
+        """
+        Args:
+            capacity: Maximum number of samples kept in the buffer.
+            block_size: Expected number of samples per write, used to size the scratch buffer.
+        """
+        if capacity <= 0:
+            raise ValueError("capacity must be greater than zero")
+
+        self.capacity = capacity
+        self._buffer = np.zeros(capacity, dtype=np.int16)
+        self._scratch = np.empty(block_size, dtype=np.float32)
+        self._write_pos = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def wrapped(self) -> bool:
+        """True once older samples have been overwritten."""
+        return self._size == self.capacity and self._write_pos != 0
+
+    def clear(self) -> None:
+        """Forget the buffered audio without releasing memory."""
+        self._write_pos = 0
+        self._size = 0
+
+    def write(self, block: np.ndarray) -> None:
+        """
+        Scale a float32 block to int16 and store it in place.
+
+        Args:
+            block: Audio samples in the range [-1.0, 1.0], any shape.
+        """
+        flat = block.reshape(-1)
+        count = flat.shape[0]
+        if count == 0:
+            return
+        if count > self.capacity:
+            flat = flat[-self.capacity:]
+            count = self.capacity
+
+        if count > self._scratch.shape[0]:
+            self._scratch = np.empty(count, dtype=np.float32)
+        scratch = self._scratch[:count]
+        np.multiply(flat, 32767, out=scratch, casting="unsafe")
+        np.clip(scratch, -32768, 32767, out=scratch)
+
+        self._store(scratch)
+
+    def write_int16(self, block: np.ndarray) -> None:
+        """
+        Store a block that is already int16 PCM.
+
+        Args:
+            block: int16 samples, any shape.
+        """
+        flat = block.reshape(-1)
+        if flat.shape[0] > self.capacity:
+            flat = flat[-self.capacity:]
+        if flat.shape[0]:
+            self._store(flat)
+
+    def write_silence(self, count: int) -> None:
+        """
+        Append `count` zero samples, used by the noise gate to keep timing intact.
+
+        Args:
+            count: Number of samples of silence to append.
+        """
+        count = min(count, self.capacity)
+        first = min(count, self.capacity - self._write_pos)
+        self._buffer[self._write_pos:self._write_pos + first] = 0
+        if count > first:
+            self._buffer[:count - first] = 0
+        self._advance(count)
+
+    def view(self) -> np.ndarray:
+        """
+        Return the buffered audio in chronological order.
+
+        While the buffer has not wrapped this is a view into the preallocated storage,
+        so it is only valid until the next write or clear.
+
+        Returns:
+            np.ndarray: int16 samples.
+        """
+        if not self.wrapped:
+            return self._buffer[:self._size]
+        return np.concatenate(
+            (self._buffer[self._write_pos:], self._buffer[:self._write_pos])
+        )
+
+    def latest(self, count: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Copy the most recent `count` samples, oldest first.
+
+        Args:
+            count: Number of samples to return (clamped to what is buffered).
+            out: Optional int16 array to copy into.
+
+        Returns:
+            np.ndarray: int16 samples.
+        """
+        count = min(count, self._size)
+        if out is None:
+            out = np.empty(count, dtype=np.int16)
+        start = (self._write_pos - count) % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self._buffer[start:start + first]
+        if count > first:
+            out[first:count] = self._buffer[:count - first]
+        return out[:count]
+
+    def _store(self, samples: np.ndarray) -> None:
+        count = samples.shape[0]
+        first = min(count, self.capacity - self._write_pos)
+        np.copyto(
+            self._buffer[self._write_pos:self._write_pos + first],
+            samples[:first],
+            casting="unsafe",
+        )
+        if count > first:
+            np.copyto(self._buffer[:count - first], samples[first:], casting="unsafe")
+        self._advance(count)
+
+    def _advance(self, count: int) -> None:
+        self._write_pos = (self._write_pos + count) % self.capacity
+        self._size = min(self._size + count, self.capacity)
@@ -0,0 +1,279 @@
+import hashlib
+import mmap
+import os
+import re
+import threading
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from agents.voice import STTModel, TTSModel, TTSModelSettings, VoiceModelProvider
+
+from observability.log import get_logger
+from prompts import SPOKEN_PHRASES
+
+logger = get_logger(__name__)
+
+# Same boundary as the SDK's sentence splitter, which decides what reaches the TTS model
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+# Line breaks end a part too: the ticket template puts its number on a line of its own
+_PART = re.compile(r"(?<=[.!?])\s+|\s*\n\s*")
+_WORD = re.compile(r"[\w']+")
+# Separators left between a template prefix and the variable part, e.g. "NUMBER: 2502..."
+_SEPARATORS = " \t\n:;,-*_`"
+
+# OpenAI TTS returns 24 kHz mono 16-bit PCM
+_BYTES_PER_SECOND = 24000 * 2
+
+
+def phrase_key(text: str) -> str:
+    """
+    Form phrases are matched on: the words of `text`, case-folded, followed by its closing
+    punctuation mark if any. Markdown and spacing from the model don't cause misses, while
+    a question and a statement with the same words are cached separately.
+    """
+    words = _WORD.findall(text.casefold())
+    end = text.rstrip(" \t\n*_`\"'")[-1:]
+    return " ".join(words) + (end if end in ".?!" else "")
+
+
+class TTSPhraseCache:
+    """
+    On-disk PCM for the sentences the agents say word for word.
+
+    Each registered phrase is synthesized once per model, voice, instructions and speed and
+    stored as raw PCM in `directory`. Files are memory-mapped on first use and played from
+    the mapping without copying, so a cached sentence starts as soon as its text arrives
+    instead of after a TTS round trip.
+
+    Phrases ending in ".", "?" or "!" are matched as whole sentences. Phrases without a
+    closing mark are template prefixes: a sentence starting with their words plays the
+    cached audio and synthesizes only the rest, e.g. the number after "Ticket number:".
+    A line break ends a sentence too, so the number on the template's own line doesn't
+    take the cached sentence after it along. Every other sentence goes to the TTS model
+    as before.
+    """
+
+    def __init__(self, directory: Optional[str] = None, phrases: Iterable[str] = ()):
+        """
+        Args:
+            directory: Where the PCM files are kept. Falls back to the TTS_CACHE_DIR
+                environment variable (default ".tts_cache").
+            phrases: Sentences to serve from the cache, see register().
+        """
+        self.directory = directory or os.getenv("TTS_CACHE_DIR", ".tts_cache")
+        self._phrases: Dict[str, str] = {}
+        self._prefixes: List[Tuple[List[str], str]] = []
+        self._maps: Dict[str, mmap.mmap] = {}
+        self._lock = threading.Lock()
+        self._sentences = 0
+        self._hits = 0
+        self._prefix_hits = 0
+        self._stored = 0
+        self._served_bytes = 0
+        self.register(phrases)
+
+    def register(self, phrases: Iterable[str]) -> None:
+        """
+        Add sentences to serve from the cache. Their audio is stored the first time they are
+        synthesized. A phrase of several sentences is registered sentence by sentence, since
+        that is how plan() sees it.
+        """
+        for sentence in (part for phrase in phrases for part in _SENTENCE.split(phrase.strip())):
+            key = phrase_key(sentence)
+            if not key or key in self._phrases:
+                continue
+            self._phrases[key] = sentence.strip()
+            if key[-1] not in ".?!":
+                self._prefixes.append((key.split(" "), key))
+        # Longest prefix wins
+        self._prefixes.sort(key=lambda prefix: len(prefix[0]), reverse=True)
+
+    def audio(self, key: str, model_name: str, settings: TTSModelSettings) -> Optional[memoryview]:
+        """The stored PCM for a phrase key, or None if it hasn't been synthesized yet."""
+        path = self._path(key, model_name, settings)
+        with self._lock:
+            mapped = self._maps.get(path)
+            if mapped is None:
+                try:
+                    with open(path, "rb") as f:
+                        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (FileNotFoundError, ValueError):
+                    # ValueError: an empty file can't be mapped
+                    return None
+                self._maps[path] = mapped
+        return memoryview(mapped)
+
+    def store(self, key: str, audio: bytes, model_name: str, settings: TTSModelSettings) -> None:
+        """Write the PCM for a phrase key. Readers see either no file or the whole file."""
+        if not audio:
+            return
+        path = self._path(key, model_name, settings)
+        os.makedirs(self.directory, exist_ok=True)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp, "wb") as f:
+            f.write(audio)
+        os.replace(temp, path)
+        self._stored += 1
+        logger.debug("TTS phrase stored", extra={"phrase": self._phrases.get(key, key), "bytes": len(audio)})
+
+    def plan(self, text: str, model_name: str, settings: TTSModelSettings) -> List[Tuple[str, Any]]:
+        """
+        Split a TTS request into the parts to play, in order.
+
+        Returns:
+            list: ("audio", memoryview) parts served from disk, ("store", text) parts that
+            are registered phrases to synthesize and keep, and ("tts", text) parts to
+            synthesize. Adjacent "tts" parts are joined into one request.
+        """
+        parts: List[Tuple[str, Any]] = []
+        for sentence in _PART.split(text.strip()):
+            if not sentence:
+                continue
+            self._sentences += 1
+            key = phrase_key(sentence)
+            if key in self._phrases:
+                audio = self.audio(key, model_name, settings)
+                if audio is None:
+                    parts.append(("store", sentence))
+                else:
+                    self._hits += 1
+                    self._served_bytes += len(audio)
+                    parts.append(("audio", audio))
+                continue
+
+            prefix = self._match_prefix(sentence, model_name, settings)
+            if prefix is not None:
+                audio, sentence = prefix
+                self._prefix_hits += 1
+                self._served_bytes += len(audio)
+                parts.append(("audio", audio))
+            if parts and parts[-1][0] == "tts":
+                parts[-1] = ("tts", f"{parts[-1][1]} {sentence}")
+            else:
+                parts.append(("tts", sentence))
+        return parts
+
+    async def warm(self, model: TTSModel, settings: TTSModelSettings) -> int:
+        """
+        Synthesize the registered phrases that aren't stored yet, one at a time.
+
+        Returns:
+            int: The number of phrases stored.
+        """
+        stored = 0
+        for key, text in list(self._phrases.items()):
+            if self.audio(key, model.model_name, settings) is not None:
+                continue
+            try:
+                audio = b"".join([bytes(chunk) async for chunk in model.run(text, settings)])
+            except Exception as e:
+                logger.warning("TTS phrase cache warm-up failed: %s", e)
+                break
+            self.store(key, audio, model.model_name, settings)
+            stored += 1
+        if stored:
+            logger.info("TTS phrase cache warmed", extra={"stored": stored})
+        return stored
+
+    def metrics(self) -> Dict[str, Any]:
+        served = self._hits + self._prefix_hits
+        return {
+            "phrases": len(self._phrases),
+            "sentences": self._sentences,
+            "hits": self._hits,
+            "prefix_hits": self._prefix_hits,
+            "hit_rate": round(served / self._sentences, 3) if self._sentences else None,
+            "stored": self._stored,
+            "served_seconds": round(self._served_bytes / _BYTES_PER_SECOND, 1),
+        }
+
+    def close(self) -> None:
+        """Unmap the cached files. Mappings still being played are left to the garbage collector."""
+        with self._lock:
+            maps, self._maps = self._maps, {}
+        for mapped in maps.values():
+            try:
+                mapped.close()
+            except BufferError:
+                pass
+
+    def _match_prefix(self, sentence: str, model_name: str,
+                      settings: TTSModelSettings) -> Optional[Tuple[memoryview, str]]:
+        if not self._prefixes:
+            return None
+        words = list(_WORD.finditer(sentence))
+        folded = [word.group().casefold() for word in words]
+        for prefix, key in self._prefixes:
+            # The variable part must not be empty
+            if len(prefix) >= len(words) or folded[:len(prefix)] != prefix:
+                continue
+            audio = self.audio(key, model_name, settings)
+            if audio is None:
+                continue
+            rest = sentence[words[len(prefix) - 1].end():].lstrip(_SEPARATORS)
+            if rest:
+                return audio, rest
+        return None
+
+    def _path(self, key: str, model_name: str, settings: TTSModelSettings) -> str:
+        identity = "\0".join([model_name, str(settings.voice), settings.instructions or "",
+                              str(settings.speed), key])
+        return os.path.join(self.directory, hashlib.sha256(identity.encode()).hexdigest()[:32] + ".pcm")
+
+
+class CachingTTSModel(TTSModel):
+    """TTS model that plays cached phrases from a TTSPhraseCache and synthesizes the rest with `model`."""
+
+    def __init__(self, model: TTSModel, cache: TTSPhraseCache):
+        self.model = model
+        self.cache = cache
+
+    @property
+    def model_name(self) -> str:
+        return self.model.model_name
+
+    async def run(self, text: str, settings: TTSModelSettings) -> AsyncIterator[bytes]:
+        for kind, value in self.cache.plan(text, self.model_name, settings):
+            if kind == "audio":
+                # A view of the mapped file; the pipeline copies it once when converting
+                yield value
+                continue
+            audio = bytearray() if kind == "store" else None
+            async for chunk in self.model.run(value, settings):
+                if audio is not None:
+                    audio += chunk
+                yield chunk
+            # Only reached if the sentence was played to the end, not cut off by a barge-in
+            if audio:
+                self.cache.store(phrase_key(value), bytes(audio), self.model_name, settings)
+
+    async def warm(self, settings: TTSModelSettings) -> int:
+        """Synthesize the cache's missing phrases with the wrapped model, see TTSPhraseCache.warm."""
+        return await self.cache.warm(self.model, settings)
+
+
+class CachingVoiceModelProvider(VoiceModelProvider):
+    """Wraps a VoiceModelProvider so its TTS models go through a TTSPhraseCache."""
+
+    def __init__(self, provider: VoiceModelProvider, cache: TTSPhraseCache):
+        self.provider = provider
+        self.cache = cache
+
+    def get_stt_model(self, model_name: Optional[str]) -> STTModel:
+        return self.provider.get_stt_model(model_name)
+
+    def get_tts_model(self, model_name: Optional[str]) -> CachingTTSModel:
+        return CachingTTSModel(self.provider.get_tts_model(model_name), self.cache)
+
+
+_cache: Optional[TTSPhraseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache() -> TTSPhraseCache:
+    """Return the process-wide TTSPhraseCache with the agents' SPOKEN_PHRASES registered."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TTSPhraseCache(phrases=SPOKEN_PHRASES)
+    return _cache
@@ -0,0 +1,309 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+
+@dataclass
+class VadDecision:
+    """Result of feeding one capture block to a voice activity detector."""
+
+    is_speech: bool
+    """Whether the block contained speech."""
+
+    endpoint: bool
+    """True once speech was heard and the following silence exceeded the endpoint timeout."""
+
+    level: float
+    """Mean absolute level of the block, for display."""
+
+    keep_audio: bool = True
+    """False if the block should not be part of the utterance at all (e.g. calibration)."""
+
+    gated: bool = False
+    """True if the block should be replaced by silence to keep timing intact."""
+
+
+class VoiceActivityDetector(ABC):
+    """
+    Interface for end-of-utterance detection in capture_audio_until_silence.
+
+    A detector is fed every capture block of a turn in order and decides whether the
+    user is speaking and when the utterance has ended. Call reset() before each turn.
+    """
+
+    def __init__(self, samplerate: int = 24000):
+        self.samplerate = samplerate
+        self.speech_detected = False
+
+    def reset(self) -> None:
+        """Forget per-turn state before a new utterance."""
+        self.speech_detected = False
+
+    @abstractmethod
+    def process(self, block: np.ndarray) -> VadDecision:
+        """
+        Classify one block of float32 audio.
+
+        Args:
+            block: 1-D float32 samples in [-1.0, 1.0].
+
+        Returns:
+            VadDecision: Decision for the block.
+        """
+
+
+class LevelThresholdVAD(VoiceActivityDetector):
+    """
+    The original detector: mean-abs level per block against thresholds calibrated from the
+    first blocks of each turn, ending after `silence_duration` seconds of silence.
+    """
+
+    def __init__(
+        self,
+        samplerate: int = 24000,
+        block_size: int = 1024,
+        silence_duration: float = 1.0,
+        silence_threshold: float = 0.01,
+        speech_threshold: float = 0.02,
+        calibration_frames: int = 10,
+    ):
+        super().__init__(samplerate)
+        self.block_size = block_size
+        self.silence_duration = silence_duration
+        self.base_silence_threshold = silence_threshold
+        self.base_speech_threshold = speech_threshold
+        self.calibration_frames = calibration_frames
+        self.reset()
+
+    def reset(self) -> None:
+        super().reset()
+        self.silence_threshold = self.base_silence_threshold
+        self.speech_threshold = self.base_speech_threshold
+        self.noise_floor = None
+        self._calibration_levels = []
+        self._silence_counter = 0
+        self._blocks_per_silence = int(self.samplerate * self.silence_duration / self.block_size)
+
+    def process(self, block: np.ndarray) -> VadDecision:
+        audio_level = float(np.abs(block).mean())
+
+        # Calibrate noise floor during first few blocks
+        if len(self._calibration_levels) < self.calibration_frames:
+            self._calibration_levels.append(audio_level)
+            if len(self._calibration_levels) == self.calibration_frames:
+                # Noise floor is the average of calibration blocks plus a small margin
+                self.noise_floor = float(np.mean(self._calibration_levels)) * 1.5
+                self.silence_threshold = max(self.silence_threshold, self.noise_floor * 1.2)
+                self.speech_threshold = max(self.speech_threshold, self.noise_floor * 2.5)
+            return VadDecision(is_speech=False, endpoint=False, level=audio_level, keep_audio=False)
+
+        is_speech = False
+        if audio_level < self.silence_threshold:
+            self._silence_counter += 1
+        else:
+            self._silence_counter = 0
+            # Only count as speech if we're well above the noise floor
+            if audio_level > self.speech_threshold:
+                is_speech = True
+                self.speech_detected = True
+
+        return VadDecision(
+            is_speech=is_speech,
+            endpoint=self.speech_detected and self._silence_counter >= self._blocks_per_silence,
+            level=audio_level,
+            gated=audio_level <= self.noise_floor,
+        )
+
+
+class EnergyZcrVAD(VoiceActivityDetector):
+    """
+    Frame-level detector using log energy against an adaptive noise floor plus zero-crossing rate.
+
+    Each block is split into short frames (10 ms by default) and all frames are scored with
+    vectorized numpy operations. A frame counts as speech when its energy is `margin_db` above
+    the tracked noise floor and its zero-crossing rate looks voiced, or when it is loud enough
+    that ZCR no longer matters (fricatives, plosives). Speech starts after `onset_frames`
+    consecutive speech frames, and the utterance ends once `endpoint_timeout` seconds of
+    non-speech follow, which acts as hangover so pauses between words are not cut.
+    """
+
+    def __init__(
+        self,
+        samplerate: int = 24000,
+        frame_duration: float = 0.01,
+        endpoint_timeout: float = 0.3,
+        margin_db: float = 9.0,
+        loud_margin_db: float = 18.0,
+        max_voiced_zcr: float = 0.25,
+        onset_frames: int = 3,
+        min_speech_duration: float = 0.12,
+        noise_adapt_rate: float = 0.05,
+        init_frames: int = 10,
+        min_noise_db: float = -75.0,
+    ):
+        """
+        Args:
+            samplerate: Sample rate of the audio.
+            frame_duration: Analysis frame length in seconds.
+            endpoint_timeout: Seconds of non-speech after speech that end the utterance.
+            margin_db: Energy above the noise floor needed for a voiced frame.
+            loud_margin_db: Energy above the noise floor that counts as speech regardless of ZCR.
+            max_voiced_zcr: Highest zero-crossings-per-sample ratio treated as voiced.
+            onset_frames: Consecutive speech frames needed before speech is declared.
+            min_speech_duration: Total speech (seconds) needed before an endpoint is allowed.
+            noise_adapt_rate: EMA weight used to track the noise floor on non-speech frames.
+            init_frames: Frames used to seed the noise floor at the start of a turn.
+            min_noise_db: Lower bound for the noise floor, so digital silence doesn't make
+                every small click look like speech.
+        """
+        super().__init__(samplerate)
+        self.frame_size = max(int(samplerate * frame_duration), 1)
+        self.endpoint_timeout = endpoint_timeout
+        self.margin_db = margin_db
+        self.loud_margin_db = loud_margin_db
+        self.max_voiced_zcr = max_voiced_zcr
+        self.onset_frames = onset_frames
+        self.noise_adapt_rate = noise_adapt_rate
+        self.init_frames = init_frames
+        self.min_noise_db = min_noise_db
+        self._endpoint_frames = max(int(round(endpoint_timeout / frame_duration)), 1)
+        self._min_speech_frames = max(int(round(min_speech_duration / frame_duration)), 1)
+        self._carry = np.empty(0, dtype=np.float32)
+        self.noise_db: Optional[float] = None
+        self.reset()
+
+    def reset(self, keep_noise_floor: bool = True) -> None:
+        """
+        Args:
+            keep_noise_floor: Keep the noise estimate from the previous turn, which skips
+                re-seeding when the capture stream is continuous.
+        """
+        super().reset()
+        self._carry = np.empty(0, dtype=np.float32)
+        self._speech_run = 0
+        self._silence_run = 0
+        self._speech_frames = 0
+        self._seed_energies = []
+        if not keep_noise_floor:
+            self.noise_db = None
+
+    @property
+    def endpoint_frames(self) -> int:
+        return self._endpoint_frames
+
+    def frame_features(self, samples: np.ndarray) -> tuple:
+        """
+        Compute per-frame log energy (dBFS) and zero-crossing rate for whole frames.
+
+        Args:
+            samples: 1-D float32 samples whose length is a multiple of frame_size.
+
+        Returns:
+            tuple: (energy_db, zcr) arrays, one value per frame.
+        """
+        frames = samples.reshape(-1, self.frame_size)
+        energy = np.einsum("ij,ij->i", frames, frames) / self.frame_size
+        energy_db = 10.0 * np.log10(energy + 1e-12)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / self.frame_size
+        return energy_db, zcr
+
+    def process(self, block: np.ndarray) -> VadDecision:
+        block = block.reshape(-1)
+        level = float(np.abs(block).mean()) if block.size else 0.0
+
+        if self._carry.size:
+            samples = np.concatenate((self._carry, block))
+        else:
+            samples = block
+        whole = (samples.shape[0] // self.frame_size) * self.frame_size
+        self._carry = samples[whole:].astype(np.float32, copy=True)
+        if whole == 0:
+            return VadDecision(is_speech=False, endpoint=self._is_endpoint(), level=level)
+
+        energy_db, zcr = self.frame_features(samples[:whole])
+
+        # Seed the noise floor from the quietest frames at the start of the first turn
+        if self.noise_db is None:
+            self._seed_energies.extend(energy_db.tolist())
+            if len(self._seed_energies) < self.init_frames:
+                return VadDecision(is_speech=False, endpoint=False, level=level)
+            self.noise_db = max(
+                float(np.percentile(self._seed_energies, 20)), self.min_noise_db
+            )
+
+        above = energy_db - self.noise_db
+        speech = ((above > self.margin_db) & (zcr < self.max_voiced_zcr)) | (
+            above > self.loud_margin_db
+        )
+
+        # Track the noise floor on non-speech frames only; rise slowly, fall fast
+        quiet = energy_db[~speech]
+        if quiet.size:
+            target = float(quiet.mean())
+            rate = self.noise_adapt_rate if target > self.noise_db else 0.5
+            weight = 1.0 - (1.0 - rate) ** quiet.size
+            self.noise_db = max(self.noise_db + weight * (target - self.noise_db), self.min_noise_db)
+
+        self._update_runs(speech)
+        block_has_speech = bool(speech.any())
+        return VadDecision(is_speech=block_has_speech, endpoint=self._is_endpoint(), level=level)
+
+    def _update_runs(self, speech: np.ndarray) -> None:
+        """Update the consecutive speech/silence run lengths from a boolean frame array."""
+        if not speech.any():
+            self._silence_run += speech.shape[0]
+            self._speech_run = 0
+            return
+
+        # Longest run of speech frames in this block, counting a run carried over from the
+        # previous block
+        padded = np.concatenate(([False], speech, [False]))
+        edges = np.flatnonzero(padded[1:] != padded[:-1])
+        starts, ends = edges[::2], edges[1::2]
+        runs = ends - starts
+        if starts[0] == 0:
+            runs[0] += self._speech_run
+        if runs.max() >= self.onset_frames:
+            self.speech_detected = True
+
+        if self.speech_detected:
+            self._speech_frames += int(np.count_nonzero(speech))
+
+        last_speech = int(np.flatnonzero(speech)[-1])
+        self._silence_run = speech.shape[0] - 1 - last_speech
+        self._speech_run = int(runs[-1]) if ends[-1] == speech.shape[0] else 0
+
+    def _is_endpoint(self) -> bool:
+        return (
+            self.speech_detected
+            and self._speech_frames >= self._min_speech_frames
+            and self._silence_run >= self._endpoint_frames
+        )
+
+
+VAD_ENGINES = {
+    "threshold": LevelThresholdVAD,
+    "energy_zcr": EnergyZcrVAD,
+}
+
+
+def create_vad(name: str, samplerate: int = 24000, **options) -> VoiceActivityDetector:
+    """
+    Create a voice activity detector by name.
+
+    Args:
+        name: One of VAD_ENGINES ("threshold", "energy_zcr").
+        samplerate: Sample rate of the capture stream.
+        **options: Engine specific options, e.g. endpoint_timeout or silence_duration.
+
+    Returns:
+        VoiceActivityDetector: The detector.
+    """
+    try:
+        engine = VAD_ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown VAD engine '{name}', expected one of {sorted(VAD_ENGINES)}")
+    return engine(samplerate=samplerate, **options)
@@ -0,0 +1,258 @@
+import asyncio
+import json
+import time
+from typing import Callable, Optional
+
+import numpy as np
+from websockets.exceptions import ConnectionClosed
+
+from audio.backends import AudioTransport
+from observability.log import get_logger
+
+logger = get_logger(__name__)
+
+# Audio on the wire in both directions: mono 16-bit little-endian PCM at the rate the STT
+# and TTS models use, in binary messages of any length
+WIRE_SAMPLERATE = 24000
+WIRE_ENCODING = "pcm16"
+
+
+def encode_pcm(samples: np.ndarray) -> bytes:
+    """float32 in [-1.0, 1.0] or int16 samples to the wire format."""
+    if samples.dtype != np.int16:
+        samples = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    return samples.reshape(-1).astype("<i2", copy=False).tobytes()
+
+
+def control_message(kind: str, **fields) -> str:
+    """Text message for the control channel, e.g. control_message("ready", session_id=...)."""
+    return json.dumps({"type": kind, **fields})
+
+
+class WebSocketInputStream:
+    """
+    Stand-in for sounddevice.InputStream fed with PCM received from a WebSocket client.
+
+    The gateway hands every binary message to receive() on the event loop; the samples are
+    cut into `blocksize` blocks and passed to the callback as a microphone would. Clients
+    may send messages of any length, so a partial block waits for the next message.
+    Audio received while the stream is stopped is discarded.
+    """
+
+    def __init__(
+        self,
+        samplerate: int = WIRE_SAMPLERATE,
+        blocksize: int = 1024,
+        channels: int = 1,
+        dtype=np.float32,
+        callback: Optional[Callable] = None,
+        device=None,
+    ):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.channels = channels
+        self.dtype = dtype
+        self.device = device
+        self.latency = 0.0
+        self._callback = callback
+        self._block = np.zeros((blocksize, 1), dtype=np.float32)
+        self._filled = 0
+        self._carry = b""
+        self._running = False
+        self.closed = False
+        self.blocks_delivered = 0
+        self.bytes_received = 0
+
+    @property
+    def active(self) -> bool:
+        return self._running
+
+    def start(self) -> None:
+        if self.closed:
+            raise RuntimeError("Stream is closed")
+        self._running = True
+
+    def stop(self) -> None:
+        self._running = False
+
+    def abort(self) -> None:
+        self.stop()
+
+    def close(self) -> None:
+        self.stop()
+        self.closed = True
+
+    def receive(self, data: bytes) -> None:
+        """Deliver one binary message from the client."""
+        self.bytes_received += len(data)
+        if not self._running:
+            return
+        if self._carry:
+            data, self._carry = self._carry + data, b""
+        if len(data) % 2:
+            # A sample split across messages
+            data, self._carry = data[:-1], data[-1:]
+        samples = np.frombuffer(data, dtype="<i2")
+        position = 0
+        while position < samples.shape[0]:
+            count = min(self.blocksize - self._filled, samples.shape[0] - position)
+            target = self._block[self._filled:self._filled + count, 0]
+            target[:] = samples[position:position + count]
+            target *= 1 / 32768.0
+            self._filled += count
+            position += count
+            if self._filled == self.blocksize:
+                if self._callback:
+                    self._callback(self._block, self.blocksize, None, None)
+                self.blocks_delivered += 1
+                self._filled = 0
+
+
+class WebSocketOutputStream:
+    """
+    Stand-in for sounddevice.OutputStream that sends the speaker audio to a WebSocket client.
+
+    A task on the event loop pulls `blocksize` frames from the callback in real time, plus
+    `lead` seconds ahead so the client can absorb network jitter, and sends them as binary
+    messages. Once the output has been digitally silent for `idle_after` seconds, e.g.
+    between responses, silent blocks are no longer sent, so an idle session costs no
+    bandwidth. Silence within a response, such as a pause between sentences, is sent like
+    any other audio, so the client plays it with its real length.
+
+    Backpressure comes from the socket: send() waits while the connection's write buffer
+    is full, the pull loop stops draining the playback engine meanwhile, and once its
+    jitter buffer is full PlaybackEngine.write() makes the TTS stream wait too. A client
+    that can't keep up therefore slows the response down instead of growing buffers.
+    """
+
+    def __init__(
+        self,
+        send: Callable,
+        samplerate: int = WIRE_SAMPLERATE,
+        blocksize: int = 480,
+        channels: int = 1,
+        dtype=np.int16,
+        callback: Optional[Callable] = None,
+        device=None,
+        lead: float = 0.1,
+        idle_after: float = 2.0,
+    ):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.channels = channels
+        self.dtype = dtype
+        self.device = device
+        # PlaybackEngine adds this to its estimate of when queued audio is heard
+        self.latency = lead
+        self._send = send
+        self._callback = callback
+        self._lead = lead
+        self._idle_blocks = max(1, round(idle_after * samplerate / blocksize))
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False
+        self.blocks_sent = 0
+        self.send_waits = 0
+        self.send_wait_seconds = 0.0
+
+    @property
+    def active(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.closed:
+            raise RuntimeError("Stream is closed")
+        if self.active:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._run())
+
+    def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        # PlaybackEngine.close() runs on a worker thread, so cancel through the loop
+        try:
+            self._loop.call_soon_threadsafe(task.cancel)
+        except RuntimeError:
+            # Event loop already closed
+            pass
+
+    def abort(self) -> None:
+        self.stop()
+
+    def close(self) -> None:
+        self.stop()
+        self.closed = True
+
+    async def _run(self) -> None:
+        block = np.zeros((self.blocksize, self.channels), dtype=np.int16)
+        period = self.blocksize / self.samplerate
+        next_deadline = self._loop.time() - self._lead
+        # Starts idle: nothing is sent until the first response audio
+        silent_blocks = self._idle_blocks
+        try:
+            while True:
+                if self._callback:
+                    self._callback(block, self.blocksize, None, None)
+                silent_blocks = 0 if block.any() else silent_blocks + 1
+                if silent_blocks <= self._idle_blocks:
+                    started = time.monotonic()
+                    await self._send(block.tobytes())
+                    waited = time.monotonic() - started
+                    if waited > period:
+                        self.send_waits += 1
+                        self.send_wait_seconds += waited
+                    self.blocks_sent += 1
+                next_deadline += period
+                delay = next_deadline - self._loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                elif delay < -self._lead:
+                    # Held up by a slow client; resume real-time pacing from now instead
+                    # of bursting to catch up
+                    next_deadline = self._loop.time()
+        except ConnectionClosed:
+            logger.debug("Client went away while audio was being sent")
+
+
+class WebSocketTransport(AudioTransport):
+    """
+    Audio of one session carried over a WebSocket connection (see voice_gateway.py).
+
+    The input stream is fed by the gateway's receive loop through receive(); the output
+    stream sends on `connection`, which only needs an async send(). Both run on the event
+    loop, so no audio threads are involved.
+    """
+
+    def __init__(self, connection, lead: float = 0.1):
+        """
+        Args:
+            connection: WebSocket connection to the client.
+            lead: Seconds of response audio sent ahead of real time.
+        """
+        self.connection = connection
+        self.lead = lead
+        self.input: Optional[WebSocketInputStream] = None
+        self.output: Optional[WebSocketOutputStream] = None
+
+    def input_stream(self, **kwargs) -> WebSocketInputStream:
+        self.input = WebSocketInputStream(**kwargs)
+        return self.input
+
+    def output_stream(self, **kwargs) -> WebSocketOutputStream:
+        self.output = WebSocketOutputStream(self.connection.send, lead=self.lead, **kwargs)
+        return self.output
+
+    def receive(self, data: bytes) -> None:
+        """Hand a binary message from the client to the microphone stream."""
+        if self.input is not None:
+            self.input.receive(data)
+
+    def metrics(self) -> dict:
+        return {
+            "bytes_received": self.input.bytes_received if self.input else 0,
+            "blocks_sent": self.output.blocks_sent if self.output else 0,
+            "send_waits": self.output.send_waits if self.output else 0,
+            "send_wait_ms": self.output.send_wait_seconds * 1000 if self.output else 0.0,
+        }
@@ -0,0 +1,91 @@
+"""
+Check barge-in detection against synthetic echo and interrupting speech.
+
+The bot's TTS is simulated with synthetic voiced speech played block by block. The
+microphone hears that playback through a delayed, attenuated echo path plus room noise,
+and optionally the user starting to talk over it. For each echo coupling level the harness
+reports whether the bot's own voice caused a false barge-in and how long after the user
+started speaking the barge-in fired.
+
+Usage:
+    python benchmarks/barge_in_benchmark.py [--user-start 3.0] [--user-level-db -3]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio.barge_in import BargeInDetector
+from vad_benchmark import synthesize_turn
+
+SAMPLERATE = 24000
+BLOCK_SIZE = 1024
+
+
+def bot_speech(seconds: float) -> np.ndarray:
+    pieces, total, seed = [], 0, 1
+    while total < seconds * SAMPLERATE:
+        audio, start, end = synthesize_turn(lead_silence=0.05, trail_silence=0.15, noise_db=-90, seed=seed)
+        pieces.append(audio)
+        total += audio.shape[0]
+        seed += 1
+    return np.concatenate(pieces)[: int(seconds * SAMPLERATE)]
+
+
+def simulate(coupling_db: float, user_start, user_level_db: float, seconds: float = 6.0,
+             echo_delay: float = 0.08) -> dict:
+    playback = bot_speech(seconds)
+    delay = int(echo_delay * SAMPLERATE)
+    echo = np.zeros_like(playback)
+    echo[delay:] = playback[:-delay] * 10 ** (coupling_db / 20)
+
+    rng = np.random.default_rng(7)
+    mic = echo + (10 ** (-55 / 20) * rng.standard_normal(playback.shape[0])).astype(np.float32)
+    if user_start is not None:
+        user, _, _ = synthesize_turn(lead_silence=0.0, trail_silence=0.0, noise_db=-90, seed=42)
+        user = user * 10 ** (user_level_db / 20)
+        begin = int(user_start * SAMPLERATE)
+        length = min(user.shape[0], mic.shape[0] - begin)
+        mic[begin:begin + length] += user[:length]
+
+    detector = BargeInDetector(samplerate=SAMPLERATE)
+    detector.reset()
+    triggered_at = None
+    for offset in range(0, playback.shape[0] - BLOCK_SIZE + 1, BLOCK_SIZE):
+        now = offset / SAMPLERATE
+        detector.note_playback((playback[offset:offset + BLOCK_SIZE] * 32767).astype(np.int16), now=now)
+        if detector.process(mic[offset:offset + BLOCK_SIZE].astype(np.float32), now=now):
+            triggered_at = (offset + BLOCK_SIZE) / SAMPLERATE
+            break
+
+    return {"triggered_at": triggered_at, "coupling_estimate": detector.coupling_db}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--user-start", type=float, default=3.0, help="When the user interrupts (s)")
+    parser.add_argument("--user-level-db", type=float, default=-3.0,
+                        help="Gain applied to the user's synthetic speech (dB)")
+    args = parser.parse_args()
+
+    print(f"{'echo dB':>8}{'echo only':>12}{'barge-in':>12}{'latency ms':>12}{'coupling est':>14}")
+    for coupling_db in (-24.0, -18.0, -12.0, -6.0):
+        echo_only = simulate(coupling_db, None, args.user_level_db)
+        with_user = simulate(coupling_db, args.user_start, args.user_level_db)
+        false_trigger = "FALSE@%.2fs" % echo_only["triggered_at"] if echo_only["triggered_at"] else "quiet"
+        if with_user["triggered_at"] is None:
+            detected, latency = "missed", "-"
+        elif with_user["triggered_at"] < args.user_start:
+            detected, latency = "early", "-"
+        else:
+            detected = "yes"
+            latency = f"{(with_user['triggered_at'] - args.user_start) * 1000:.0f}"
+        print(f"{coupling_db:>8.0f}{false_trigger:>12}{detected:>12}{latency:>12}"
+              f"{echo_only['coupling_estimate']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Compare the old list-based capture buffer with the preallocated AudioRingBuffer.
+
+Feeds synthetic 1024-sample float32 blocks (as sounddevice would deliver them) into
+both implementations and reports allocations, peak traced memory, per-block CPU time
+and the capture-to-AudioInput latency, i.e. the time from the last block to a ready
+AudioInput.
+
+Usage:
+    python benchmarks/capture_buffer_benchmark.py [--seconds 30] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.voice import AudioInput
+from audio.ring_buffer import AudioRingBuffer
+
+SAMPLERATE = 24000
+BLOCK_SIZE = 1024
+
+
+def make_blocks(seconds: float) -> list:
+    rng = np.random.default_rng(0)
+    count = int(seconds * SAMPLERATE / BLOCK_SIZE)
+    return [
+        (rng.standard_normal((BLOCK_SIZE, 1)) * 0.1).astype(np.float32)
+        for _ in range(count)
+    ]
+
+
+class ListCapture:
+    """The original approach: extend a list with numpy scalars, then rebuild an array."""
+
+    def start(self):
+        self.audio_buffer = []
+
+    def feed(self, data):
+        self.audio_buffer.extend(data.flatten())
+
+    def finish(self) -> AudioInput:
+        audio_data = np.array(self.audio_buffer)
+        audio_data = (audio_data * 32767).astype(np.int16)
+        return AudioInput(buffer=audio_data)
+
+
+class RingCapture:
+    """Preallocated int16 ring buffer written in place."""
+
+    def __init__(self, capacity: int):
+        self.ring = AudioRingBuffer(capacity, block_size=BLOCK_SIZE)
+
+    def start(self):
+        self.ring.clear()
+
+    def feed(self, data):
+        self.ring.write(data)
+
+    def finish(self) -> AudioInput:
+        return AudioInput(buffer=self.ring.view())
+
+
+def run_once(capture, blocks: list) -> tuple:
+    capture.start()
+    start = time.perf_counter()
+    for data in blocks:
+        capture.feed(data)
+    last_block = time.perf_counter()
+    capture.finish()
+    done = time.perf_counter()
+    return (last_block - start) / len(blocks), done - last_block
+
+
+def measure(name: str, capture, blocks: list, runs: int) -> dict:
+    # One untraced warm-up so lazy imports and first-touch page faults don't skew results
+    run_once(capture, blocks)
+
+    block_times, finish_times, peaks, allocations = [], [], [], []
+    for _ in range(runs):
+        block_time, finish_time = run_once(capture, blocks)
+        block_times.append(block_time)
+        finish_times.append(finish_time)
+
+        # Memory is traced in a separate pass because tracemalloc slows allocation down
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        run_once(capture, blocks)
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        stats = after.compare_to(before, "lineno")
+        allocations.append(sum(max(stat.count_diff, 0) for stat in stats))
+        peaks.append(peak)
+
+    return {
+        "name": name,
+        "per_block_us": statistics.median(block_times) * 1e6,
+        "to_audio_input_ms": statistics.median(finish_times) * 1e3,
+        "peak_mb": statistics.median(peaks) / 1e6,
+        "allocations": int(statistics.median(allocations)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=30.0, help="Length of the simulated turn")
+    parser.add_argument("--runs", type=int, default=5, help="Number of measured runs")
+    args = parser.parse_args()
+
+    blocks = make_blocks(args.seconds)
+    results = [
+        measure("list + np.array", ListCapture(), blocks, args.runs),
+        measure("AudioRingBuffer", RingCapture(len(blocks) * BLOCK_SIZE), blocks, args.runs),
+    ]
+
+    print(f"{args.seconds:.0f}s turn, {len(blocks)} blocks of {BLOCK_SIZE} samples @ {SAMPLERATE} Hz")
+    print(f"{'buffer':<18}{'us/block':>10}{'to AudioInput ms':>18}{'peak MB':>10}{'allocs':>10}")
+    for r in results:
+        print(
+            f"{r['name']:<18}{r['per_block_us']:>10.1f}{r['to_audio_input_ms']:>18.2f}"
+            f"{r['peak_mb']:>10.2f}{r['allocations']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Drive the voice loop in main.py end to end without a microphone, speaker or network.
+
+A VoiceSession runs unchanged under main.continuous_conversation except that the microphone is a FakeInputStream fed
+with recorded or synthetic user turns, the speaker is a FakeOutputStream, and STT, TTS, the
+chat model and the knowledge base tool are the stubs from stub_voice.py with configurable
+latencies. Each user turn is fed once the previous response has finished playing. For every
+turn the harness reports time to first audio (end of the user's speech to the first TTS
+audio reaching the playback queue), total turn time (start of speech to the end of
+playback), process CPU time and resident memory.
+
+Usage:
+    python benchmarks/e2e_benchmark.py
+    python benchmarks/e2e_benchmark.py --mode buffered --turns 5 --llm-latency 0.8
+    python benchmarks/e2e_benchmark.py --wav turn1.wav --wav turn2.wav --trace-file /tmp/turns.jsonl
+"""
+import argparse
+import asyncio
+import functools
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from audio.backends import FakeInputStream, FakeOutputStream, load_wav
+from my_agents import Tech_Support_Agent
+from observability.log import configure_logging
+from observability.turn_tracing import TurnTracer
+from stub_voice import SAMPLERATE, StubLatencies, StubScript, StubVoiceModelProvider, make_stub_agent
+from vad_benchmark import synthesize_turn
+
+
+def speech_end_of(audio: np.ndarray, samplerate: int, floor_db: float = 35.0) -> float:
+    """Seconds until the last 10 ms frame within `floor_db` of the loudest frame."""
+    frame = int(samplerate * 0.01)
+    frames = audio[: audio.shape[0] // frame * frame].reshape(-1, frame)
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-12)
+    loud = np.flatnonzero(energy_db > energy_db.max() - floor_db)
+    return (loud[-1] + 1) * frame / samplerate if loud.size else audio.shape[0] / samplerate
+
+
+@functools.lru_cache(maxsize=None)
+def room_noise(seconds: float, noise_db: float, seed: int = 0) -> np.ndarray:
+    """Hiss and mains hum like the synthetic turns, so the microphone is never digitally silent."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLERATE)) / SAMPLERATE
+    amplitude = 10 ** (noise_db / 20)
+    noise = (amplitude * (rng.standard_normal(t.shape[0]) + np.sin(2 * np.pi * 50 * t))).astype(np.float32)
+    # Cached and shared between turns and sessions, so nobody may write into it
+    noise.flags.writeable = False
+    return noise
+
+
+def resident_memory_mb() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        # Peak instead of current on systems without procfs; ru_maxrss is KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class BenchTracer(TurnTracer):
+    """TurnTracer that tells the driver when a turn has been fully played."""
+
+    def __init__(self, loop, **kwargs):
+        super().__init__(**kwargs)
+        self._loop = loop
+        self.turn_done = asyncio.Event()
+
+    def end_turn(self):
+        turn = super().end_turn()
+        if turn is not None:
+            self._loop.call_soon_threadsafe(self.turn_done.set)
+        return turn
+
+
+async def drive(turns, tracer: BenchTracer, microphone: list, session: main.VoiceSession,
+                conversation: asyncio.Task, pause: float, timeout: float, noise_db: float) -> list:
+    """Feed each turn after the previous response has played and measure it."""
+    while not microphone:
+        await asyncio.sleep(0.05)
+    stream = microphone[0]
+    results = []
+    try:
+        for index, (audio, speech_end) in enumerate(turns):
+            # Quiet room before the user speaks; also lets the VAD seed its noise floor
+            await asyncio.sleep(pause)
+            tracer.turn_done.clear()
+            cpu_start = time.process_time()
+            fed_at = time.monotonic()
+            # Room noise continues after the turn until the next one is fed
+            stream.feed(np.concatenate((audio, room_noise(timeout + pause, noise_db, seed=index))))
+            done = asyncio.ensure_future(tracer.turn_done.wait())
+            await asyncio.wait({done, conversation}, timeout=timeout,
+                               return_when=asyncio.FIRST_COMPLETED)
+            if not done.done():
+                done.cancel()
+                reason = "conversation ended" if conversation.done() else f"no response within {timeout:.0f}s"
+                print(f"turn {index + 1}: {reason}, stopping")
+                break
+            turn = tracer.turns[-1]
+            speech_end_at = fed_at + speech_end
+            first_audio = turn.marks.get("first_audio")
+            results.append({
+                "turn": index + 1,
+                "ttfa_ms": (first_audio - speech_end_at) * 1000 if first_audio else None,
+                "turn_ms": (turn.ended_at - fed_at) * 1000,
+                "cpu_ms": (time.process_time() - cpu_start) * 1000,
+                "rss_mb": resident_memory_mb(),
+            })
+    finally:
+        session.stop()
+    return results
+
+
+async def run(args, turns) -> tuple:
+    latencies = StubLatencies(
+        stt=args.stt_latency,
+        llm_first_token=args.llm_latency,
+        tool=args.tool_latency,
+        tts_first_byte=args.tts_latency,
+    )
+    script = StubScript(use_tool=not args.no_tool, answer_words=args.answer_words)
+    microphone = []
+
+    def capture_stream_factory(**kwargs):
+        stream = FakeInputStream(room_noise(args.pause + 1.0, args.noise_db), **kwargs)
+        microphone.append(stream)
+        return stream
+
+    tracer = BenchTracer(asyncio.get_running_loop(), export_path=args.trace_file)
+    session = main.VoiceSession(
+        agent=make_stub_agent(Tech_Support_Agent, latencies, script),
+        input_mode=args.mode,
+        barge_in_enabled=not args.no_barge_in,
+        capture_stream_factory=capture_stream_factory,
+        playback_stream_factory=FakeOutputStream,
+        tracer=tracer,
+    )
+    conversation = asyncio.create_task(main.continuous_conversation(
+        model_provider=StubVoiceModelProvider(latencies, script),
+        session=session,
+    ))
+    results = await drive(turns, tracer, microphone, session, conversation, args.pause,
+                          args.timeout, args.noise_db)
+    await conversation
+    return results, tracer.stats()
+
+
+def summarize(values) -> str:
+    values = [v for v in values if v is not None]
+    if not values:
+        return "-"
+    return f"{np.mean(values):8.0f} {np.percentile(values, 50):8.0f} {np.percentile(values, 95):8.0f}"
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=("streamed", "buffered"), default="streamed")
+    parser.add_argument("--turns", type=int, default=3, help="Synthetic turns when no --wav is given")
+    parser.add_argument("--wav", action="append", help="24 kHz mono WAV per user turn (repeatable)")
+    parser.add_argument("--pause", type=float, default=1.0, help="Silence before each user turn (s)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Give up on a turn after (s)")
+    parser.add_argument("--noise-db", type=float, default=-55.0, help="Room noise between turns (dBFS)")
+    parser.add_argument("--stt-latency", type=float, default=0.3)
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="Model time to first token (s)")
+    parser.add_argument("--tool-latency", type=float, default=0.25)
+    parser.add_argument("--tts-latency", type=float, default=0.2, help="TTS time to first byte (s)")
+    parser.add_argument("--answer-words", type=int, default=40)
+    parser.add_argument("--no-tool", action="store_true", help="Answer without a knowledge base call")
+    parser.add_argument("--no-barge-in", action="store_true")
+    parser.add_argument("--trace-file", help="Also export per-turn stage traces as JSONL")
+    parser.add_argument("--stages", action="store_true", help="Print per-stage percentiles")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    configure_logging(level=args.log_level)
+
+    if args.wav:
+        turns = []
+        for path in args.wav:
+            audio, samplerate = load_wav(path)
+            if samplerate != SAMPLERATE:
+                parser.error(f"{path}: expected {SAMPLERATE} Hz, got {samplerate}")
+            turns.append((audio, speech_end_of(audio, samplerate)))
+    else:
+        turns = []
+        for seed in range(args.turns):
+            audio, _, speech_end = synthesize_turn(lead_silence=0.3, trail_silence=1.5, seed=seed)
+            turns.append((audio, speech_end))
+
+    results, stages = asyncio.run(run(args, turns))
+
+    print(f"mode={args.mode} turns={len(results)}/{len(turns)}")
+    print(f"{'turn':>4}{'ttfa ms':>10}{'turn ms':>10}{'cpu ms':>10}{'rss MB':>10}")
+    for r in results:
+        ttfa = f"{r['ttfa_ms']:.0f}" if r["ttfa_ms"] is not None else "-"
+        print(f"{r['turn']:>4}{ttfa:>10}{r['turn_ms']:>10.0f}{r['cpu_ms']:>10.0f}{r['rss_mb']:>10.1f}")
+    print(f"{'':>10}{'mean':>8} {'p50':>8} {'p95':>8}")
+    print(f"{'ttfa ms':>10}{summarize([r['ttfa_ms'] for r in results])}")
+    print(f"{'turn ms':>10}{summarize([r['turn_ms'] for r in results])}")
+    print(f"{'cpu ms':>10}{summarize([r['cpu_ms'] for r in results])}")
+
+    if args.stages:
+        print(f"\n{'stage':<32}{'count':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for stage, entry in stages.items():
+            print(f"{stage:<32}{entry['count']:>6}{entry['p50_ms']:>10.0f}"
+                  f"{entry['p95_ms']:>10.0f}{entry['p99_ms']:>10.0f}")
+
+    if len(results) < len(turns):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,147 @@
+"""
+End-to-end test of the WebSocket voice gateway with local Python clients.
+
+A VoiceGateway on localhost runs its sessions with the stub STT, TTS and chat models from
+stub_voice.py. Each of `--clients` VoiceClients streams a live microphone to it in real
+time: room noise, with the synthetic turns from vad_benchmark.py spoken one after another.
+A turn is over once the response audio has stopped arriving for `--gap` seconds.
+
+Reported per client count: time to first audio measured at the client (last sample of
+speech sent to first response audio received) and response audio received per turn.
+Compare TTFA with e2e_benchmark.py, which runs the same stubs on fake in-process streams,
+to see what the gateway adds.
+
+Usage:
+    python benchmarks/gateway_benchmark.py
+    python benchmarks/gateway_benchmark.py --clients 1,8 --turns 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("MEMORY_SUMMARIZER", "extractive")
+
+from e2e_benchmark import room_noise
+from my_agents import Tech_Support_Agent
+from stub_voice import SAMPLERATE, StubLatencies, StubScript, StubVoiceModelProvider, make_stub_agent
+from vad_benchmark import synthesize_turn
+from voice_client import VoiceClient
+from voice_gateway import VoiceGateway
+from voice_server import VoiceServer
+
+
+async def caller(url: str, index: int, turns, args) -> list:
+    """Speak each turn into a live microphone and time the answer."""
+    block = 0.02
+    size = int(block * SAMPLERATE)
+    noise = room_noise(args.timeout + args.pause, args.noise_db, seed=index)
+    results = []
+    async with VoiceClient(url, session_id=f"client-{index}") as client:
+        speech = np.zeros(0, dtype=np.float32)
+        position = noise_position = 0
+        speech_end_at = None
+        turn = 0
+        next_deadline = time.monotonic()
+        phase_started = time.monotonic()
+        while turn < len(turns) and client.connected:
+            now = time.monotonic()
+            if speech_end_at is None and position >= speech.shape[0] and now - phase_started >= args.pause:
+                # Quiet room before each question, then the question itself
+                audio, speech_end = turns[turn]
+                speech, position = audio, 0
+                speech_end_at = now + speech_end
+                received_before = len(client.received)
+            if position < speech.shape[0]:
+                chunk = speech[position:position + size]
+                position += size
+            else:
+                chunk = noise[noise_position:noise_position + size]
+                noise_position = (noise_position + size) % (noise.shape[0] - size)
+            await client.send_audio(chunk)
+
+            if speech_end_at is not None and len(client.received) > received_before:
+                answer = client.received[received_before:]
+                if now - client.last_audio_at >= args.gap or now - speech_end_at > args.timeout:
+                    results.append({
+                        "ttfa_ms": (answer[0][0] - speech_end_at) * 1000,
+                        "audio_s": sum(samples.shape[0] for _, samples in answer) / SAMPLERATE,
+                    })
+                    turn += 1
+                    speech_end_at = None
+                    phase_started = now
+            elif speech_end_at is not None and now - speech_end_at > args.timeout:
+                print(f"client {index} turn {turn + 1}: no response within {args.timeout:.0f}s")
+                break
+
+            next_deadline += block
+            delay = next_deadline - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+    return results
+
+
+async def run_clients(count: int, args, turns) -> dict:
+    latencies = StubLatencies(llm_first_token=args.llm_latency, tts_first_byte=args.tts_latency)
+    script = StubScript(use_tool=True, answer_words=args.answer_words)
+    server = VoiceServer(model_provider=StubVoiceModelProvider(latencies, script), tts_cache=False)
+    gateway = VoiceGateway(
+        server, host="127.0.0.1", port=0, lead=args.lead,
+        session_options={"agent": make_stub_agent(Tech_Support_Agent, latencies, script),
+                         "input_mode": args.mode},
+    )
+    async with gateway:
+        url = f"ws://127.0.0.1:{gateway.port}"
+        per_client = await asyncio.gather(*(caller(url, index, turns, args) for index in range(count)))
+    results = [result for client in per_client for result in client]
+    ttfa = [result["ttfa_ms"] for result in results]
+    return {
+        "clients": count,
+        "turns": len(results),
+        "expected": count * len(turns),
+        "ttfa_p50": float(np.percentile(ttfa, 50)) if ttfa else float("nan"),
+        "ttfa_p95": float(np.percentile(ttfa, 95)) if ttfa else float("nan"),
+        "audio_s": float(np.mean([result["audio_s"] for result in results])) if results else 0.0,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", default="1,4,16", help="Comma-separated client counts")
+    parser.add_argument("--turns", type=int, default=3, help="Turns per client")
+    parser.add_argument("--mode", choices=("streamed", "buffered"), default="streamed")
+    parser.add_argument("--pause", type=float, default=1.0, help="Silence before each question (s)")
+    parser.add_argument("--gap", type=float, default=1.0, help="Silence that ends a response (s)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Give up on a turn after (s)")
+    parser.add_argument("--lead", type=float, default=0.1, help="Response audio sent ahead (s)")
+    parser.add_argument("--noise-db", type=float, default=-55.0)
+    parser.add_argument("--llm-latency", type=float, default=0.4)
+    parser.add_argument("--tts-latency", type=float, default=0.2)
+    parser.add_argument("--answer-words", type=int, default=30)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    from agents import set_tracing_disabled
+    from observability.log import configure_logging
+    configure_logging(level=args.log_level)
+    set_tracing_disabled(True)
+
+    turns = []
+    for seed in range(args.turns):
+        audio, _, speech_end = synthesize_turn(lead_silence=0.3, trail_silence=0.5, seed=seed)
+        turns.append((audio, speech_end))
+
+    print(f"{'clients':>8}{'turns':>9}{'ttfa p50 ms':>13}{'p95':>7}{'audio/turn s':>14}")
+    for count in (int(value) for value in args.clients.split(",")):
+        result = asyncio.run(run_clients(count, args, turns))
+        print(f"{count:>8}{result['turns']:>5}/{result['expected']:<3}{result['ttfa_p50']:>13.0f}"
+              f"{result['ttfa_p95']:>7.0f}{result['audio_s']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main_cli()
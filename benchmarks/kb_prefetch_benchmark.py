@@ -0,0 +1,162 @@
+"""
+Measure speculative knowledge base prefetch on technical support turns.
+
+Each turn is replayed through the Runner with the real search_knowledge_base tool and a
+stub Vespa client that takes `--vespa-latency` seconds per query. The stub model takes
+`--llm-latency` seconds per request and, like the tech support agent, asks for a search
+with its own wording of what the caller said: close paraphrases, rewrites that share
+few words with the transcript, and non-technical turns where it answers without the
+tool. With prefetch on, the workflow's call is mirrored: prefetch(transcript) just before
+the Runner starts.
+
+Reported per mode: time from the transcript to the first answer token, time inside the
+tool, Vespa queries made, and the prefetcher's hit rate and time saved.
+
+Usage:
+    python benchmarks/kb_prefetch_benchmark.py
+    python benchmarks/kb_prefetch_benchmark.py --rounds 20 --vespa-latency 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_voice import StubChatModel, StubLatencies, StubScript, _text_of
+
+TENANT_ID = "bench-tenant"
+DOCUMENT_ID = "3f2b8c1e-5d4a-4b6e-9c7f-1a2b3c4d5e6f"
+
+# (what the caller said, the model's search query or None if it answers directly)
+TURNS = [
+    ("Hi, this is Priya from the Bhopal store", None),
+    ("My billing counter printer is not working", "billing counter printer not working"),
+    ("It shows a paper jam error even with no paper inside", "printer paper jam error with no paper inside"),
+    ("The weighing machine shows the wrong weight", "weighing machine showing wrong weight"),
+    ("The card payment fails on the PoS terminal", "card payment failing on PoS terminal"),
+    ("How do I change the customer's mobile number in the app", "change customer mobile number in app"),
+    ("It still does not work after I restarted it", "billing printer not working after restart"),
+    ("The screen went black and nothing happens", "POS monitor display blank troubleshooting"),
+    ("Thank you, that fixed it", None),
+]
+
+
+class StubVespa:
+    """Vespa client stand-in: sleeps, counts queries and returns `limit` hits."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.queries = 0
+
+    async def query_async(self, **params):
+        self.queries += 1
+        await asyncio.sleep(self.latency)
+        limit = int(params["yql"].rsplit("limit", 1)[1])
+        hits = [{"fields": {"content": f"Step {i} for {params['query']}", "title": "Guide",
+                            "id": DOCUMENT_ID, "chunk_id": i}} for i in range(limit)]
+        return SimpleNamespace(is_successful=lambda: True, hits=hits)
+
+    async def aclose(self):
+        pass
+
+
+class ParaphrasingModel(StubChatModel):
+    """Stub model that searches with its own query for the turn, or answers directly."""
+
+    def __init__(self, latencies: StubLatencies, queries: dict):
+        super().__init__(latencies, StubScript(answer_words=20))
+        self.queries = queries
+
+    def _next_output(self, input) -> tuple:
+        items = [{"role": "user", "content": input}] if isinstance(input, str) else list(input)
+        last = items[-1] if items else {}
+        query = self.queries.get(_text_of(last)) if last.get("role") == "user" else None
+        self.script.use_tool = query is not None
+        output, text = super()._next_output(input)
+        if query is not None:
+            output.arguments = json.dumps({"query": query, "tenant_id": TENANT_ID, "limit": 3,
+                                           "document_id": DOCUMENT_ID, "collection_id": None})
+        return output, text
+
+
+async def run_mode(args, prefetch: bool) -> dict:
+    from agents import Agent, Runner
+    from openai.types.responses import ResponseTextDeltaEvent
+    from tools import kb_cache, kb_prefetch, vespa_client
+    from tools.search_knowledge_base_tool import search_knowledge_base
+
+    vespa = StubVespa(args.vespa_latency)
+    vespa_client._client = vespa
+    # Fresh cache and prefetcher so neither mode is served from the other's results
+    kb_cache._cache = None
+    kb_prefetch._prefetcher = kb_prefetch.KnowledgeBasePrefetcher(similarity_threshold=args.similarity)
+    prefetcher = kb_prefetch.get_kb_prefetcher()
+
+    turns = [(f"{said} (call {r})", f"{query} (call {r})" if query else None)
+             for r in range(args.rounds) for said, query in TURNS]
+    latencies = StubLatencies(llm_first_token=args.llm_latency, llm_token_interval=0.0)
+    agent = Agent(name="Tech_Support_Agent", instructions="Answer from the knowledge base.",
+                  tools=[search_knowledge_base],
+                  model=ParaphrasingModel(latencies, {said: query for said, query in turns}))
+
+    first_token, tool_time = [], []
+    for said, _ in turns:
+        start = time.perf_counter()
+        if prefetch:
+            prefetcher.prefetch(said, tenant_id=TENANT_ID, document_id=DOCUMENT_ID)
+        result = Runner.run_streamed(agent, [{"role": "user", "content": said}])
+        first, called = None, None
+        async for event in result.stream_events():
+            now = time.perf_counter()
+            if event.type == "run_item_stream_event" and event.name == "tool_called":
+                called = now
+            elif event.type == "run_item_stream_event" and event.name == "tool_output":
+                tool_time.append(now - called)
+            elif (first is None and event.type == "raw_response_event"
+                    and isinstance(event.data, ResponseTextDeltaEvent)):
+                first = now - start
+        first_token.append(first)
+    # Let unclaimed prefetches finish so their queries are counted
+    await asyncio.sleep(args.vespa_latency * 2)
+    return {"first_token": first_token, "tool": tool_time, "queries": vespa.queries,
+            "metrics": prefetcher.metrics()}
+
+
+async def run(args) -> None:
+    print(f"{'':<10}{'first token p50 ms':>19}{'p95':>7}{'tool p50 ms':>13}{'p95':>7}{'vespa queries':>15}")
+    results = {}
+    for name, prefetch in (("off", False), ("prefetch", True)):
+        result = results[name] = await run_mode(args, prefetch)
+        first = np.asarray(result["first_token"]) * 1000
+        tool = np.asarray(result["tool"]) * 1000
+        print(f"{name:<10}{np.percentile(first, 50):>19.0f}{np.percentile(first, 95):>7.0f}"
+              f"{np.percentile(tool, 50):>13.0f}{np.percentile(tool, 95):>7.0f}{result['queries']:>15}")
+    print(f"\nprefetch metrics: {results['prefetch']['metrics']}")
+    saved = np.mean(results["off"]["first_token"]) - np.mean(results["prefetch"]["first_token"])
+    print(f"mean first token saved per turn: {saved * 1000:.0f} ms")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=10, help="Times the call script is replayed")
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="Stub model time per request (s)")
+    parser.add_argument("--vespa-latency", type=float, default=0.25, help="Stub Vespa query time (s)")
+    parser.add_argument("--similarity", type=float, default=0.5, help="Prefetch similarity threshold")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    from agents import set_tracing_disabled
+    from observability.log import configure_logging
+    configure_logging(level=args.log_level)
+    set_tracing_disabled(True)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,146 @@
+"""
+Compare conversation memory against the old "last 10 messages" history on a long session.
+
+A scripted kiosk session of `--turns` turns is replayed without a model: the caller gives
+their name and store in the first turn, most turns search the knowledge base (a tool call
+and a `--tool-tokens` result), and a ticket is created a third of the way in. "slice" is
+the previous StatefulWorkflow: a list of user and assistant messages with the last ten
+sent. "memory" is ConversationMemory with a summarizer that takes `--summary-latency`
+seconds, standing in for the model, while the next turns carry on.
+
+Reported per variant: input tokens per request, items held after the session, whether
+the caller's name, store and ticket number are still in the input at the end, and the
+time memory bookkeeping adds to each turn.
+
+Usage:
+    python benchmarks/memory_benchmark.py
+    python benchmarks/memory_benchmark.py --turns 500 --max-tokens 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TICKET_NUMBER = "250215082900"
+
+
+def turn_script(index: int, tool_tokens: int, ticket_turn: int) -> tuple:
+    """(user text, items the Runner would produce) for turn `index`."""
+    if index == 0:
+        return ("Hi, my name is Priya from the Bhopal store",
+                [_message("Thank you, Priya from Bhopal. How can I help you today?")])
+    user = f"The billing printer still shows error {index % 7} after step {index}"
+    items = []
+    if index == ticket_turn:
+        arguments = {"location": "Bhopal", "level1": "HARDWARE", "level2": "PRINTER",
+                     "level3": "NOT WORKING", "problem": "Printer jams", "submit_by": "Priya",
+                     "priority": "HIGH"}
+        items += _tool(index, "create_ticket", arguments,
+                       {"status": "success", "ticket_number": TICKET_NUMBER})
+    elif index % 3:
+        result = {"result": [{"title": "Printer guide", "content": "check the roller " * (tool_tokens // 3)}]}
+        items += _tool(index, "search_knowledge_base", {"query": user, "tenant_id": "t", "limit": 5}, result)
+    items.append(_message("Please open the cover, check the roller and the sensor, then restart "
+                          "the printer and tell me what the display shows. " * 2))
+    return user, items
+
+
+def _message(text: str) -> dict:
+    return {"type": "message", "role": "assistant", "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}]}
+
+
+def _tool(index: int, name: str, arguments: dict, output: dict) -> list:
+    return [{"type": "function_call", "call_id": f"call_{index}", "name": name,
+             "arguments": json.dumps(arguments)},
+            {"type": "function_call_output", "call_id": f"call_{index}", "output": str(output)}]
+
+
+def remembers(items: list) -> dict:
+    text = json.dumps(items)
+    return {"name": "Priya" in text, "store": "Bhopal" in text, "ticket": TICKET_NUMBER in text}
+
+
+async def run_slice(args) -> dict:
+    from conversation_memory import _item_text
+    from prompts import count_tokens
+
+    history, tokens, overhead = [], [], []
+    for index in range(args.turns):
+        user, items = turn_script(index, args.tool_tokens, args.turns // 3)
+        start = time.perf_counter()
+        history.append({"role": "user", "content": user})
+        window = history[-10:]
+        overhead.append(time.perf_counter() - start)
+        tokens.append(sum(count_tokens(_item_text(item)) for item in window))
+        await asyncio.sleep(args.turn_interval)
+        reply = next(_item_text(item) for item in items if item.get("type") == "message")
+        history.append({"role": "assistant", "content": reply})
+    return {"tokens": tokens, "overhead": overhead, "held": len(history), "last": history[-10:]}
+
+
+async def run_memory(args) -> dict:
+    from conversation_memory import ConversationMemory, _item_text, extractive_summary
+    from prompts import count_tokens
+
+    async def summarizer(previous, transcript, max_tokens):
+        await asyncio.sleep(args.summary_latency)
+        return await extractive_summary(previous, transcript, max_tokens)
+
+    memory = ConversationMemory(max_tokens=args.max_tokens, summarizer=summarizer)
+    tokens, overhead = [], []
+    for index in range(args.turns):
+        user, items = turn_script(index, args.tool_tokens, args.turns // 3)
+        start = time.perf_counter()
+        memory.add_user(user)
+        window = memory.input_items()
+        overhead.append(time.perf_counter() - start)
+        tokens.append(sum(count_tokens(_item_text(item)) for item in window))
+        await asyncio.sleep(args.turn_interval)
+        start = time.perf_counter()
+        memory.complete_turn(items)
+        overhead[-1] += time.perf_counter() - start
+    last = memory.input_items()
+    metrics = memory.metrics()
+    await memory.aclose()
+    held = sum(len(turn.items) for turn in memory._turns)
+    return {"tokens": tokens, "overhead": overhead, "held": held, "last": last, "metrics": metrics}
+
+
+async def run(args) -> None:
+    print(f"{'':<8}{'tokens p50':>11}{'p95':>7}{'max':>7}{'last':>7}{'held':>7}"
+          f"{'overhead us':>13}  remembers at the end")
+    for name, variant in (("slice", run_slice), ("memory", run_memory)):
+        result = await variant(args)
+        tokens = np.asarray(result["tokens"])
+        overhead = np.asarray(result["overhead"]) * 1e6
+        print(f"{name:<8}{np.percentile(tokens, 50):>11.0f}{np.percentile(tokens, 95):>7.0f}"
+              f"{tokens.max():>7.0f}{tokens[-1]:>7.0f}{result['held']:>7}{np.percentile(overhead, 50):>13.0f}"
+              f"  {remembers(result['last'])}")
+        if "metrics" in result:
+            print(f"\nmemory metrics: {result['metrics']}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--tool-tokens", type=int, default=400, help="Size of a knowledge base result")
+    parser.add_argument("--max-tokens", type=int, default=3000, help="ConversationMemory budget")
+    parser.add_argument("--summary-latency", type=float, default=0.05, help="Stub summarizer time (s)")
+    parser.add_argument("--turn-interval", type=float, default=0.01, help="Stub model time per turn (s)")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    from observability.log import configure_logging
+    configure_logging(level=args.log_level)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,168 @@
+"""
+Compare Nango credential fetching per tool call with the shared NangoCredentialManager.
+
+A stub Nango server on localhost answers `/connection/{id}` after a configurable delay with
+a token that expires after `--expires-in` seconds. The script runs a sequence of tool-like
+calls twice, once forcing a refresh per call like the tools used to and once through
+the manager, and reports Nango round trips and time spent waiting for a token. It then
+checks that a burst of concurrent callers shares one request and that a token close
+to expiry is served from the cache while a refresh runs in the background.
+
+Usage:
+    python benchmarks/nango_credentials_benchmark.py
+    python benchmarks/nango_credentials_benchmark.py --calls 50 --latency 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from observability.log import configure_logging
+from tools.http_client import aclose_http_client, get_http_client
+from tools.nango_credentials import NangoCredentialManager
+
+
+class StubNango:
+    """Threaded HTTP server that mimics Nango's GET /connection/{id}."""
+
+    def __init__(self, latency: float, expires_in: float):
+        self.latency = latency
+        self.expires_in = expires_in
+        self.requests = 0
+        self.forced_refreshes = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = parse_qs(url.query)
+                stub.requests += 1
+                if params.get("refresh_token") == ["true"]:
+                    stub.forced_refreshes += 1
+                time.sleep(stub.latency)
+                expires_at = datetime.now(timezone.utc) + timedelta(seconds=stub.expires_in)
+                body = json.dumps({
+                    "connection_id": url.path.rsplit("/", 1)[-1],
+                    "credentials": {
+                        "type": "OAUTH2",
+                        "access_token": f"token-{stub.requests}",
+                        "expires_at": expires_at.isoformat().replace("+00:00", "Z"),
+                    },
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def reset(self):
+        self.requests = 0
+        self.forced_refreshes = 0
+
+    def close(self):
+        self.server.shutdown()
+
+
+async def fetch_per_call(nango: StubNango, connection_id: str) -> str:
+    """What the tools did before: a forced refresh before every Sheets request."""
+    response = await get_http_client().get(
+        f"{nango.url}/connection/{connection_id}",
+        headers={"Authorization": "Bearer stub"},
+        params={"provider_config_key": "google-sheet", "refresh_token": "true"},
+    )
+    return response.json()["credentials"]["access_token"]
+
+
+async def timed_calls(get_token, calls: int, interval: float) -> float:
+    waited = 0.0
+    for _ in range(calls):
+        start = time.perf_counter()
+        await get_token()
+        waited += time.perf_counter() - start
+        await asyncio.sleep(interval)
+    return waited
+
+
+async def run(args) -> bool:
+    nango = StubNango(args.latency, args.expires_in)
+    ok = True
+    try:
+        baseline = await timed_calls(lambda: fetch_per_call(nango, "conn"), args.calls, args.interval)
+        baseline_requests = nango.requests
+
+        nango.reset()
+        manager = NangoCredentialManager(base_url=nango.url, secret_key="stub")
+        cached = await timed_calls(lambda: manager.get_access_token("conn"), args.calls, args.interval)
+        print(f"{'':>10}{'requests':>10}{'forced':>8}{'wait ms':>10}{'per call':>10}")
+        print(f"{'per call':>10}{baseline_requests:>10}{baseline_requests:>8}"
+              f"{baseline * 1000:>10.0f}{baseline * 1000 / args.calls:>10.1f}")
+        print(f"{'manager':>10}{nango.requests:>10}{nango.forced_refreshes:>8}"
+              f"{cached * 1000:>10.0f}{cached * 1000 / args.calls:>10.1f}")
+
+        # Cold cache, many concurrent callers: one request
+        nango.reset()
+        manager = NangoCredentialManager(base_url=nango.url, secret_key="stub")
+        tokens = await asyncio.gather(*(manager.get_access_token("burst") for _ in range(args.burst)))
+        single_flight = nango.requests == 1 and len(set(tokens)) == 1
+        print(f"\nburst of {args.burst}: {nango.requests} request(s), "
+              f"{manager.coalesced} coalesced -> {'ok' if single_flight else 'FAILED'}")
+        ok &= single_flight
+
+        # Token inside the refresh-ahead window: served at once, refreshed in the background
+        nango.reset()
+        nango.expires_in = manager.refresh_ahead - 10
+        await manager.get_access_token("near-expiry")
+        nango.expires_in = args.expires_in
+        start = time.perf_counter()
+        first = await manager.get_access_token("near-expiry")
+        served_ms = (time.perf_counter() - start) * 1000
+        await asyncio.sleep(args.latency * 2 + 0.1)
+        refreshed = await manager.get_access_token("near-expiry")
+        background = (
+            served_ms < args.latency * 1000 / 2
+            and refreshed != first
+            and nango.forced_refreshes >= 1
+        )
+        print(f"near expiry: served in {served_ms:.1f} ms, background refresh "
+              f"{'ok' if background else 'FAILED'} ({nango.forced_refreshes} forced)")
+        ok &= background
+    finally:
+        await aclose_http_client()
+        nango.close()
+    return ok
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20, help="Sequential tool calls")
+    parser.add_argument("--interval", type=float, default=0.01, help="Pause between calls (s)")
+    parser.add_argument("--latency", type=float, default=0.15, help="Stub Nango response time (s)")
+    parser.add_argument("--expires-in", type=float, default=3600.0, help="Token lifetime (s)")
+    parser.add_argument("--burst", type=int, default=10, help="Concurrent callers on a cold cache")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    configure_logging(level=args.log_level)
+    if not asyncio.run(run(args)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
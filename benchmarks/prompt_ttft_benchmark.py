@@ -0,0 +1,192 @@
+"""
+Compare time to first token with the old and the assembled agent prompts.
+
+"before" reproduces what StatefulWorkflow used to send: the instructions, with the
+configuration values at the top, both as the agent's system prompt and again as a system
+message at the head of the input. "after" is the current layout: instructions built by
+prompts.assemble_instructions (configuration last) sent once by the Runner.
+
+Both run the same scripted conversations through Runner.run_streamed with the real agent
+definitions, tools and handoffs. By default the model is a stand-in whose first token
+takes `--base-ttft` plus `--prefill-ms` per uncached input token and `--cached-prefill-ms`
+per cached one, with prefix caching modelled on OpenAI's: a request reuses the longest
+prefix it shares with an earlier request, in 128-token steps, once the prompt is 1024
+tokens or longer. Sessions rotate over `--tenants` deployments with different
+configuration values. With `--live` the agents' own OpenAI models are used instead
+(needs OPENAI_API_KEY), and cached token counts come from the API's usage report.
+
+Usage:
+    python benchmarks/prompt_ttft_benchmark.py
+    python benchmarks/prompt_ttft_benchmark.py --sessions 6 --tenants 3 --turns 8
+    python benchmarks/prompt_ttft_benchmark.py --live --sessions 2 --turns 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import List
+
+import numpy as np
+from agents import Agent, set_tracing_disabled
+from agents.extensions.handoff_prompt import prompt_with_handoff_instructions
+from agents.run import Runner
+from agents.voice.workflow import VoiceWorkflowHelper
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_voice import StubChatModel, StubLatencies, StubScript
+
+USER_TURNS = [
+    "Hi, this is Priya from the Bhopal store",
+    "My billing counter printer is not working",
+    "It shows a paper jam error even with no paper inside",
+    "I opened the cover and there is nothing stuck",
+    "The light on the printer keeps blinking orange",
+    "I restarted it twice and it is still the same",
+    "Can you raise a ticket for this please",
+    "It is urgent because we have only one counter today",
+]
+
+
+class PrefixCachingModel(StubChatModel):
+    """StubChatModel whose time to first token depends on the uncached part of the prompt."""
+
+    def __init__(self, args, latencies: StubLatencies, script: StubScript):
+        super().__init__(latencies, script)
+        self.args = args
+        self.seen: List[str] = []
+        self.requests = []
+
+    def _prompt_text(self, system_instructions, input, tools, handoffs) -> str:
+        # Tools, then system prompt, then messages: the order the provider renders them in
+        schemas = [{"name": t.name, "description": t.description, "parameters": t.params_json_schema}
+                   for t in tools if hasattr(t, "params_json_schema")]
+        schemas += [{"name": h.tool_name, "description": h.tool_description,
+                     "parameters": h.input_json_schema} for h in handoffs]
+        return json.dumps(schemas) + (system_instructions or "") + json.dumps(input, default=str)
+
+    def _cached_tokens(self, text: str, tokens: int) -> int:
+        from prompts import count_tokens
+
+        if tokens < 1024:
+            return 0
+        shared = max((len(os.path.commonprefix([text, seen])) for seen in self.seen), default=0)
+        cached = count_tokens(text[:shared]) // 128 * 128
+        return min(cached, tokens)
+
+    async def stream_response(self, system_instructions, input, model_settings, tools,
+                              output_schema, handoffs, tracing, *, previous_response_id=None,
+                              conversation_id=None, prompt=None):
+        from prompts import count_tokens
+
+        text = self._prompt_text(system_instructions, input, tools, handoffs)
+        tokens = count_tokens(text)
+        cached = self._cached_tokens(text, tokens)
+        self.seen.append(text)
+        self.requests.append((tokens, cached))
+        self.latencies.llm_first_token = (
+            self.args.base_ttft
+            + (tokens - cached) * self.args.prefill_ms / 1000
+            + cached * self.args.cached_prefill_ms / 1000
+        )
+        async for event in super().stream_response(
+            system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+            previous_response_id=previous_response_id, conversation_id=conversation_id, prompt=prompt,
+        ):
+            yield event
+
+
+def instructions_for(layout: str, prompt: str, config: dict) -> str:
+    from prompts import assemble_instructions, render_configuration
+
+    if layout == "after":
+        return assemble_instructions(prompt, config)
+    # The old f-string prompts opened with the deployment's values
+    return f"{render_configuration(config)}\n\n{prompt_with_handoff_instructions(prompt.strip())}"
+
+
+async def converse(agent: Agent, layout: str, turns: int) -> list:
+    """One session; returns (ttft, input tokens or None, cached tokens or None) per turn."""
+    history, results = [], []
+    for text in (USER_TURNS * turns)[:turns]:
+        history.append({"role": "user", "content": text})
+        window = history[-10:]
+        if layout == "before":
+            window = [{"role": "system", "content": agent.instructions}, *window]
+        start = time.perf_counter()
+        result = Runner.run_streamed(agent, window)
+        ttft, answer = None, ""
+        async for chunk in VoiceWorkflowHelper.stream_text_from(result):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            answer += chunk
+        history.append({"role": "assistant", "content": answer})
+        usage = result.context_wrapper.usage
+        cached = getattr(usage.input_tokens_details, "cached_tokens", None) if usage.requests else None
+        results.append((ttft, usage.input_tokens or None, cached))
+    return results
+
+
+async def run(args) -> None:
+    from my_agents import Tech_Support_Agent, Ticket_Managment_Agent
+    from prompts import TECH_SUPPORT_PROMPT, TICKET_MANAGEMENT_PROMPT, prompt_token_report
+
+    cases = [
+        (Tech_Support_Agent, TECH_SUPPORT_PROMPT,
+         lambda i: {"Tenant ID": f"tenant-{i:04d}-2604a60a-8b35-4794", "Document ID": f"doc-{i:04d}-1b55ad3f"}),
+        (Ticket_Managment_Agent, TICKET_MANAGEMENT_PROMPT,
+         lambda i: {"Sheet Name": "Tickets", "Spreadsheet ID": f"1sheet{i:04d}xYz9AbCdEfGhIjKlMnOp",
+                    "Connection ID": f"conn-{i:04d}-google-sheet"}),
+    ]
+    print(f"{'agent':<24}{'layout':<8}{'in tokens':>10}{'cached':>8}{'ttft p50':>10}"
+          f"{'p95':>8}{'mean':>8}  (ms)")
+    for agent, prompt, config in cases:
+        for layout in ("before", "after"):
+            model = None if args.live else PrefixCachingModel(
+                args, StubLatencies(llm_token_interval=0.0), StubScript(use_tool=False, answer_words=30))
+            rows = []
+            for session in range(args.sessions):
+                tenant = agent.clone(
+                    instructions=instructions_for(layout, prompt, config(session % args.tenants)),
+                    **({} if model is None else {"model": model}),
+                )
+                rows += await converse(tenant, layout, args.turns)
+            if model is not None:
+                tokens = [t for t, _ in model.requests]
+                cached = [c for _, c in model.requests]
+            else:
+                tokens = [t for _, t, _ in rows if t]
+                cached = [c for _, _, c in rows if c is not None]
+            millis = np.asarray([r[0] for r in rows]) * 1000
+            print(f"{agent.name:<24}{layout:<8}{np.mean(tokens):>10.0f}"
+                  f"{(np.sum(cached) / np.sum(tokens) if tokens else 0):>8.0%}"
+                  f"{np.percentile(millis, 50):>10.0f}{np.percentile(millis, 95):>8.0f}{millis.mean():>8.0f}")
+
+    print()
+    for size in prompt_token_report([Tech_Support_Agent, Ticket_Managment_Agent]):
+        print(size)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=4, help="Conversations per agent and layout")
+    parser.add_argument("--tenants", type=int, default=2, help="Deployments the sessions rotate over")
+    parser.add_argument("--turns", type=int, default=6, help="User turns per conversation")
+    parser.add_argument("--base-ttft", type=float, default=0.25, help="Stub model fixed latency (s)")
+    parser.add_argument("--prefill-ms", type=float, default=0.08, help="Stub model ms per uncached token")
+    parser.add_argument("--cached-prefill-ms", type=float, default=0.01, help="Stub model ms per cached token")
+    parser.add_argument("--live", action="store_true", help="Use the agents' OpenAI models")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    from observability.log import configure_logging
+    configure_logging(level=args.log_level)
+    # Nothing to export traces to without an API key
+    set_tracing_disabled(not args.live)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,146 @@
+"""
+Load test: how many concurrent voice sessions one event loop (one core) can serve.
+
+For each count in `--sessions`, a VoiceServer runs that many VoiceSessions on one loop, as
+one box serving several store counters would. Every session has its own fake microphone
+and speaker (audio/backends.py) and the stub STT, TTS and chat models from stub_voice.py,
+and speaks `--turns` synthetic turns, each once its previous response has played. Starts
+are staggered so the sessions don't talk in lockstep.
+
+Reported per session count: time to first audio (end of speech to the first TTS audio
+queued), event loop lag (how late a 50 ms timer fires), CPU cores used by the process
+and CPU per session. A count passes while TTFA p95 stays within `--ttfa-budget` ms of the
+single-session p95 and loop lag p99 stays under `--lag-budget` ms; sessions per core is
+reported at the largest passing count.
+
+Usage:
+    python benchmarks/session_load_benchmark.py
+    python benchmarks/session_load_benchmark.py --sessions 1,8,32,64 --turns 4
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Long sessions would otherwise be summarized by a model over the network
+os.environ.setdefault("MEMORY_SUMMARIZER", "extractive")
+
+from audio.backends import FakeInputStream, FakeOutputStream
+from e2e_benchmark import BenchTracer, drive, room_noise
+from my_agents import Tech_Support_Agent
+from stub_voice import StubLatencies, StubScript, StubVoiceModelProvider, make_stub_agent
+from vad_benchmark import synthesize_turn
+from voice_server import VoiceServer
+
+
+async def loop_lag(samples: list, interval: float = 0.05) -> None:
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+async def run_session(server: VoiceServer, index: int, args, latencies, script, turns) -> list:
+    # Stagger starts over one pause so turns are spread out
+    await asyncio.sleep(random.Random(index).uniform(0, args.pause))
+    microphone = []
+
+    def capture_stream_factory(**kwargs):
+        stream = FakeInputStream(room_noise(args.pause + 1.0, args.noise_db, seed=index), **kwargs)
+        microphone.append(stream)
+        return stream
+
+    tracer = BenchTracer(asyncio.get_running_loop(), session=f"counter-{index}")
+    session = server.open_session(
+        session_id=f"counter-{index}",
+        agent=make_stub_agent(Tech_Support_Agent, latencies, script),
+        input_mode=args.mode,
+        capture_stream_factory=capture_stream_factory,
+        playback_stream_factory=FakeOutputStream,
+        tracer=tracer,
+    )
+    closed = asyncio.ensure_future(session.wait_closed())
+    results = await drive(turns, tracer, microphone, session, closed, args.pause, args.timeout,
+                          args.noise_db)
+    await closed
+    return results
+
+
+async def run_load(count: int, args, turns) -> dict:
+    latencies = StubLatencies(llm_first_token=args.llm_latency, tts_first_byte=args.tts_latency)
+    script = StubScript(use_tool=True, answer_words=args.answer_words)
+    lag = []
+    async with VoiceServer(model_provider=StubVoiceModelProvider(latencies, script), tts_cache=False) as server:
+        monitor = asyncio.create_task(loop_lag(lag))
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        per_session = await asyncio.gather(*(
+            run_session(server, index, args, latencies, script, turns) for index in range(count)
+        ))
+        cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+        monitor.cancel()
+    ttfa = [r["ttfa_ms"] for results in per_session for r in results if r["ttfa_ms"] is not None]
+    return {
+        "sessions": count,
+        "turns": len(ttfa),
+        "expected": count * len(turns),
+        "ttfa_p50": float(np.percentile(ttfa, 50)) if ttfa else float("nan"),
+        "ttfa_p95": float(np.percentile(ttfa, 95)) if ttfa else float("nan"),
+        "lag_p99": float(np.percentile(lag, 99)) * 1000 if lag else 0.0,
+        "cores": cpu / wall,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", default="1,2,4,8,16,32", help="Comma-separated session counts")
+    parser.add_argument("--turns", type=int, default=3, help="Turns per session")
+    parser.add_argument("--mode", choices=("streamed", "buffered"), default="streamed")
+    parser.add_argument("--pause", type=float, default=1.0, help="Silence before each user turn (s)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Give up on a turn after (s)")
+    parser.add_argument("--noise-db", type=float, default=-55.0)
+    parser.add_argument("--llm-latency", type=float, default=0.4)
+    parser.add_argument("--tts-latency", type=float, default=0.2)
+    parser.add_argument("--answer-words", type=int, default=30)
+    parser.add_argument("--ttfa-budget", type=float, default=250.0, help="Allowed TTFA p95 growth (ms)")
+    parser.add_argument("--lag-budget", type=float, default=50.0, help="Allowed loop lag p99 (ms)")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    from agents import set_tracing_disabled
+    from observability.log import configure_logging
+    configure_logging(level=args.log_level)
+    set_tracing_disabled(True)
+
+    turns = []
+    for seed in range(args.turns):
+        audio, _, speech_end = synthesize_turn(lead_silence=0.3, trail_silence=1.5, seed=seed)
+        turns.append((audio, speech_end))
+
+    print(f"{'sessions':>8}{'turns':>9}{'ttfa p50':>10}{'p95':>7}{'lag p99 ms':>12}"
+          f"{'cores':>7}{'cpu/session':>13}{'sessions/core':>15}  ok")
+    baseline, best = None, None
+    for count in (int(value) for value in args.sessions.split(",")):
+        result = asyncio.run(run_load(count, args, turns))
+        if baseline is None:
+            baseline = result["ttfa_p95"]
+        ok = (result["turns"] == result["expected"]
+              and result["ttfa_p95"] <= baseline + args.ttfa_budget
+              and result["lag_p99"] <= args.lag_budget)
+        per_core = count / result["cores"] if result["cores"] else float("inf")
+        if ok:
+            best = (count, per_core)
+        print(f"{count:>8}{result['turns']:>5}/{result['expected']:<3}{result['ttfa_p50']:>10.0f}"
+              f"{result['ttfa_p95']:>7.0f}{result['lag_p99']:>12.1f}{result['cores']:>7.2f}"
+              f"{result['cores'] / count * 100:>12.1f}%{per_core:>15.1f}  {'yes' if ok else 'no'}")
+    if best:
+        print(f"\n{best[1]:.0f} sessions per core (measured at {best[0]} concurrent sessions within budget)")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,160 @@
+"""
+Scaling test for SessionSupervisor: concurrent voice sessions versus worker processes.
+
+For each count in `--workers`, a supervisor starts that many worker processes, each a
+VoiceGateway with the stub STT, TTS and chat models from stub_voice.py, and
+`--sessions-per-worker` clients per worker talk to it through the supervisor's port as
+gateway_benchmark.py's callers do. Sessions are routed by their id, so the load spreads
+over the workers by hash.
+
+Reported per worker count: turns completed, time to first audio at the client, how the
+sessions were spread over the workers, CPU used by the workers (summed over all of them),
+and sessions per worker core. Scaling is linear while TTFA stays flat as workers and
+sessions grow together; that needs at least as many free cores as workers, and the load
+generator and the supervisor's forwarding also need CPU on the same machine.
+
+`--restart-at` restarts every worker that many seconds into each run; all turns should
+still complete because the old workers drain their sessions.
+
+Usage:
+    python benchmarks/shard_benchmark.py
+    python benchmarks/shard_benchmark.py --workers 1,2,4,8 --sessions-per-worker 24
+    python benchmarks/shard_benchmark.py --workers 2 --restart-at 5
+"""
+import argparse
+import asyncio
+import functools
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("MEMORY_SUMMARIZER", "extractive")
+
+from gateway_benchmark import caller
+from my_agents import Tech_Support_Agent
+from session_supervisor import SessionSupervisor
+from stub_voice import StubLatencies, StubScript, StubVoiceModelProvider, make_stub_agent
+from vad_benchmark import synthesize_turn
+from voice_gateway import VoiceGateway
+from voice_server import VoiceServer
+
+
+def stub_gateway(llm_latency: float, tts_latency: float, answer_words: int, mode: str,
+                 log_level: str) -> VoiceGateway:
+    """Worker gateway with stub models; runs in the worker process."""
+    from agents import set_tracing_disabled
+    from observability.log import configure_logging
+    configure_logging(level=log_level)
+    set_tracing_disabled(True)
+    latencies = StubLatencies(llm_first_token=llm_latency, tts_first_byte=tts_latency)
+    script = StubScript(use_tool=True, answer_words=answer_words)
+    server = VoiceServer(model_provider=StubVoiceModelProvider(latencies, script), tts_cache=False)
+    return VoiceGateway(server, host="127.0.0.1", port=0, session_options={
+        "agent": make_stub_agent(Tech_Support_Agent, latencies, script),
+        "input_mode": mode,
+    })
+
+
+def workers_cpu(supervisor: SessionSupervisor) -> float:
+    """CPU seconds used so far by the supervisor's current workers."""
+    total = 0.0
+    for worker in supervisor.metrics()["workers"]:
+        try:
+            with open(f"/proc/{worker['pid']}/stat") as stat:
+                fields = stat.read().rsplit(")", 1)[1].split()
+            total += (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        except OSError:
+            # No procfs; count everything the children used, start-up included, once they exit
+            usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            return usage.ru_utime + usage.ru_stime
+    return total
+
+
+async def run_workers(workers: int, args, turns) -> dict:
+    factory = functools.partial(stub_gateway, args.llm_latency, args.tts_latency, args.answer_words, args.mode,
+                                args.log_level)
+    supervisor = SessionSupervisor(workers=workers, host="127.0.0.1", port=0, gateway_factory=factory,
+                                   drain_timeout=args.timeout * len(turns))
+    await supervisor.start()
+    url = f"ws://127.0.0.1:{supervisor.port}"
+    count = workers * args.sessions_per_worker
+    # Measured from here so the workers' start-up imports don't count
+    cpu_start, wall_start = workers_cpu(supervisor), time.perf_counter()
+
+    async def spread():
+        await asyncio.sleep(args.pause * 2)
+        return [worker["connections"] for worker in supervisor.metrics()["workers"]]
+
+    async def restart():
+        await asyncio.sleep(args.restart_at)
+        await supervisor.restart()
+
+    sampler = asyncio.create_task(spread())
+    restarter = asyncio.create_task(restart()) if args.restart_at else None
+    try:
+        per_client = await asyncio.gather(*(caller(url, index, turns, args) for index in range(count)))
+        cpu, wall = workers_cpu(supervisor) - cpu_start, time.perf_counter() - wall_start
+    finally:
+        if restarter is not None:
+            await restarter
+        await supervisor.aclose()
+    results = [result for client in per_client for result in client]
+    ttfa = [result["ttfa_ms"] for result in results]
+    return {
+        "workers": workers,
+        "sessions": count,
+        "turns": len(results),
+        "expected": count * len(turns),
+        "ttfa_p50": float(np.percentile(ttfa, 50)) if ttfa else float("nan"),
+        "ttfa_p95": float(np.percentile(ttfa, 95)) if ttfa else float("nan"),
+        "spread": await sampler,
+        # Restarted workers are new processes, so their CPU time can't be compared
+        "cores": float("nan") if args.restart_at else cpu / wall,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    cores = os.cpu_count() or 1
+    parser.add_argument("--workers", default=",".join(str(2 ** i) for i in range(8) if 2 ** i <= cores),
+                        help="Comma-separated worker counts (default: powers of two up to the core count)")
+    parser.add_argument("--sessions-per-worker", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=3, help="Turns per session")
+    parser.add_argument("--mode", choices=("streamed", "buffered"), default="streamed")
+    parser.add_argument("--pause", type=float, default=1.0, help="Silence before each question (s)")
+    parser.add_argument("--gap", type=float, default=1.0, help="Silence that ends a response (s)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Give up on a turn after (s)")
+    parser.add_argument("--restart-at", type=float, default=0.0, help="Restart the workers after (s)")
+    parser.add_argument("--noise-db", type=float, default=-55.0)
+    parser.add_argument("--llm-latency", type=float, default=0.4)
+    parser.add_argument("--tts-latency", type=float, default=0.2)
+    parser.add_argument("--answer-words", type=int, default=30)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    from observability.log import configure_logging
+    configure_logging(level=args.log_level)
+
+    turns = []
+    for seed in range(args.turns):
+        audio, _, speech_end = synthesize_turn(lead_silence=0.3, trail_silence=0.5, seed=seed)
+        turns.append((audio, speech_end))
+
+    print(f"{os.cpu_count()} CPU cores")
+    print(f"{'workers':>8}{'sessions':>10}{'turns':>9}{'ttfa p50':>10}{'p95':>7}"
+          f"{'worker cores':>14}{'sessions/core':>15}  spread")
+    for workers in (int(value) for value in args.workers.split(",")):
+        result = asyncio.run(run_workers(workers, args, turns))
+        per_core = result["sessions"] / result["cores"] if result["cores"] else float("inf")
+        print(f"{workers:>8}{result['sessions']:>10}{result['turns']:>5}/{result['expected']:<3}"
+              f"{result['ttfa_p50']:>10.0f}{result['ttfa_p95']:>7.0f}{result['cores']:>14.2f}"
+              f"{per_core:>15.1f}  {result['spread']}")
+
+
+if __name__ == "__main__":
+    main_cli()
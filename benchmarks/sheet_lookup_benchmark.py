@@ -0,0 +1,214 @@
+"""
+Measure bytes transferred and latency of ticket lookups as the ticket sheet grows.
+
+A stub server on localhost plays the Sheets values API and the visualization query
+endpoint for a sheet of synthetic tickets (18 columns, A-R). Each lookup is run three
+ways:
+
+- column scan: the previous find_row, which downloads the lookup column, scans it and
+  then fetches the matching row (two round trips);
+- query: SheetLookup, which downloads the column while a server-side filtered query
+  fetches the row (one round trip, one more request);
+- fallback: SheetLookup when the query endpoint is unavailable, which fetches the row by
+  index after the scan (after one failed query per spreadsheet).
+
+Every response is delayed by `--rtt` plus its size divided by `--bandwidth`, so the
+numbers reflect a remote API rather than localhost.
+
+Usage:
+    python benchmarks/sheet_lookup_benchmark.py
+    python benchmarks/sheet_lookup_benchmark.py --rows 1000 10000 50000 --rtt 0.12 --bandwidth 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from observability.log import configure_logging
+from tools.http_client import aclose_http_client, get_http_client
+from tools.sheet_lookup import SheetLookup
+
+SHEET = "Tickets"
+HEADER = ["Issue No", "Location", "Level-1", "Level-2", "Level-3", "Problem", "Submit Date",
+          "Submit Time", "WIP Date", "WIP Time", "Solved Date", "Solved Time", "TAT", "Submit By",
+          "Solved By", "RCA", "RCA By", "Priority"]
+
+
+def synthesize_sheet(rows: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    sheet = [HEADER]
+    for i in range(rows):
+        solved = rng.random() < 0.7
+        sheet.append([
+            f"2025{i // 1440 % 12 + 1:02d}{i // 60 % 28 + 1:02d}{i % 10000:04d}",
+            f"Store {rng.randint(1, 600)}",
+            rng.choice(["Hardware", "Software", "Network"]),
+            rng.choice(["PoS", "Weighing machine", "Printer", "Scanner"]),
+            rng.choice(["Not working", "Error code", "Slow", "Display issue"]),
+            "Billing counter device stops responding after a few transactions",
+            "15-Feb-25", "08:29 AM IST",
+            "15-Feb-25", "10:05 AM IST",
+            "16-Feb-25" if solved else "", "11:40 AM IST" if solved else "",
+            "27:11" if solved else "",
+            f"Staff {rng.randint(1, 300)}",
+            f"Engineer {rng.randint(1, 40)}" if solved else "",
+            "Replaced thermal printer head" if solved else "",
+            f"Engineer {rng.randint(1, 40)}" if solved else "",
+            rng.choice(["P1", "P2", "P3"]),
+        ])
+    return sheet
+
+
+class StubSheets:
+    """Serves one synthetic sheet through the values API and the query endpoint."""
+
+    def __init__(self, sheet: list, rtt: float, bandwidth: float):
+        self.sheet = sheet
+        self.rtt = rtt
+        self.bandwidth = bandwidth * 2 ** 20
+        self.requests = 0
+        self.bytes_sent = 0
+        self.index = {row[0]: i for i, row in enumerate(sheet)}
+        self.column_body = json.dumps({
+            "range": f"{SHEET}!A1:A{len(sheet)}", "majorDimension": "ROWS",
+            "values": [[row[0]] for row in sheet],
+        }).encode()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                status, body = stub.route(urlparse(self.path))
+                stub.requests += 1
+                stub.bytes_sent += len(body)
+                time.sleep(stub.rtt + len(body) / stub.bandwidth)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def route(self, url) -> tuple:
+        if "/gviz/tq" in url.path:
+            if "/noquery/" in url.path:
+                return 403, b"{}"
+            tq = parse_qs(url.query)["tq"][0]
+            value = re.search(r"where A = '([^']*)'", tq).group(1)
+            row = self.sheet[self.index[value]] if value in self.index else None
+            table = {
+                "cols": [{"id": chr(65 + i), "label": h, "type": "string"} for i, h in enumerate(HEADER)],
+                "rows": [{"c": [{"v": cell} if cell else None for cell in row]}] if row else [],
+                "parsedNumHeaders": 1,
+            }
+            payload = {"version": "0.6", "reqId": "0", "status": "ok", "table": table}
+            return 200, ("/*O_o*/\ngoogle.visualization.Query.setResponse("
+                         + json.dumps(payload) + ");").encode()
+
+        cell_range = unquote(url.path.rsplit("/values/", 1)[1])
+        _, cells = cell_range.split("!")
+        if cells == "A:A":
+            return 200, self.column_body
+        start = int(cells.split(":")[0])
+        return 200, json.dumps({"range": f"{SHEET}!A{start}:R{start}",
+                                "values": [self.sheet[start - 1]]}).encode()
+
+    def reset(self):
+        self.requests = 0
+        self.bytes_sent = 0
+
+    def close(self):
+        self.server.shutdown()
+
+
+async def column_scan(client, base_url: str, value: str) -> dict:
+    """The previous find_row: download the lookup column, then fetch the matching row."""
+    headers = {"Authorization": "Bearer stub"}
+    response = await client.get(f"{base_url}/v4/spreadsheets/sheet/values/{SHEET}!A:A", headers=headers)
+    for index, row in enumerate(response.json().get("values", []), start=1):
+        if row and row[0] == value:
+            row_response = await client.get(
+                f"{base_url}/v4/spreadsheets/sheet/values/{SHEET}!{index}:{index}", headers=headers)
+            return {"status": "success", "row_data": row_response.json()["values"][0]}
+    return {"status": "failed"}
+
+
+async def measure(stub: StubSheets, lookup, values: list) -> dict:
+    stub.reset()
+    latencies = []
+    for value in values:
+        start = time.perf_counter()
+        result = await lookup(value)
+        latencies.append(time.perf_counter() - start)
+        assert result["status"] == "success" and result["row_data"][0] == value, result
+        assert result.get("row_index", stub.index[value] + 1) == stub.index[value] + 1, result
+    return {
+        "requests": stub.requests / len(values),
+        "kb": stub.bytes_sent / len(values) / 1024,
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000,
+        "p95_ms": float(np.percentile(latencies, 95)) * 1000,
+    }
+
+
+async def run(args) -> list:
+    client = get_http_client()
+    results = []
+    try:
+        for rows in args.rows:
+            sheet = synthesize_sheet(rows)
+            stub = StubSheets(sheet, args.rtt, args.bandwidth)
+            rng = random.Random(rows)
+            values = [sheet[rng.randint(1, rows)][0] for _ in range(args.lookups)]
+            engine = SheetLookup(client, sheets_api_url=f"{stub.url}/v4/spreadsheets",
+                                 query_api_url=f"{stub.url}/d")
+            strategies = {
+                "column scan": lambda v: column_scan(client, stub.url, v),
+                "query": lambda v: engine.find_row("stub", "sheet", SHEET, v, "A"),
+                "fallback": lambda v: engine.find_row("stub", "noquery", SHEET, v, "A"),
+            }
+            for name, lookup in strategies.items():
+                results.append({"rows": rows, "strategy": name, **await measure(stub, lookup, values)})
+            stub.close()
+    finally:
+        await aclose_http_client()
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--lookups", type=int, default=10, help="Lookups per sheet size")
+    parser.add_argument("--rtt", type=float, default=0.1, help="Per-request latency (s)")
+    parser.add_argument("--bandwidth", type=float, default=4.0, help="Download speed (MB/s)")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    configure_logging(level=args.log_level)
+    results = asyncio.run(run(args))
+
+    print(f"{'rows':>7}  {'strategy':<12}{'requests':>9}{'KB':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for r in results:
+        print(f"{r['rows']:>7}  {r['strategy']:<12}{r['requests']:>9.1f}{r['kb']:>10.1f}"
+              f"{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main_cli()
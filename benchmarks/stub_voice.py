@@ -0,0 +1,303 @@
+"""
+Offline stand-ins for the OpenAI STT, TTS and chat models and for the external tools.
+
+Every stub sleeps for a configurable latency instead of calling the network, so the voice
+loop in main.py can be exercised end to end on a machine without a microphone, speaker,
+API key or Vespa/Sheets access. Used by the benchmarks in this directory.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional
+
+import numpy as np
+from agents import Agent, function_tool
+from agents.models.interface import Model
+from agents.items import ModelResponse
+from agents.usage import Usage
+from agents.voice import (
+    AudioInput,
+    StreamedAudioInput,
+    STTModel,
+    STTModelSettings,
+    StreamedTranscriptionSession,
+    TTSModel,
+    TTSModelSettings,
+    VoiceModelProvider,
+)
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseFunctionToolCall,
+    ResponseOutputMessage,
+    ResponseOutputText,
+    ResponseTextDeltaEvent,
+)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio.vad import EnergyZcrVAD
+
+SAMPLERATE = 24000
+
+
+@dataclass
+class StubLatencies:
+    """Artificial latencies, in seconds, applied by the stubs."""
+
+    stt: float = 0.3
+    """From the end of the audio (or the streamed endpoint) to the transcript."""
+
+    llm_first_token: float = 0.4
+    """From the model request to the first text delta or tool call."""
+
+    llm_token_interval: float = 0.02
+    """Between text deltas."""
+
+    tool: float = 0.25
+    """Duration of each stub tool call."""
+
+    tts_first_byte: float = 0.2
+    """From the TTS request to the first audio chunk."""
+
+    tts_realtime_factor: float = 0.1
+    """Synthesis time per second of generated audio."""
+
+
+@dataclass
+class StubScript:
+    """What the stub user says and how the stub model answers."""
+
+    transcripts: List[str] = field(default_factory=lambda: [
+        "My billing counter printer is not working",
+        "It shows a paper jam error even with no paper inside",
+        "Can you raise a ticket for this please",
+    ])
+    answer_words: int = 40
+    """Length of each spoken answer."""
+
+    use_tool: bool = True
+    """Call search_knowledge_base before answering, like the tech support agent does."""
+
+
+class StubTranscriptionSession(StreamedTranscriptionSession):
+    """
+    Streamed STT stand-in: endpoints the incoming audio with EnergyZcrVAD and returns the
+    next scripted transcript for every utterance.
+    """
+
+    def __init__(self, input: StreamedAudioInput, provider: "StubVoiceModelProvider"):
+        self._input = input
+        self._provider = provider
+        self._vad = EnergyZcrVAD(samplerate=SAMPLERATE, endpoint_timeout=0.3)
+
+    async def transcribe_turns(self) -> AsyncIterator[str]:
+        while True:
+            block = await self._input.queue.get()
+            if block is None:
+                return
+            if block.dtype == np.int16:
+                block = block.astype(np.float32) / 32768.0
+            if self._vad.process(block).endpoint:
+                self._vad.reset()
+                await asyncio.sleep(self._provider.latencies.stt)
+                yield self._provider.next_transcript()
+
+    async def close(self) -> None:
+        pass
+
+
+class StubSTTModel(STTModel):
+    def __init__(self, provider: "StubVoiceModelProvider"):
+        self._provider = provider
+
+    @property
+    def model_name(self) -> str:
+        return "stub-stt"
+
+    async def transcribe(self, input: AudioInput, settings: STTModelSettings,
+                         trace_include_sensitive_data: bool,
+                         trace_include_sensitive_audio_data: bool) -> str:
+        await asyncio.sleep(self._provider.latencies.stt)
+        return self._provider.next_transcript()
+
+    async def create_session(self, input: StreamedAudioInput, settings: STTModelSettings,
+                             trace_include_sensitive_data: bool,
+                             trace_include_sensitive_audio_data: bool) -> StreamedTranscriptionSession:
+        return StubTranscriptionSession(input, self._provider)
+
+
+class StubTTSModel(TTSModel):
+    """
+    Yields 1024-byte PCM chunks like the OpenAI TTS model does, about 70 ms of a voiced
+    tone per word of input text.
+    """
+
+    chunk_bytes = 1024
+
+    def __init__(self, provider: "StubVoiceModelProvider"):
+        self._provider = provider
+
+    @property
+    def model_name(self) -> str:
+        return "stub-tts"
+
+    async def run(self, text: str, settings: TTSModelSettings) -> AsyncIterator[bytes]:
+        latencies = self._provider.latencies
+        await asyncio.sleep(latencies.tts_first_byte)
+        seconds = 0.07 * max(len(text.split()), 1)
+        t = np.arange(int(seconds * SAMPLERATE)) / SAMPLERATE
+        tone = 0.2 * np.sin(2 * np.pi * 150 * t) * np.hanning(t.shape[0]) ** 0.3
+        pcm = (tone * 32767).astype(np.int16).tobytes()
+        chunk_seconds = self.chunk_bytes / 2 / SAMPLERATE
+        for offset in range(0, len(pcm), self.chunk_bytes):
+            await asyncio.sleep(chunk_seconds * latencies.tts_realtime_factor)
+            yield pcm[offset:offset + self.chunk_bytes]
+
+
+class StubVoiceModelProvider(VoiceModelProvider):
+    def __init__(self, latencies: Optional[StubLatencies] = None, script: Optional[StubScript] = None):
+        self.latencies = latencies or StubLatencies()
+        self.script = script or StubScript()
+        self.turns_transcribed = 0
+
+    def next_transcript(self) -> str:
+        text = self.script.transcripts[self.turns_transcribed % len(self.script.transcripts)]
+        self.turns_transcribed += 1
+        return text
+
+    def get_stt_model(self, model_name: Optional[str]) -> STTModel:
+        return StubSTTModel(self)
+
+    def get_tts_model(self, model_name: Optional[str]) -> TTSModel:
+        return StubTTSModel(self)
+
+
+def _text_of(item) -> str:
+    content = item.get("content") if isinstance(item, dict) else None
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+class StubChatModel(Model):
+    """
+    Model stand-in for the Runner. Streams a canned answer word by word and, if the script
+    says so, first asks for a search_knowledge_base call for each new user message.
+    """
+
+    def __init__(self, latencies: Optional[StubLatencies] = None, script: Optional[StubScript] = None):
+        self.latencies = latencies or StubLatencies()
+        self.script = script or StubScript()
+        self.calls = 0
+        self.input_items = []
+
+    def _next_output(self, input) -> tuple:
+        items = [{"role": "user", "content": input}] if isinstance(input, str) else list(input)
+        self.input_items.append(len(items))
+        last = items[-1] if items else {}
+        wants_tool = (
+            self.script.use_tool
+            and isinstance(last, dict)
+            and last.get("role") == "user"
+        )
+        if wants_tool:
+            arguments = {"query": _text_of(last), "tenant_id": "bench", "limit": 3,
+                         "document_id": None, "collection_id": None}
+            call = ResponseFunctionToolCall(
+                id=f"fc_{self.calls}", call_id=f"call_{self.calls}", type="function_call",
+                name="search_knowledge_base", arguments=json.dumps(arguments),
+            )
+            return call, None
+
+        user_text = next((_text_of(i) for i in reversed(items)
+                          if isinstance(i, dict) and i.get("role") == "user"), "")
+        words = (f"Thanks for explaining. About {user_text.lower()}, here is what to try."
+                 .split())
+        while len(words) < self.script.answer_words:
+            words.extend("Please check the cable and restart the device once.".split())
+        text = " ".join(words[: self.script.answer_words])
+        message = ResponseOutputMessage(
+            id=f"msg_{self.calls}", type="message", role="assistant", status="completed",
+            content=[ResponseOutputText(type="output_text", text=text, annotations=[])],
+        )
+        return message, text
+
+    @staticmethod
+    def _response(output) -> Response:
+        return Response(
+            id="stub-response", created_at=time.time(), model="stub-chat", object="response",
+            output=[output], tool_choice="auto", tools=[], top_p=None,
+            parallel_tool_calls=False, status="completed",
+        )
+
+    async def get_response(self, system_instructions, input, model_settings, tools,
+                           output_schema, handoffs, tracing, *, previous_response_id=None,
+                           conversation_id=None, prompt=None) -> ModelResponse:
+        self.calls += 1
+        await asyncio.sleep(self.latencies.llm_first_token)
+        output, _ = self._next_output(input)
+        return ModelResponse(output=[output], usage=Usage(requests=1), response_id=None)
+
+    async def stream_response(self, system_instructions, input, model_settings, tools,
+                              output_schema, handoffs, tracing, *, previous_response_id=None,
+                              conversation_id=None, prompt=None):
+        self.calls += 1
+        await asyncio.sleep(self.latencies.llm_first_token)
+        output, text = self._next_output(input)
+        sequence = 0
+        if text is not None:
+            for index, word in enumerate(text.split(" ")):
+                if index:
+                    await asyncio.sleep(self.latencies.llm_token_interval)
+                yield ResponseTextDeltaEvent(
+                    type="response.output_text.delta", item_id=output.id, output_index=0,
+                    content_index=0, delta=word if index == 0 else " " + word, logprobs=[],
+                    sequence_number=sequence,
+                )
+                sequence += 1
+        yield ResponseCompletedEvent(
+            type="response.completed", response=self._response(output), sequence_number=sequence,
+        )
+
+
+def make_stub_tools(latencies: StubLatencies) -> list:
+    """Tools with the names and schemas the agents expect that sleep instead of calling out."""
+
+    @function_tool(name_override="search_knowledge_base", strict_mode=True)
+    async def search_knowledge_base(query: str, tenant_id: str, limit: int,
+                              document_id: Optional[str] = None,
+                              collection_id: Optional[str] = None):
+        """Stub knowledge base search.
+
+        Args:
+            query: The search query text
+            tenant_id: The tenant ID to filter by
+            limit: Maximum number of results to return
+            document_id: Optional single document ID to filter by
+            collection_id: Optional collection ID to filter by
+        """
+        await asyncio.sleep(latencies.tool)
+        return {"result": [{"content": f"Steps for: {query}", "title": "Printer guide"}],
+                "error": None}
+
+    return [search_knowledge_base]
+
+
+def make_stub_agent(base_agent: Agent, latencies: Optional[StubLatencies] = None,
+                    script: Optional[StubScript] = None) -> Agent:
+    """
+    Copy `base_agent` (normally Tech_Support_Agent) with the stub model and stub tools. The
+    instructions are kept so prompt size is realistic.
+    """
+    latencies = latencies or StubLatencies()
+    return base_agent.clone(
+        model=StubChatModel(latencies, script),
+        tools=make_stub_tools(latencies),
+        handoffs=[],
+    )
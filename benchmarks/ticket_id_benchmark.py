@@ -0,0 +1,84 @@
+"""
+Check that ticket numbers stay unique and increasing when several processes allocate at once.
+
+`--processes` worker processes each allocate `--tickets` numbers from one SQLite file as
+fast as they can, all within a few minutes, so per-minute sequences overflow into the
+next minute. The script checks the numbers are unique, increase within each process,
+are all 12 digits and decode to a valid minute, and reports the allocation rate. It
+also checks that a clock stepping back does not produce lower numbers.
+
+Usage:
+    python benchmarks/ticket_id_benchmark.py
+    python benchmarks/ticket_id_benchmark.py --processes 8 --tickets 2000
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def worker(path: str, count: int, queue) -> None:
+    from tools.ticket_ids import TicketIdAllocator
+
+    allocator = TicketIdAllocator(path=path, busy_timeout=30)
+    numbers = [allocator.allocate()["issue_no"] for _ in range(count)]
+    allocator.close()
+    queue.put(numbers)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--tickets", type=int, default=500, help="Numbers per process")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    from observability.log import configure_logging
+    from tools.ticket_ids import TicketIdAllocator
+    from tools.ticket_index import IST
+
+    configure_logging(level=args.log_level)
+    ok = True
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "ids.sqlite3")
+        TicketIdAllocator(path=path).close()
+
+        queue = multiprocessing.Queue()
+        start = time.perf_counter()
+        processes = [multiprocessing.Process(target=worker, args=(path, args.tickets, queue))
+                     for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        numbers = [n for result in results for n in result]
+        unique = len(set(numbers)) == len(numbers)
+        increasing = all(result == sorted(result) and len(set(result)) == len(result) for result in results)
+        well_formed = all(len(n) == 12 and datetime.strptime(n[:10], "%y%m%d%H%M") for n in numbers)
+        print(f"{len(numbers)} numbers from {args.processes} processes in {elapsed:.2f} s "
+              f"({len(numbers) / elapsed:.0f}/s): {min(numbers)} .. {max(numbers)}")
+        print(f"unique: {unique}  increasing per process: {increasing}  12-digit minutes: {well_formed}")
+        ok &= unique and increasing and well_formed
+
+        allocator = TicketIdAllocator(path=path)
+        now = datetime.now(IST)
+        ahead = allocator.allocate(now=now + timedelta(hours=1))["issue_no"]
+        behind = allocator.allocate(now=now)["issue_no"]
+        allocator.close()
+        print(f"clock steps back: {ahead} then {behind}: {'ok' if behind > ahead else 'FAILED'}")
+        ok &= behind > ahead
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
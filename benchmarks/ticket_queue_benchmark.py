@@ -0,0 +1,225 @@
+"""
+Measure ticket creation latency and throughput with and without the write-behind queue.
+
+A stub server on localhost plays Nango and the Sheets values API. Appends to a sheet are
+applied one request at a time, taking `--append-latency` plus `--row-latency` per row, and
+can fail with a 503 (`--error-rate`) or time out after the rows were applied
+(`--timeout-rate`), the case that makes a naive retry duplicate tickets.
+
+`--stores` concurrent callers each create `--tickets` tickets. For the direct path every
+caller waits for its own append, as create_ticket used to. For the queue the caller waits
+for the journal write only, and the script also reports how long the worker took to get
+every ticket into the sheet and how many requests that took. At the end the sheet is
+checked for lost and duplicated issue numbers.
+
+Usage:
+    python benchmarks/ticket_queue_benchmark.py
+    python benchmarks/ticket_queue_benchmark.py --stores 50 --tickets 4 --error-rate 0.1 --timeout-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SHEET = "Tickets"
+
+
+class StubSheets:
+    """Nango plus an in-memory sheet with serialized, slow and sometimes failing appends."""
+
+    def __init__(self, args):
+        self.args = args
+        self.rows = [["Issue No", "Location"]]
+        self.append_requests = 0
+        self.lock = threading.Lock()
+        self.rng = random.Random(0)
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client timed out
+
+            def do_GET(self):
+                path = unquote(urlparse(self.path).path)
+                if path.startswith("/connection/"):
+                    return self.reply(200, {"credentials": {"access_token": "stub",
+                                                            "expires_at": "2999-01-01T00:00:00Z"}})
+                start = int(re.search(r"!A(\d+):R", path).group(1))
+                with stub.lock:
+                    values = [row[:] for row in stub.rows[start - 1:]]
+                self.reply(200, {"values": values})
+
+            def do_POST(self):
+                rows = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["values"]
+                roll = stub.rng.random()
+                with stub.lock:
+                    stub.append_requests += 1
+                    time.sleep(stub.args.append_latency + stub.args.row_latency * len(rows))
+                    if roll < stub.args.error_rate:
+                        return self.reply(503, {"error": "backend error"})
+                    first = len(stub.rows) + 1
+                    stub.rows.extend(rows)
+                last = first + len(rows) - 1
+                if roll < stub.args.error_rate + stub.args.timeout_rate:
+                    # Applied, but the client gives up before the response arrives
+                    time.sleep(stub.args.client_timeout * 2)
+                self.reply(200, {"updates": {"updatedRange": f"{SHEET}!A{first}:R{last}",
+                                             "updatedRows": len(rows)}})
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def issue_numbers(self) -> Counter:
+        with self.lock:
+            return Counter(row[0] for row in self.rows[1:])
+
+    def reset(self):
+        with self.lock:
+            self.rows = self.rows[:1]
+            self.append_requests = 0
+
+    def close(self):
+        self.server.shutdown()
+
+
+def ticket_row(store: int, n: int) -> list:
+    return [f"{store:06d}{n:06d}", f"Store {store}", "HARDWARE", "PRINTER", "NOT WORKING",
+            "Receipt printer jams", "15-Feb-25", "08:29 AM", "", "", "", "", "", "Staff", "", "",
+            "", "MEDIUM"]
+
+
+async def producers(args, create) -> list:
+    latencies = []
+
+    async def store(index):
+        rng = random.Random(index)
+        for n in range(args.tickets):
+            await asyncio.sleep(rng.uniform(0, args.spread))
+            start = time.perf_counter()
+            await create(ticket_row(index, n))
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(store(i) for i in range(args.stores)))
+    return latencies
+
+
+def report(name: str, latencies: list, persisted_s: float, requests: int, issues: Counter, expected: int):
+    millis = np.asarray(latencies) * 1000
+    duplicates = sum(count - 1 for count in issues.values() if count > 1)
+    lost = expected - len(issues)
+    print(f"{name:<8}{np.percentile(millis, 50):>9.0f}{np.percentile(millis, 95):>9.0f}"
+          f"{np.percentile(millis, 99):>9.0f}{millis.max():>9.0f}{persisted_s:>11.2f}"
+          f"{expected / persisted_s:>10.1f}{requests:>10}{lost:>6}{duplicates:>6}")
+    return lost == 0 and duplicates == 0
+
+
+async def run(args) -> bool:
+    import tools.nango_credentials as nango
+    import tools.ticket_index as ticket_index
+    from tools.http_client import aclose_http_client, get_http_client
+    from tools.ticket_queue import TicketWriteQueue
+
+    stub = StubSheets(args)
+    # Point the process-wide credential manager and ticket index at the stub
+    nango._manager = nango.NangoCredentialManager(base_url=stub.url, secret_key="stub")
+    ticket_index._index = ticket_index.TicketIndex(
+        path=os.path.join(args.workdir, "index.sqlite3"), sheets_api_url=f"{stub.url}/v4/spreadsheets")
+    expected = args.stores * args.tickets
+    print(f"{'':<8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'in sheet s':>11}"
+          f"{'tickets/s':>10}{'requests':>10}{'lost':>6}{'dup':>6}")
+    ok = True
+    try:
+        client = get_http_client()
+
+        async def direct(row):
+            # The previous create_ticket: one append per ticket, the caller waits for it and
+            # a failure is reported back to the caller rather than retried
+            try:
+                response = await client.post(
+                    f"{stub.url}/v4/spreadsheets/sheet/values/{SHEET}!A:A:append",
+                    params={"valueInputOption": "RAW"}, json={"values": [row]},
+                    headers={"Authorization": "Bearer stub"})
+                response.raise_for_status()
+            except Exception:
+                pass
+
+        start = time.perf_counter()
+        latencies = await producers(args, direct)
+        report("direct", latencies, time.perf_counter() - start, stub.append_requests,
+               stub.issue_numbers(), expected)
+
+        stub.reset()
+        queue = TicketWriteQueue(journal_path=os.path.join(args.workdir, "journal.jsonl"),
+                                 batch_size=args.batch_size, base_backoff=0.1,
+                                 sheets_api_url=f"{stub.url}/v4/spreadsheets")
+        start = time.perf_counter()
+        latencies = await producers(
+            args, lambda row: queue.enqueue("conn", "sheet", SHEET, row))
+        await queue.drain()
+        persisted = time.perf_counter() - start
+        await queue.aclose()
+        ok &= report("queue", latencies, persisted, stub.append_requests, stub.issue_numbers(), expected)
+        print(f"\nqueue metrics: {queue.metrics()}")
+    finally:
+        await aclose_http_client()
+        ticket_index._index.close()
+        stub.close()
+    return ok
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stores", type=int, default=30, help="Concurrent callers")
+    parser.add_argument("--tickets", type=int, default=3, help="Tickets per caller")
+    parser.add_argument("--spread", type=float, default=0.5, help="Max pause before each ticket (s)")
+    parser.add_argument("--append-latency", type=float, default=0.15, help="Per append request (s)")
+    parser.add_argument("--row-latency", type=float, default=0.002, help="Per appended row (s)")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="Share of appends failing with 503")
+    parser.add_argument("--timeout-rate", type=float, default=0.03,
+                        help="Share of appends applied but timing out")
+    parser.add_argument("--client-timeout", type=float, default=1.0, help="HTTP client timeout (s)")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--log-level", default="ERROR")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        args.workdir = workdir
+        os.environ["HTTP_TIMEOUT"] = str(args.client_timeout)
+
+        from observability.log import configure_logging
+        configure_logging(level=args.log_level)
+
+        ok = asyncio.run(run(args))
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,136 @@
+"""
+Measure the TTS phrase cache on the responses of a typical ticket call.
+
+The agents' responses are streamed word by word through the SDK's sentence splitter, as
+StreamedAudioResult does, and each chunk is synthesized by the stub TTS model from
+stub_voice.py (`--tts-first-byte` seconds to the first chunk) directly or through
+CachingTTSModel. "cold" starts with an empty cache directory and stores phrases as they
+are first said; "warm" runs TTSPhraseCache.warm() first, as main.py does at start.
+
+Reported per mode: time from a response's text to its first audio, time to synthesize
+the whole response, requests sent to the TTS model and seconds of audio it synthesized.
+
+Usage:
+    python benchmarks/tts_cache_benchmark.py
+    python benchmarks/tts_cache_benchmark.py --calls 20 --tts-first-byte 0.4
+"""
+import argparse
+import asyncio
+import mmap
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_voice import SAMPLERATE, StubLatencies, StubTTSModel, StubVoiceModelProvider
+
+RESPONSES = [
+    "Hello! Thank you for contacting Vishal Mega Mart Support. Could you share your name and store location?",
+    "Thank you, Priya from Bhopal. How can I help you today?",
+    "Please open the printer cover and remove any paper stuck near the roller. Then close the "
+    "cover and restart the printer. Does it still show the paper jam error?",
+    "Let me create a ticket for this issue.",
+    "Your ticket has been successfully created.\n\nTICKET NUMBER: {ticket}\n\nPlease note down this "
+    "ticket number for future reference. You will need it to check the status of your ticket.\n\n"
+    "Is there anything else I can help you with today?",
+    "I can help you check your ticket status. What's your 12-digit ticket number?",
+]
+
+
+class CountingTTSModel(StubTTSModel):
+    """Stub TTS model that counts requests and synthesized audio."""
+
+    def __init__(self, provider):
+        super().__init__(provider)
+        self.requests = 0
+        self.bytes = 0
+
+    async def run(self, text, settings):
+        self.requests += 1
+        async for chunk in super().run(text, settings):
+            self.bytes += len(chunk)
+            yield chunk
+
+
+async def speak(model, settings, text: str) -> tuple:
+    """Stream `text` through the sentence splitter into `model`; (first audio, total) seconds."""
+    start = time.perf_counter()
+    first, buffer, zero_copy = None, "", False
+    chunks = []
+    for word in text.split(" "):
+        buffer += word + " "
+        combined, buffer = settings.text_splitter(buffer)
+        if combined:
+            chunks.append(combined)
+    if buffer.strip():
+        chunks.append(buffer)
+    for chunk in chunks:
+        async for audio in model.run(chunk, settings):
+            if first is None:
+                first = time.perf_counter() - start
+            zero_copy |= isinstance(audio, memoryview) and isinstance(audio.obj, mmap.mmap)
+    return first, time.perf_counter() - start, zero_copy
+
+
+async def run_mode(args, mode: str, directory: str) -> dict:
+    from agents.voice import TTSModelSettings
+    from audio.tts_cache import CachingTTSModel, TTSPhraseCache
+    from prompts import SPOKEN_PHRASES
+
+    provider = StubVoiceModelProvider(StubLatencies(tts_first_byte=args.tts_first_byte))
+    inner = CountingTTSModel(provider)
+    settings = TTSModelSettings(voice="alloy", instructions="Speak in a friendly, conversational tone.")
+    model, cache = inner, None
+    if mode != "tts":
+        cache = TTSPhraseCache(directory=directory, phrases=SPOKEN_PHRASES)
+        model = CachingTTSModel(inner, cache)
+        if mode == "warm":
+            await model.warm(settings)
+            inner.requests = inner.bytes = 0
+
+    first, total, zero_copy = [], [], False
+    for call in range(args.calls):
+        for response in RESPONSES:
+            text = response.format(ticket=f"2502150829{call % 100:02d}")
+            f, t, z = await speak(model, settings, text)
+            first.append(f)
+            total.append(t)
+            zero_copy |= z
+    return {"first": first, "total": total, "requests": inner.requests,
+            "seconds": inner.bytes / 2 / SAMPLERATE, "zero_copy": zero_copy,
+            "metrics": cache.metrics() if cache else None}
+
+
+async def run(args) -> None:
+    print(f"{'':<6}{'first audio p50 ms':>19}{'p95':>7}{'response p50 ms':>17}"
+          f"{'tts requests':>14}{'tts seconds':>13}  mmap")
+    for mode in ("tts", "cold", "warm"):
+        with tempfile.TemporaryDirectory() as directory:
+            result = await run_mode(args, mode, directory)
+        first = np.asarray(result["first"]) * 1000
+        total = np.asarray(result["total"]) * 1000
+        print(f"{mode:<6}{np.percentile(first, 50):>19.0f}{np.percentile(first, 95):>7.0f}"
+              f"{np.percentile(total, 50):>17.0f}{result['requests']:>14}{result['seconds']:>13.1f}"
+              f"  {result['zero_copy']}")
+        if result["metrics"]:
+            print(f"      {result['metrics']}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=10, help="Times the call's responses are spoken")
+    parser.add_argument("--tts-first-byte", type=float, default=0.25, help="Stub TTS time to first chunk (s)")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    from observability.log import configure_logging
+    configure_logging(level=args.log_level)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,151 @@
+"""
+Measure end-of-utterance latency and CPU cost of the voice activity detectors.
+
+Each fixture is a mono WAV with a known end-of-speech time. Blocks are fed to every engine
+in audio/vad.py exactly as capture_audio_until_silence does, and the harness reports when
+speech was first detected, how long after the real end of speech the endpoint fired, and
+whether the engine cut the utterance before the speaker had finished.
+
+Without --wav, a synthetic fixture is generated: voiced syllables with pauses between words,
+a fricative, and background hum and hiss.
+
+Usage:
+    python benchmarks/vad_benchmark.py
+    python benchmarks/vad_benchmark.py --wav turn.wav --speech-end 2.85
+    python benchmarks/vad_benchmark.py --write-fixture /tmp/synthetic_turn.wav
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio.backends import load_wav, save_wav
+from audio.vad import VAD_ENGINES, create_vad
+
+SAMPLERATE = 24000
+BLOCK_SIZE = 1024
+
+
+def synthesize_turn(
+    samplerate: int = SAMPLERATE,
+    lead_silence: float = 0.8,
+    trail_silence: float = 2.0,
+    noise_db: float = -55.0,
+    seed: int = 0,
+) -> tuple:
+    """
+    Build a synthetic utterance with a known speech region.
+
+    Returns:
+        tuple: (float32 samples, speech start seconds, speech end seconds)
+    """
+    rng = np.random.default_rng(seed)
+    pieces = [np.zeros(int(lead_silence * samplerate), dtype=np.float32)]
+    speech_start = lead_silence
+
+    # (duration, f0, amplitude) syllables; None marks a pause between words
+    pattern = [
+        (0.18, 140, 0.25), (0.22, 160, 0.3), None, (0.25, 150, 0.2),
+        (0.15, 130, 0.15), None, "fricative", (0.3, 120, 0.25), (0.2, 110, 0.12),
+    ]
+    for item in pattern:
+        if item is None:
+            length = int(rng.uniform(0.08, 0.18) * samplerate)
+            pieces.append(np.zeros(length, dtype=np.float32))
+        elif item == "fricative":
+            length = int(0.1 * samplerate)
+            hiss = rng.standard_normal(length).astype(np.float32)
+            hiss = np.diff(hiss, prepend=0.0).astype(np.float32) * 0.05
+            pieces.append(hiss * np.hanning(length).astype(np.float32))
+        else:
+            duration, f0, amplitude = item
+            t = np.arange(int(duration * samplerate)) / samplerate
+            vibrato = 1 + 0.03 * np.sin(2 * np.pi * 5 * t)
+            phase = 2 * np.pi * f0 * np.cumsum(vibrato) / samplerate
+            voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+            envelope = np.hanning(t.shape[0]) ** 0.5
+            pieces.append((amplitude * 0.5 * voiced * envelope).astype(np.float32))
+
+    speech = np.concatenate(pieces[1:])
+    speech_end = speech_start + speech.shape[0] / samplerate
+    pieces.append(np.zeros(int(trail_silence * samplerate), dtype=np.float32))
+    audio = np.concatenate(pieces)
+
+    t = np.arange(audio.shape[0]) / samplerate
+    noise_amplitude = 10 ** (noise_db / 20)
+    audio += (noise_amplitude * rng.standard_normal(audio.shape[0])).astype(np.float32)
+    audio += (noise_amplitude * np.sin(2 * np.pi * 50 * t)).astype(np.float32)
+    return audio.astype(np.float32), speech_start, speech_end
+
+
+def run_engine(name: str, audio: np.ndarray, samplerate: int, endpoint_timeout: float) -> dict:
+    if name == "threshold":
+        vad = create_vad(name, samplerate=samplerate, block_size=BLOCK_SIZE, silence_duration=1.0)
+    else:
+        vad = create_vad(name, samplerate=samplerate, endpoint_timeout=endpoint_timeout)
+    vad.reset()
+
+    onset = None
+    endpoint = None
+    cpu = 0.0
+    blocks = 0
+    for offset in range(0, audio.shape[0] - BLOCK_SIZE + 1, BLOCK_SIZE):
+        block = audio[offset:offset + BLOCK_SIZE]
+        start = time.perf_counter()
+        decision = vad.process(block)
+        cpu += time.perf_counter() - start
+        blocks += 1
+        block_end = (offset + BLOCK_SIZE) / samplerate
+        if onset is None and vad.speech_detected:
+            onset = block_end
+        if decision.endpoint:
+            endpoint = block_end
+            break
+
+    return {"onset": onset, "endpoint": endpoint, "us_per_block": cpu / max(blocks, 1) * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--wav", help="16-bit mono WAV fixture; a synthetic turn is used if omitted")
+    parser.add_argument("--speech-start", type=float, default=None, help="Speech start in the WAV (s)")
+    parser.add_argument("--speech-end", type=float, default=None, help="Speech end in the WAV (s)")
+    parser.add_argument("--endpoint-timeout", type=float, default=0.3, help="energy_zcr endpoint timeout (s)")
+    parser.add_argument("--write-fixture", help="Save the synthetic turn to this WAV path")
+    args = parser.parse_args()
+
+    if args.wav:
+        if args.speech_end is None:
+            parser.error("--speech-end is required with --wav")
+        audio, samplerate = load_wav(args.wav)
+        speech_start, speech_end = args.speech_start, args.speech_end
+        source = args.wav
+    else:
+        audio, speech_start, speech_end = synthesize_turn()
+        samplerate = SAMPLERATE
+        source = "synthetic turn"
+        if args.write_fixture:
+            save_wav(args.write_fixture, audio, samplerate)
+            print(f"Wrote {args.write_fixture}")
+
+    start_text = f"{speech_start:.2f}s" if speech_start is not None else "?"
+    print(f"{source}: speech {start_text} - {speech_end:.2f}s, {audio.shape[0] / samplerate:.2f}s total")
+    print(f"{'engine':<12}{'onset s':>10}{'endpoint s':>12}{'latency ms':>12}{'clipped':>9}{'us/block':>10}")
+    for name in VAD_ENGINES:
+        r = run_engine(name, audio, samplerate, args.endpoint_timeout)
+        onset = f"{r['onset']:.2f}" if r["onset"] is not None else "-"
+        if r["endpoint"] is None:
+            endpoint, latency, clipped = "-", "-", "-"
+        else:
+            endpoint = f"{r['endpoint']:.2f}"
+            latency = f"{(r['endpoint'] - speech_end) * 1000:.0f}"
+            clipped = "yes" if r["endpoint"] < speech_end else "no"
+        print(f"{name:<12}{onset:>10}{endpoint:>12}{latency:>12}{clipped:>9}{r['us_per_block']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+import asyncio
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from agents import Agent, Runner
+
+from observability.log import get_logger
+from prompts import count_tokens
+
+logger = get_logger(__name__)
+
+# (previous summary, transcript of the turns to fold in, token budget) -> new summary
+Summarizer = Callable[[str, str, int], Awaitable[str]]
+
+PIN_LABELS = {"name": "Name", "location": "Store location", "ticket_number": "Ticket number"}
+
+# Tech_Support_Agent confirms the caller with "Thank you, [Name] from [Location]."
+_GREETING = re.compile(r"\bThank you,\s+(?P<name>[^,.!?\n]{2,40}?)\s+from\s+(?P<location>[^,.!?\n]{2,40})", re.I)
+_MY_NAME = re.compile(r"\bmy name is\s+(?P<name>[A-Za-z][A-Za-z .'-]{1,40}?)(?=\s+(?:from|and|at)\b|[,.!?]|$)", re.I)
+_TICKET_NUMBER = re.compile(r"(?<!\d)\d{12}(?!\d)")
+_TICKET_NUMBER_FIELD = re.compile(r"ticket_number['\"]?\s*:\s*['\"](\d{12})['\"]")
+
+_SUMMARIZER_INSTRUCTIONS = """
+You maintain a running summary of a support call between a store employee and a technical
+support assistant. Update the previous summary with the new part of the conversation.
+Keep the problem, what was tried and its outcome, knowledge base answers that were used,
+tickets created or looked up, and anything still open. Be concise; plain sentences, no
+headings. Return only the updated summary.
+"""
+
+
+@dataclass(eq=False)
+class _Turn:
+    items: List[Any] = field(default_factory=list)
+    tokens: int = 0
+
+
+class ConversationMemory:
+    """
+    Conversation context for the voice workflow, bounded in tokens however long the call.
+
+    The workflow used to keep every message in a list and send the last ten, so the
+    caller's name and store from the first turn fell out after a few exchanges, tool calls
+    and results were never sent back, and the list grew for the whole session.
+
+    Memory is kept per turn: the user's message and every item the Runner produced for it,
+    including tool calls, their results and handoffs. input_items() returns, in order:
+    - a note with pinned facts (caller name, store location, ticket number), taken from
+      the greeting confirmation, ticket tool arguments and tool results, and the summary of
+      earlier turns;
+    - the most recent whole turns.
+
+    When the turns exceed `recent_tokens`, the oldest are folded into the summary by a
+    background task started after the turn, so the next response never waits for it.
+    Until the summary is ready those turns stay in the input, trimmed to `max_tokens`
+    oldest first.
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        summary_tokens: int = 300,
+        summarizer: Optional[Summarizer] = None,
+        max_held_tokens: Optional[int] = None,
+    ):
+        """
+        Args:
+            max_tokens: Upper bound on the tokens of input_items(). Falls back to the
+                MEMORY_MAX_TOKENS environment variable (default 3000).
+            summary_tokens: Length the summary is kept to.
+            summarizer: Coroutine producing the updated summary. Defaults to a model
+                summary (MEMORY_SUMMARY_MODEL, default "gpt-4o-mini"), or an extractive one
+                if MEMORY_SUMMARIZER is "extractive".
+            max_held_tokens: Most turn tokens kept while the summarizer falls behind
+                (default 4 x max_tokens). Beyond it the oldest turns are dropped and only
+                their user lines are added to the summary.
+        """
+        self.max_tokens = max_tokens or int(os.getenv("MEMORY_MAX_TOKENS", "3000"))
+        self.summary_tokens = summary_tokens
+        # Room for the note; the rest is for raw turns
+        self.recent_tokens = self.max_tokens - summary_tokens - 100
+        if summarizer is None:
+            if os.getenv("MEMORY_SUMMARIZER", "model") == "extractive":
+                summarizer = extractive_summary
+            else:
+                summarizer = ModelSummarizer(os.getenv("MEMORY_SUMMARY_MODEL", "gpt-4o-mini"))
+        self.summarizer = summarizer
+        self.max_held_tokens = max_held_tokens or 4 * self.max_tokens
+        self.pins: Dict[str, str] = {}
+        self.summary = ""
+        self._turns: List[_Turn] = []
+        self._summarizing: Optional[asyncio.Task] = None
+        self._summarizing_turns: List[_Turn] = []
+        self._dropped: List[str] = []
+        self._summaries = 0
+        self._summary_failures = 0
+        self._dropped_turns = 0
+
+    def add_user(self, text: str) -> None:
+        """Start a turn with the user's message."""
+        self._turns.append(_Turn())
+        self._extend([{"role": "user", "content": text}])
+
+    def complete_turn(self, items: List[Any]) -> None:
+        """
+        Add the items the Runner produced for the current turn, e.g.
+        `[item.to_input_item() for item in result.new_items]`, and start summarizing old
+        turns in the background if the recent ones are over budget.
+        """
+        self._extend(items)
+        self._maybe_summarize()
+        self._enforce_cap()
+
+    def input_items(self) -> List[Any]:
+        """Input for the next model request: the memory note, then the recent turns."""
+        note = self._note()
+        budget = self.max_tokens - (count_tokens(note) if note else 0)
+        recent: List[Any] = []
+        # Newest first; the current turn is always included
+        for index, turn in enumerate(reversed(self._turns)):
+            if index and turn.tokens > budget:
+                break
+            budget -= turn.tokens
+            recent[:0] = turn.items
+        return ([{"role": "system", "content": note}] if note else []) + recent
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "turns": len(self._turns),
+            "turn_tokens": sum(turn.tokens for turn in self._turns),
+            "summary_tokens": count_tokens(self.summary),
+            "summaries": self._summaries,
+            "summary_failures": self._summary_failures,
+            "dropped_turns": self._dropped_turns,
+            "pins": dict(self.pins),
+        }
+
+    async def aclose(self) -> None:
+        """Stop a summary in progress."""
+        if self._summarizing is not None:
+            self._summarizing.cancel()
+            await asyncio.gather(self._summarizing, return_exceptions=True)
+            self._summarizing = None
+
+    def _extend(self, items: List[Any]) -> None:
+        turn = self._turns[-1] if self._turns else None
+        if turn is None:
+            turn = _Turn()
+            self._turns.append(turn)
+        for item in items:
+            turn.items.append(item)
+            turn.tokens += count_tokens(_item_text(item))
+            self._pin(item)
+
+    def _note(self) -> str:
+        lines = []
+        if self.pins:
+            lines.append("Known facts: " + "; ".join(
+                f"{PIN_LABELS[key]}: {value}" for key, value in self.pins.items()))
+        if self.summary:
+            lines.append(f"Summary of the earlier conversation: {self.summary}")
+        return "\n".join(lines)
+
+    def _maybe_summarize(self) -> None:
+        if self._summarizing is not None:
+            return
+        total = sum(turn.tokens for turn in self._turns)
+        if total <= self.recent_tokens or len(self._turns) < 2:
+            return
+        # Fold the oldest turns until about half the budget is left, so this runs every
+        # few turns rather than every turn; the current turn always stays
+        evict = []
+        for turn in self._turns[:-1]:
+            if total <= self.recent_tokens // 2:
+                break
+            evict.append(turn)
+            total -= turn.tokens
+        self._summarizing_turns = evict
+        self._summarizing = asyncio.get_running_loop().create_task(self._summarize(evict))
+
+    def _enforce_cap(self) -> None:
+        total = sum(turn.tokens for turn in self._turns)
+        while total > self.max_held_tokens and len(self._turns) > 1:
+            turn = self._turns.pop(0)
+            total -= turn.tokens
+            # Turns being summarized are covered by that summary
+            if turn not in self._summarizing_turns:
+                self._dropped.append(_transcript([turn]))
+                self._dropped_turns += 1
+        if self._summarizing is None:
+            self._fold_dropped()
+
+    def _fold_dropped(self) -> None:
+        if self._dropped:
+            self.summary = _extract(self.summary, "\n".join(self._dropped), self.summary_tokens)
+            self._dropped.clear()
+
+    async def _summarize(self, turns: List[_Turn]) -> None:
+        transcript = _transcript(turns)
+        try:
+            summary = await self.summarizer(self.summary, transcript, self.summary_tokens)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._summary_failures += 1
+            logger.warning("Conversation summary failed, keeping an extract: %s", e)
+            summary = _extract(self.summary, transcript, self.summary_tokens)
+        self.summary = summary.strip()
+        self._turns = [turn for turn in self._turns if turn not in turns]
+        self._summaries += 1
+        self._summarizing = None
+        self._summarizing_turns = []
+        self._fold_dropped()
+        logger.debug("Conversation summarized",
+                      extra={"turns": len(turns), "summary_tokens": count_tokens(self.summary)})
+        # The conversation may have moved on while this ran
+        self._maybe_summarize()
+
+    def _pin(self, item: Any) -> None:
+        if not isinstance(item, dict):
+            return
+        if item.get("type") == "function_call":
+            try:
+                arguments = json.loads(item.get("arguments") or "{}")
+            except ValueError:
+                return
+            if item.get("name") == "create_ticket":
+                self._set_pin("name", arguments.get("submit_by"))
+                self._set_pin("location", arguments.get("location"))
+            elif item.get("name") == "get_ticket_status":
+                self._set_pin("ticket_number", arguments.get("ticket_number"))
+            return
+        if item.get("type") == "function_call_output":
+            match = _TICKET_NUMBER_FIELD.search(str(item.get("output", "")))
+            if match:
+                self._set_pin("ticket_number", match.group(1))
+            return
+
+        text = _item_text(item)
+        role = item.get("role")
+        if role == "assistant":
+            match = _GREETING.search(text)
+            if match:
+                self._set_pin("name", match.group("name"))
+                self._set_pin("location", match.group("location"))
+        elif role == "user":
+            match = _MY_NAME.search(text)
+            if match:
+                self._set_pin("name", match.group("name"))
+            match = _TICKET_NUMBER.search(text)
+            if match:
+                self._set_pin("ticket_number", match.group(0))
+
+    def _set_pin(self, key: str, value: Any) -> None:
+        if isinstance(value, str) and value.strip():
+            self.pins[key] = value.strip()
+
+
+class ModelSummarizer:
+    """Summarizer backed by a small model through the agents Runner."""
+
+    def __init__(self, model: str = "gpt-4o-mini"):
+        self.agent = Agent(name="Conversation_Summarizer", instructions=_SUMMARIZER_INSTRUCTIONS, model=model)
+
+    async def __call__(self, previous: str, transcript: str, max_tokens: int) -> str:
+        prompt = (f"Previous summary:\n{previous or '(none)'}\n\nNew conversation:\n{transcript}\n\n"
+                  f"Write the updated summary in at most {max_tokens * 3 // 4} words.")
+        result = await Runner.run(self.agent, prompt)
+        return str(result.final_output)
+
+
+async def extractive_summary(previous: str, transcript: str, max_tokens: int) -> str:
+    """
+    Summarizer without a model: the previous summary plus the new user lines, keeping the
+    most recent text that fits in `max_tokens`.
+    """
+    return _extract(previous, transcript, max_tokens)
+
+
+def _extract(previous: str, transcript: str, max_tokens: int) -> str:
+    lines = [line[len("User: "):][:160] for line in transcript.splitlines() if line.startswith("User: ")]
+    text = " ".join(part for part in (previous, " / ".join(lines)) if part)
+    limit = max_tokens * 4
+    return text if len(text) <= limit else "..." + text[-limit:]
+
+
+def _transcript(turns: List[_Turn]) -> str:
+    return "\n".join(_item_text(item, readable=True) for turn in turns for item in turn.items)
+
+
+def _item_text(item: Any, readable: bool = False) -> str:
+    """Text of an input item; with `readable`, a transcript line for the summarizer."""
+    if not isinstance(item, dict):
+        return str(item)
+    kind = item.get("type")
+    if kind == "function_call":
+        text = f"{item.get('name')}({item.get('arguments')})"
+        return f"Tool call: {text}" if readable else text
+    if kind == "function_call_output":
+        text = str(item.get("output", ""))
+        return f"Tool result: {text[:600]}" if readable else text
+    content = item.get("content")
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    text = content if isinstance(content, str) else json.dumps(item, default=str)
+    if not readable:
+        return text
+    return f"{'User' if item.get('role') == 'user' else 'Assistant'}: {text}"
@@ -0,0 +1,172 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from typing import Optional
+
+LOGGER_NAME = "voicebot"
+
+# Attributes every LogRecord has; anything else on a record came from `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_context: contextvars.ContextVar = contextvars.ContextVar("log_context", default={})
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formats a record with the fields passed through `extra=`.
+
+    Text output is `time level logger: message key=value ...`; JSON output is one object
+    per line, which is what the log shipper expects.
+    """
+
+    def __init__(self, json_lines: bool = False):
+        super().__init__()
+        self.json_lines = json_lines
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {
+            key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES
+        }
+        message = record.getMessage()
+        timestamp = self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}"
+        if self.json_lines:
+            entry = {
+                "ts": timestamp,
+                "level": record.levelname,
+                "logger": record.name,
+                "message": message,
+            }
+            entry.update(fields)
+            return json.dumps(entry, default=str)
+
+        text = f"{timestamp} {record.levelname:<7} {record.name}: {message}"
+        if fields:
+            text += " " + " ".join(
+                f"{key}={json.dumps(value, default=str)}" for key, value in fields.items()
+            )
+        return text
+
+
+class _ContextFilter(logging.Filter):
+    """Adds the fields bound with bind_log_context() to records logged in that context."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None) -> None:
+    """
+    Route the bot's loggers through a queue to a background writer thread.
+
+    Callers (the event loop, tool calls) only append the record to an in-memory queue; the
+    QueueListener thread formats it and writes to stderr, so slow terminal or pipe I/O never
+    lands on the turn's critical path. Calling this again only updates the level.
+
+    Args:
+        level: Level name such as "DEBUG" or "INFO". Falls back to the LOG_LEVEL
+            environment variable (default "INFO").
+        fmt: "text" (default) or "json". Falls back to the LOG_FORMAT environment variable.
+    """
+    global _listener
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+    if _listener is not None:
+        return
+
+    fmt = fmt or os.getenv("LOG_FORMAT", "text")
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(StructuredFormatter(json_lines=fmt == "json"))
+
+    records = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)
+    handler.addFilter(_ContextFilter())
+    logger.addHandler(handler)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def bind_log_context(**fields) -> contextvars.Token:
+    """
+    Add `fields` to every record logged from the current context and the tasks started
+    from it, e.g. the session id for everything a voice session logs.
+
+    Returns:
+        contextvars.Token: Pass to `token.var.reset(token)` to unbind.
+    """
+    return _context.set({**_context.get(), **fields})
+
+
+def shutdown_logging() -> None:
+    """Write out any queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Return a logger under the bot's namespace, configuring logging on first use.
+
+    Args:
+        name: Usually the module's __name__.
+
+    Returns:
+        logging.Logger: Logger named "voicebot.<name>".
+    """
+    if _listener is None:
+        configure_logging()
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+class SampledLogger:
+    """
+    Logs a high-frequency metric (e.g. the level of every capture block) at most once per
+    `interval` seconds.
+
+    When the level is disabled a call is one cached isEnabledFor() check. Skipped calls are
+    counted and reported as `skipped` on the next record that is written.
+    """
+
+    def __init__(self, logger: logging.Logger, interval: float = 1.0, level: int = logging.DEBUG):
+        self.logger = logger
+        self.interval = interval
+        self.level = level
+        self._next_at = 0.0
+        self._skipped = 0
+
+    def enabled(self) -> bool:
+        return self.logger.isEnabledFor(self.level)
+
+    def log(self, message: str, **fields) -> None:
+        """
+        Log `message` with `fields` if the interval has passed since the last record.
+
+        Args:
+            message: Log message.
+            **fields: Structured fields added to the record.
+        """
+        if not self.logger.isEnabledFor(self.level):
+            return
+        now = time.monotonic()
+        if now < self._next_at:
+            self._skipped += 1
+            return
+        self._next_at = now + self.interval
+        fields["skipped"] = self._skipped
+        self._skipped = 0
+        self.logger.log(self.level, message, extra=fields)
@@ -0,0 +1,316 @@
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from agents import add_trace_processor
+from agents.tracing import TracingProcessor
+
+from observability.log import get_logger
+
+logger = get_logger(__name__)
+
+# Latency stages derived from marks: (stage, from mark, to mark)
+MARK_INTERVALS = [
+    ("capture", "listen_start", "endpoint"),
+    ("stt_wait", "endpoint", "transcript"),
+    ("first_token", "transcript", "first_token"),
+    ("first_audio", "transcript", "first_audio"),
+    ("response", "transcript", "drained"),
+]
+
+PERCENTILES = (50, 95, 99)
+
+_active_tracer: contextvars.ContextVar = contextvars.ContextVar("turn_tracer", default=None)
+
+
+class TurnTrace:
+    """Monotonic timestamps recorded for one conversation turn."""
+
+    def __init__(self, index: int, **attributes):
+        self.index = index
+        self.attributes = attributes
+        self.started_at = time.monotonic()
+        self.wall_time = time.time()
+        self.ended_at: Optional[float] = None
+        self.marks: Dict[str, float] = {}
+        self.spans: List[Dict[str, Any]] = []
+
+    def mark(self, name: str, at: Optional[float] = None) -> None:
+        """Record an instant. Only the first occurrence of a name in a turn is kept."""
+        self.marks.setdefault(name, time.monotonic() if at is None else at)
+
+    def add_span(self, name: str, start: float, end: float, **attributes) -> None:
+        self.spans.append({"name": name, "start": start, "end": end, **attributes})
+
+    def stage_durations(self) -> List[tuple]:
+        """
+        Returns:
+            list: (stage, seconds) pairs for every span and every mark interval present.
+                A stage can appear more than once, e.g. two calls to the same tool.
+        """
+        stages = [(span["name"], span["end"] - span["start"]) for span in self.spans]
+        for stage, begin, end in MARK_INTERVALS:
+            if begin in self.marks and end in self.marks and self.marks[end] >= self.marks[begin]:
+                stages.append((stage, self.marks[end] - self.marks[begin]))
+        if self.ended_at is not None:
+            stages.append(("turn", self.ended_at - self.started_at))
+        return stages
+
+    def to_dict(self) -> dict:
+        """JSON-friendly record with times in milliseconds relative to the turn start."""
+
+        def relative(at):
+            return round((at - self.started_at) * 1000, 2)
+
+        return {
+            "type": "turn",
+            "turn": self.index,
+            "timestamp": self.wall_time,
+            **self.attributes,
+            "duration_ms": relative(self.ended_at) if self.ended_at is not None else None,
+            "marks": {name: relative(at) for name, at in sorted(self.marks.items(), key=lambda m: m[1])},
+            "spans": [
+                {
+                    **span,
+                    "start": relative(span["start"]),
+                    "end": relative(span["end"]),
+                    "duration_ms": round((span["end"] - span["start"]) * 1000, 2),
+                }
+                for span in self.spans
+            ],
+        }
+
+
+class TurnTracer:
+    """
+    Collects per-stage latency for every turn of a conversation.
+
+    Turns are delimited by start_turn()/end_turn(). Inside a turn, code records instants with
+    mark() and intervals with span(); spans from the agents SDK (transcription, model
+    responses, function tools, speech) arrive through AgentsTracingProcessor. Finished turns
+    are appended to a JSONL file and kept in memory so stats() can report p50/p95/p99 per
+    stage for the session.
+
+    Spans that end while no turn is open (e.g. the transcription that precedes a streamed
+    turn) are held and attached to the next turn.
+    """
+
+    def __init__(self, export_path: Optional[str] = None, **attributes):
+        """
+        Args:
+            export_path: JSONL file that each finished turn is appended to. None keeps
+                the traces in memory only.
+            **attributes: Fields added to every exported turn, e.g. the input mode.
+        """
+        self.export_path = export_path
+        self.attributes = attributes
+        self.current: Optional[TurnTrace] = None
+        self.turns: List[TurnTrace] = []
+        self._pending_spans: List[Dict[str, Any]] = []
+        self._samples: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._export = open(export_path, "a", buffering=1) if export_path else None
+
+    def activate(self) -> contextvars.Token:
+        """
+        Make this the tracer that mark_stage(), stage_span() and the agents processor report
+        to for the current context and the tasks and threads started from it.
+        """
+        return _active_tracer.set(self)
+
+    def start_turn(self, **attributes) -> TurnTrace:
+        """Open a new turn, ending the previous one if it is still open."""
+        with self._lock:
+            if self.current is not None:
+                self._finish(self.current)
+            turn = TurnTrace(len(self.turns) + 1, **{**self.attributes, **attributes})
+            turn.spans.extend(self._pending_spans)
+            self._pending_spans.clear()
+            self.current = turn
+            return turn
+
+    def end_turn(self) -> Optional[TurnTrace]:
+        """Close the open turn, export it and add its stages to the session stats."""
+        with self._lock:
+            turn, self.current = self.current, None
+            if turn is not None:
+                self._finish(turn)
+            return turn
+
+    def discard_turn(self) -> None:
+        """Drop the open turn without exporting it, e.g. when nothing was captured."""
+        with self._lock:
+            self.current = None
+
+    def mark(self, name: str) -> None:
+        turn = self.current
+        if turn is not None:
+            turn.mark(name)
+
+    def add_span(self, name: str, start: float, end: float, **attributes) -> None:
+        with self._lock:
+            if self.current is not None:
+                self.current.add_span(name, start, end, **attributes)
+            else:
+                self._pending_spans.append({"name": name, "start": start, "end": end, **attributes})
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Time the enclosed block as a stage of the current turn."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.monotonic(), **attributes)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns:
+            dict: stage -> {"count", "p50_ms", "p95_ms", "p99_ms", "max_ms"} over the
+                session's finished turns.
+        """
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+        stats = {}
+        for stage, values in sorted(samples.items()):
+            millis = np.asarray(values) * 1000
+            entry = {"count": len(values)}
+            for p in PERCENTILES:
+                entry[f"p{p}_ms"] = round(float(np.percentile(millis, p)), 2)
+            entry["max_ms"] = round(float(millis.max()), 2)
+            stats[stage] = entry
+        return stats
+
+    def close(self) -> Dict[str, Dict[str, float]]:
+        """
+        End any open turn, write the session stats as a final "summary" line and close the
+        export file. An open turn that never got a transcript (the user was still being
+        listened to) is dropped rather than counted.
+
+        Returns:
+            dict: The session stats, as returned by stats().
+        """
+        if self.current is not None and "transcript" not in self.current.marks:
+            self.discard_turn()
+        self.end_turn()
+        stats = self.stats()
+        if self._export is not None:
+            self._export.write(json.dumps({"type": "summary", **self.attributes, "stages": stats}) + "\n")
+            self._export.close()
+            self._export = None
+        return stats
+
+    def _finish(self, turn: TurnTrace) -> None:
+        turn.ended_at = time.monotonic()
+        self.turns.append(turn)
+        for stage, seconds in turn.stage_durations():
+            self._samples.setdefault(stage, []).append(seconds)
+        if self._export is not None:
+            self._export.write(json.dumps(turn.to_dict(), default=str) + "\n")
+
+
+def current_tracer() -> Optional[TurnTracer]:
+    """The tracer activated for this context, or None."""
+    return _active_tracer.get()
+
+
+def mark_stage(name: str) -> None:
+    """Mark an instant in the active turn. Does nothing without an active tracer."""
+    tracer = _active_tracer.get()
+    if tracer is not None:
+        tracer.mark(name)
+
+
+@contextmanager
+def stage_span(name: str, **attributes):
+    """Time the enclosed block in the active turn. Does nothing without an active tracer."""
+    tracer = _active_tracer.get()
+    if tracer is None:
+        yield
+        return
+    with tracer.span(name, **attributes):
+        yield
+
+
+class AgentsTracingProcessor(TracingProcessor):
+    """
+    Feeds spans from the agents SDK into the active TurnTracer.
+
+    Span types are mapped to stages: transcription -> "stt", response/generation -> "llm",
+    speech -> "tts", function -> "tool:<name>" and custom spans keep their name (the tools
+    use custom spans for Vespa, Sheets and Nango calls). Times are taken with
+    time.monotonic() when the SDK starts and ends the span so they line up with the marks
+    recorded by the conversation loop.
+
+    The SDK only calls processors while tracing is enabled, so these stages are missing if
+    OPENAI_AGENTS_DISABLE_TRACING is set.
+    """
+
+    def __init__(self):
+        self._open: Dict[str, tuple] = {}
+
+    @staticmethod
+    def stage_name(span) -> Optional[str]:
+        data = span.span_data
+        kind = data.type
+        if kind == "function":
+            return f"tool:{data.name}"
+        if kind == "custom":
+            return data.name
+        if kind == "transcription":
+            return "stt"
+        if kind in ("response", "generation"):
+            return "llm"
+        if kind == "speech":
+            return "tts"
+        return None
+
+    def on_trace_start(self, trace) -> None:
+        pass
+
+    def on_trace_end(self, trace) -> None:
+        pass
+
+    def on_span_start(self, span) -> None:
+        tracer = _active_tracer.get()
+        if tracer is None:
+            return
+        name = self.stage_name(span)
+        if name is not None:
+            self._open[span.span_id] = (tracer, name, time.monotonic())
+
+    def on_span_end(self, span) -> None:
+        opened = self._open.pop(span.span_id, None)
+        if opened is None:
+            return
+        tracer, name, start = opened
+        attributes = {"error": span.error["message"]} if span.error else {}
+        tracer.add_span(name, start, time.monotonic(), **attributes)
+
+    def shutdown(self) -> None:
+        self._open.clear()
+
+    def force_flush(self) -> None:
+        pass
+
+
+_processor: Optional[AgentsTracingProcessor] = None
+
+
+def install_agents_processor() -> AgentsTracingProcessor:
+    """Register AgentsTracingProcessor with the agents SDK once per process."""
+    global _processor
+    if _processor is None:
+        _processor = AgentsTracingProcessor()
+        add_trace_processor(_processor)
+    return _processor
+
+
+def log_stage_stats(stats: Dict[str, Dict[str, float]]) -> None:
+    """Log one record per stage with its percentiles."""
+    for stage, entry in stats.items():
+        logger.info("Turn stage latency", extra={"stage": stage, **entry})
@@ -0,0 +1,233 @@
+import json
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from agents import Agent, handoff
+from agents.extensions.handoff_prompt import prompt_with_handoff_instructions
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Agent instructions are built once, at import in my_agents.py, and sent by the Runner as
+# the system prompt of every model request. Providers cache the longest previously seen
+# prefix of a request, so the text is ordered from most to least stable: the handoff
+# preamble shared by every agent, the agent's own static instructions, and last the
+# per-deployment CONFIGURATION values the instructions refer to by name.
+
+TICKET_MANAGEMENT_PROMPT = """
+# VISHAL MEGA MART TICKET MANAGEMENT SYSTEM
+
+## INTRODUCTION
+You manage the ticket system for Vishal Mega Mart's technical support. Your responsibilities include creating new tickets, checking ticket status, and preventing duplicate tickets.
+
+## AVAILABLE TOOLS
+- **get_current_datetime**: Use to get current date and time in IST format (DD-MMM-YY HH:MM AM/PM IST)
+- **get_ticket_status**: Use to look up a ticket by its ticket number
+- **find_recent_duplicates**: Use to find recent tickets for the same location and categories
+- **lookup_row_in_gsheet**: Use to search the Google Sheet directly if the tools above fail
+- **create_ticket**: Use to create new tickets in the Google Sheet
+
+For connection_id, spreadsheet_id and sheet_name ALWAYS pass the Connection ID, Spreadsheet ID and Sheet Name from CONFIGURATION.
+
+## TICKET CREATION PROCESS
+When creating a new ticket:
+
+1. **Collect Information**:
+   - Location: Store location from user
+   - Categories: Level-1, Level-2, Level-3 (e.g., APPLICATION, APPROVED REQUEST, MOBILE NO.CHANGE IN CN)
+   - Problem: Concise description (<500 chars) using user's words
+   - Submit By: Employee name
+   - Priority: HIGH, MEDIUM or LOW based on urgency/impact
+
+2. **Check for Duplicates**: see DUPLICATE PREVENTION below
+
+3. **Create Ticket**:
+   - Call create_ticket(connection_id, spreadsheet_id, sheet_name, location, level1, level2, level3, problem, submit_by, priority)
+   - The tool assigns the ticket number and submit date/time and returns them as ticket_number, submit_date and submit_time
+   - If it fails because a field is missing or invalid, ask the user for that field and call it again
+
+4. **Confirm Ticket Creation**:
+   - After successful ticket creation, clearly inform the user of their ticket number
+   - Use this exact format:
+   ```
+   Your ticket has been successfully created.
+
+   TICKET NUMBER: [TICKET_NO]
+
+   Please note down this ticket number for future reference. You will need it to check the status of your ticket.
+
+   Is there anything else I can help you with today?
+   ```
+   - If the ticket creation fails, inform the user there is an issue with ticket manager and offer to try again
+
+## TICKET STATUS LOOKUP
+When a user requests ticket status:
+
+1. **Get Ticket Number**: Ask for the 12-digit number
+2. **Validate Format**:
+   - Remove all non-digit characters (hyphens, spaces, dots, etc.) and convert spoken digits to numerals
+   - Examples: "2502-1508-2900" → "250215082900"; "two five zero two one five zero eight two nine zero zero" → "250215082900"
+   - If the result is not exactly 12 digits, politely ask the user to provide a valid 12-digit ticket number
+3. **Lookup Ticket**:
+   - Call get_ticket_status(connection_id, spreadsheet_id, sheet_name, ticket_number)
+   - The result includes ticket_status (Resolved, In Progress or Open)
+4. **Present Status Information**:
+   ```
+   Ticket #[TICKET_NO]:
+   - Submitted: [Submit Date] at [Submit Time] IST
+   - Status: [In Progress/Resolved]
+   - Priority: [Priority]
+
+   [If Resolved]
+   - Resolved on: [Solved Date] at [Solved Time] IST
+   - Resolution: [RCA]
+
+   [If In Progress]
+   - Last Updated: [WIP Date] at [WIP Time] IST
+   ```
+
+## DUPLICATE PREVENTION
+Before creating a new ticket:
+
+1. **Check for Duplicates**:
+   - Call find_recent_duplicates(connection_id, spreadsheet_id, sheet_name, location, level1, level2, level3, within_hours=24) once; it matches location and categories and checks the submission time for you
+2. **If Duplicate Found**:
+   - Inform user of existing ticket #[TICKET_NO]
+   - Offer options:
+     1. Check status of existing ticket
+     2. Create new ticket anyway
+     3. Update existing ticket
+
+## COLUMN MAPPING REFERENCE
+A: Issue No, B: Location, C: Level-1, D: Level-2, E: Level-3, F: Problem, G: Submit Date, H: Submit Time, I: WIP Date, J: WIP Time, K: Solved Date, L: Solved Time, M: TAT, N: Submit By, O: Solved By, P: RCA, Q: RCA By, R: Priority
+
+## COMMUNICATION GUIDELINES
+- Keep responses concise and focused on relevant information
+- New tickets get their ticket number and submit date/time from create_ticket
+- Otherwise ALWAYS use get_current_datetime tool to get the current date and time when needed
+- NEVER generate or calculate date and time values on your own - STRICTLY use these tools for ALL date and time information
+- Format dates as DD-MMM-YY and times as hh:mm A IST
+- Say "TERMINATE" after confirming the user doesn't need further assistance
+"""
+
+TECH_SUPPORT_PROMPT = """
+You are a technical support assistant for Vishal Mega Mart, providing clear, patient support to store employees.
+
+CORE GUIDELINES:
+- Use simple, non-technical language and follow structured troubleshooting
+- Start with: "Hello! Thank you for contacting Vishal Mega Mart Support. Could you share your name and store location?"
+- After getting details: "Thank you, [Name] from [Location]. How can I help you today?"
+- For unclear responses: Ask politely for clarification without making assumptions
+- ALWAYS respond only in English
+
+KNOWLEDGE BASE USAGE (MANDATORY):
+- ALWAYS search the knowledge base before answering technical questions using:
+  search_knowledge_base(query="your query", tenant_id=<Tenant ID>, document_id=<Document ID>, limit=5)
+  with the Tenant ID and Document ID from CONFIGURATION
+
+TROUBLESHOOTING APPROACH:
+1. Identify the issue category (PoS, Weighing Machine, Application)
+2. Ask clear questions based on knowledge base information
+3. Provide step-by-step instructions in simple language
+4. Confirm understanding frequently
+5. If unresolved after thorough troubleshooting:
+   - Hand off to Ticket_Managment_Agent IMMEDIATELY with a brief summary of the issue
+   - Do NOT say phrases like "I'll connect you" or "Please hold on" - just seamlessly transition to ticket creation
+   - Example: "Let me create a ticket for this issue."
+
+TICKET STATUS INQUIRIES:
+- When a user asks for the status of an existing ticket, immediately hand off to Ticket_Managment_Agent
+- Do NOT say phrases like "I'll connect you" or "Please hold on" - just seamlessly transition to ticket status checking
+- Example: "I can help you check your ticket status. What's your 12-digit ticket number?"
+
+COMMUNICATION:
+- Be patient, empathetic, and professional
+- Use Indian customer service etiquette
+- Format dates as DD-MMM-YY using IST
+- Communicate exclusively in English
+
+REMEMBER: Your goal is to help non-technical staff resolve issues with minimal stress. ALWAYS use the knowledge base tool with the Tenant ID and Document ID from CONFIGURATION.
+"""
+
+# Sentences the prompts above have the agents say word for word. The TTS phrase cache
+# keeps their audio on disk; "Ticket number:" starts the confirmation line, so only the
+# number after it is synthesized.
+SPOKEN_PHRASES = (
+    "Hello! Thank you for contacting Vishal Mega Mart Support.",
+    "Could you share your name and store location?",
+    "How can I help you today?",
+    "Let me create a ticket for this issue.",
+    "I can help you check your ticket status.",
+    "What's your 12-digit ticket number?",
+    "Your ticket has been successfully created.",
+    "Ticket number:",
+    "Please note down this ticket number for future reference.",
+    "You will need it to check the status of your ticket.",
+    "Is there anything else I can help you with today?",
+)
+
+
+def render_configuration(config: Dict[str, Optional[str]]) -> str:
+    """The CONFIGURATION section listing `config`'s values under their display names."""
+    return "## CONFIGURATION\n" + "\n".join(f"- {name}: {value}" for name, value in config.items())
+
+
+def assemble_instructions(prompt: str, config: Dict[str, Optional[str]]) -> str:
+    """
+    Build an agent's instructions: handoff preamble, static `prompt`, then CONFIGURATION.
+
+    Args:
+        prompt: The agent's instructions, referring to configuration values by name.
+        config: Display name to value, e.g. {"Tenant ID": TENANT_ID}.
+
+    Returns:
+        str: The instructions, identical for every request of the process.
+    """
+    return f"{prompt_with_handoff_instructions(prompt.strip())}\n\n{render_configuration(config)}\n"
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in `text` with the o200k_base encoding, or about 4 characters per token without tiktoken."""
+    if tiktoken is None:
+        return (len(text) + 3) // 4
+    return len(_encoding().encode(text))
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # Loaded on first use; tiktoken may fetch the encoding file
+    return tiktoken.get_encoding("o200k_base")
+
+
+def prompt_token_report(agents: List[Agent]) -> List[Dict[str, Any]]:
+    """
+    Tokens each agent sends with every model request: its instructions plus the schemas of
+    its tools and handoffs.
+
+    Returns:
+        list: One dict per agent with "agent", "instructions_tokens", "tools_tokens",
+        "total_tokens" and "tokenizer" ("o200k_base", or "estimate" without tiktoken).
+    """
+    report = []
+    for agent in agents:
+        instructions = agent.instructions if isinstance(agent.instructions, str) else ""
+        schemas = [
+            {"name": tool.name, "description": tool.description, "parameters": tool.params_json_schema}
+            for tool in agent.tools if hasattr(tool, "params_json_schema")
+        ]
+        for target in agent.handoffs:
+            target = target if not isinstance(target, Agent) else handoff(target)
+            schemas.append({"name": target.tool_name, "description": target.tool_description,
+                            "parameters": target.input_json_schema})
+        instructions_tokens = count_tokens(instructions)
+        tools_tokens = sum(count_tokens(json.dumps(schema)) for schema in schemas)
+        report.append({
+            "agent": agent.name,
+            "instructions_tokens": instructions_tokens,
+            "tools_tokens": tools_tokens,
+            "total_tokens": instructions_tokens + tools_tokens,
+            "tokenizer": "estimate" if tiktoken is None else "o200k_base",
+        })
+    return report
@@ -0,0 +1,330 @@
+from dotenv import load_dotenv
+
+load_dotenv()
+import asyncio
+import multiprocessing
+import os
+import signal
+import time
+import zlib
+from typing import Callable, List, Optional
+
+from observability.log import bind_log_context, get_logger
+from voice_gateway import VoiceGateway, session_from_path
+
+logger = get_logger(__name__)
+
+
+def _default_gateway() -> VoiceGateway:
+    return VoiceGateway(host="127.0.0.1", port=0)
+
+
+def _run_worker(slot: int, gateway_factory: Callable, control) -> None:
+    """Entry point of a worker process: one VoiceGateway on a private port."""
+    asyncio.run(_serve_worker(slot, gateway_factory, control))
+
+
+async def _serve_worker(slot: int, gateway_factory: Callable, control) -> None:
+    bind_log_context(worker=slot)
+    gateway = gateway_factory()
+    await gateway.start()
+    control.send(("ready", gateway.port))
+    try:
+        # Blocks until the supervisor asks for a drain; EOFError means it went away, in
+        # which case there is nobody left to route clients here either
+        command, timeout = await asyncio.to_thread(control.recv)
+    except EOFError:
+        command, timeout = "drain", 0.0
+    logger.info("Worker draining", extra={"command": command})
+    await gateway.drain(timeout)
+
+
+class _Worker:
+    """A worker process as the supervisor sees it."""
+
+    def __init__(self, slot: int, generation: int, process, control):
+        self.slot = slot
+        self.generation = generation
+        self.process = process
+        self.control = control
+        self.port: Optional[int] = None
+        self.connections = 0
+        self.draining = False
+
+    @property
+    def available(self) -> bool:
+        """Whether new connections may be routed here."""
+        return not self.draining and self.process.is_alive()
+
+    def metrics(self) -> dict:
+        return {
+            "slot": self.slot,
+            "generation": self.generation,
+            "pid": self.process.pid,
+            "port": self.port,
+            "connections": self.connections,
+            "alive": self.process.is_alive(),
+            "draining": self.draining,
+        }
+
+
+class SessionSupervisor:
+    """
+    Shards voice sessions over worker processes, one per core, so audio processing isn't
+    limited by a single interpreter's GIL.
+
+    Every worker is a separate interpreter running its own VoiceGateway and VoiceServer on
+    a localhost port, so caches, HTTP clients and the ticket queue are per worker. Two
+    things on disk are shared: the ticket queue journal, which each process owns under a
+    lock (a worker that can't take it journals to its own file, see TicketWriteQueue),
+    and the SQLite ticket index. Everything the workers write to the index is keyed so
+    they can't clash: ticket numbers are handed out under SQLite's write lock, and the
+    provisional rows of queued tickets are keyed by issue number (TicketIndex.add_pending).
+    The supervisor owns the public port and forwards each connection's bytes to a worker
+    once it has read the WebSocket handshake, without decoding frames.
+
+    Routing: a client that names its session in the URL ("?session=counter-3") always lands
+    on the same worker slot, chosen by a stable hash of the id; other clients go to the
+    slot with the fewest connections. While a slot's worker is down, its sessions are
+    hashed over the workers that are up until it has been replaced.
+
+    restart() replaces the workers without dropping calls: each slot gets a new worker
+    that takes the new connections while the old one finishes the sessions it has and
+    exits. A worker that dies unexpectedly is replaced the same way.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        gateway_factory: Optional[Callable[[], VoiceGateway]] = None,
+        drain_timeout: Optional[float] = None,
+    ):
+        """
+        Args:
+            workers: Number of worker processes. Falls back to the SUPERVISOR_WORKERS
+                environment variable, then to the number of CPU cores.
+            host: Interface to listen on. Falls back to the GATEWAY_HOST environment
+                variable (default "0.0.0.0").
+            port: Port to listen on. Falls back to the GATEWAY_PORT environment variable
+                (default 8765); 0 picks a free port.
+            gateway_factory: Module-level function that builds a worker's VoiceGateway,
+                listening on localhost. It is pickled into the worker processes. Defaults
+                to a VoiceGateway with OpenAI models.
+            drain_timeout: Seconds a replaced worker gets to finish its sessions before
+                they are stopped. Falls back to the DRAIN_TIMEOUT environment variable
+                (default 600).
+        """
+        self.workers = workers or int(os.getenv("SUPERVISOR_WORKERS", "0")) or os.cpu_count() or 1
+        self.host = host or os.getenv("GATEWAY_HOST", "0.0.0.0")
+        self.port = int(os.getenv("GATEWAY_PORT", "8765")) if port is None else port
+        self.gateway_factory = gateway_factory or _default_gateway
+        if drain_timeout is None:
+            drain_timeout = float(os.getenv("DRAIN_TIMEOUT", "600"))
+        self.drain_timeout = drain_timeout
+        # Workers are started fresh rather than forked, so none inherits the supervisor's
+        # event loop or threads
+        self._context = multiprocessing.get_context("spawn")
+        self._slots: List[Optional[_Worker]] = [None] * self.workers
+        self._generation = 0
+        self._draining: List[asyncio.Task] = []
+        self._listener: Optional[asyncio.AbstractServer] = None
+        self._watchdog: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "SessionSupervisor":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def start(self) -> None:
+        """Start the workers and listen for clients."""
+        self._slots = list(await asyncio.gather(*(self._spawn(slot) for slot in range(self.workers))))
+        self._listener = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._listener.sockets[0].getsockname()[1]
+        self._watchdog = asyncio.create_task(self._watch())
+        logger.info("Session supervisor listening",
+                    extra={"host": self.host, "port": self.port, "workers": self.workers})
+
+    async def serve_forever(self) -> None:
+        await self._listener.serve_forever()
+
+    async def restart(self) -> None:
+        """Replace every worker, e.g. to deploy new code, letting ongoing calls finish."""
+        drains = [await self._replace(slot) for slot in range(self.workers)]
+        await asyncio.gather(*(drain for drain in drains if drain is not None), return_exceptions=True)
+
+    async def aclose(self) -> None:
+        """Stop accepting clients and drain every worker."""
+        if self._listener is None:
+            return
+        self._listener.close()
+        self._watchdog.cancel()
+        for worker in self._slots:
+            if worker is not None:
+                self._draining.append(asyncio.create_task(self._drain(worker)))
+        await asyncio.gather(*self._draining, return_exceptions=True)
+        self._draining.clear()
+        self._listener = None
+
+    def metrics(self) -> dict:
+        return {"workers": [worker.metrics() for worker in self._slots if worker is not None]}
+
+    def route(self, session_id: Optional[str]) -> Optional[_Worker]:
+        """The worker that should serve a new connection for `session_id`; None if all are down."""
+        available = [worker for worker in self._slots if worker is not None and worker.available]
+        if not available:
+            return None
+        if session_id:
+            # crc32 rather than hash(), which is salted differently in every process
+            key = zlib.crc32(session_id.encode())
+            worker = self._slots[key % self.workers]
+            if worker is not None and worker.available:
+                return worker
+            return available[key % len(available)]
+        return min(available, key=lambda worker: worker.connections)
+
+    async def _spawn(self, slot: int) -> _Worker:
+        self._generation += 1
+        control, child_control = self._context.Pipe()
+        process = self._context.Process(
+            target=_run_worker,
+            args=(slot, self.gateway_factory, child_control),
+            name=f"voice-worker-{slot}",
+            daemon=True,
+        )
+        process.start()
+        child_control.close()
+        worker = _Worker(slot, self._generation, process, control)
+        try:
+            if not await asyncio.to_thread(control.poll, 120.0):
+                raise EOFError
+            # EOFError too if the worker died while starting
+            _, worker.port = control.recv()
+        except EOFError:
+            process.terminate()
+            await asyncio.to_thread(process.join, 5.0)
+            control.close()
+            raise RuntimeError(f"Worker {slot} did not start (exit code {process.exitcode})")
+        logger.info("Worker started", extra=worker.metrics())
+        return worker
+
+    async def _replace(self, slot: int) -> Optional[asyncio.Task]:
+        """Route the slot to a new worker; returns the task draining the old one."""
+        old = self._slots[slot]
+        self._slots[slot] = await self._spawn(slot)
+        if old is None:
+            return None
+        self._draining = [drain for drain in self._draining if not drain.done()]
+        drain = asyncio.create_task(self._drain(old))
+        self._draining.append(drain)
+        return drain
+
+    async def _drain(self, worker: _Worker) -> None:
+        worker.draining = True
+        try:
+            worker.control.send(("drain", self.drain_timeout))
+        except (BrokenPipeError, OSError):
+            # Already gone
+            pass
+        await asyncio.to_thread(worker.process.join, self.drain_timeout + 30.0)
+        if worker.process.is_alive():
+            logger.warning("Worker did not exit after draining, terminating it", extra=worker.metrics())
+            worker.process.terminate()
+            await asyncio.to_thread(worker.process.join, 5.0)
+        worker.control.close()
+        logger.info("Worker stopped", extra=worker.metrics())
+
+    async def _watch(self, max_backoff: float = 60.0) -> None:
+        """Replace workers that died without being asked to, backing off while that fails."""
+        failures = [0] * self.workers
+        retry_at = [0.0] * self.workers
+        while True:
+            await asyncio.sleep(1.0)
+            for slot, worker in enumerate(self._slots):
+                if (worker is None or worker.draining or worker.process.is_alive()
+                        or time.monotonic() < retry_at[slot]):
+                    continue
+                if not failures[slot]:
+                    logger.error("Worker died, replacing it",
+                                 extra={**worker.metrics(), "exitcode": worker.process.exitcode})
+                try:
+                    await self._replace(slot)
+                    failures[slot] = 0
+                except RuntimeError as e:
+                    # The dead worker stays in the slot, where route() skips it, until a
+                    # later attempt succeeds
+                    failures[slot] += 1
+                    delay = min(2.0 ** failures[slot], max_backoff)
+                    retry_at[slot] = time.monotonic() + delay
+                    logger.error("Could not replace worker, retrying in %.0f s: %s", delay, e,
+                                 extra={"slot": slot, "attempts": failures[slot]})
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Forward one client connection to the worker its session belongs to."""
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=10.0)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError):
+            writer.close()
+            return
+        parts = request.split(b" ", 2)
+        session_id = session_from_path(parts[1].decode("latin-1")) if len(parts) > 2 else None
+        worker = self.route(session_id)
+        if worker is None:
+            logger.error("No worker available", extra={"session": session_id})
+            writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n\r\n")
+            writer.close()
+            return
+        started = time.monotonic()
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", worker.port)
+        except OSError as e:
+            logger.warning("Worker unreachable: %s", e, extra=worker.metrics())
+            writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n\r\n")
+            writer.close()
+            return
+        upstream_writer.write(request)
+        worker.connections += 1
+        logger.debug("Connection routed", extra={"session": session_id, "worker": worker.slot,
+                                                 "route_ms": (time.monotonic() - started) * 1000})
+        pipes = [asyncio.create_task(self._pipe(reader, upstream_writer)),
+                 asyncio.create_task(self._pipe(upstream_reader, writer))]
+        try:
+            await asyncio.wait(pipes, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            worker.connections -= 1
+            for pipe in pipes:
+                pipe.cancel()
+            upstream_writer.close()
+            writer.close()
+
+    @staticmethod
+    async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # drain() waits while the other side's socket buffer is full, so a slow client
+        # still pushes back on the worker's audio sender
+        try:
+            while data := await reader.read(65536):
+                writer.write(data)
+                await writer.drain()
+        except ConnectionError:
+            pass
+
+
+async def main() -> None:
+    async with SessionSupervisor() as supervisor:
+        loop = asyncio.get_running_loop()
+        # SIGHUP deploys new code without dropping calls; SIGTERM drains and exits
+        loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(supervisor.restart()))
+        serving = asyncio.ensure_future(supervisor.serve_forever())
+        loop.add_signal_handler(signal.SIGTERM, serving.cancel)
+        try:
+            await serving
+        except asyncio.CancelledError:
+            pass
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
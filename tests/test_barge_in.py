@@ -0,0 +1,23 @@
+"""Barge-in detection on synthetic bot speech, echo and an interrupting user."""
+import pytest
+
+from barge_in_benchmark import simulate
+
+USER_START = 3.0
+
+
+@pytest.mark.parametrize("coupling_db", [-24.0, -18.0, -12.0, -6.0])
+def test_echo_of_the_bot_does_not_barge_in(coupling_db):
+    assert simulate(coupling_db, None, user_level_db=-3.0)["triggered_at"] is None
+
+
+@pytest.mark.parametrize("coupling_db", [-24.0, -18.0, -12.0, -6.0])
+def test_user_speaking_over_the_bot_barges_in(coupling_db):
+    triggered_at = simulate(coupling_db, USER_START, user_level_db=-3.0)["triggered_at"]
+    assert triggered_at is not None
+    assert USER_START <= triggered_at < USER_START + 0.5
+
+
+def test_coupling_estimate_tracks_the_echo_path():
+    result = simulate(-18.0, None, user_level_db=-3.0)
+    assert result["coupling_estimate"] == pytest.approx(-18.0, abs=3.0)
@@ -0,0 +1,86 @@
+"""NangoCredentialManager against a stub Nango server on localhost."""
+import asyncio
+
+import pytest
+
+from nango_credentials_benchmark import StubNango
+from tools.http_client import aclose_http_client
+from tools.nango_credentials import NangoCredentialManager
+
+LATENCY = 0.05
+
+
+@pytest.fixture
+def nango():
+    stub = StubNango(latency=LATENCY, expires_in=3600.0)
+    yield stub
+    stub.close()
+
+
+def run(coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await aclose_http_client()
+    return asyncio.run(main())
+
+
+def test_token_is_cached_until_close_to_expiry(nango):
+    manager = NangoCredentialManager(base_url=nango.url, secret_key="stub")
+
+    async def calls():
+        return [await manager.get_access_token("conn") for _ in range(5)]
+
+    tokens = run(calls())
+    assert len(set(tokens)) == 1
+    assert nango.requests == 1
+    # A cold cache takes Nango's stored token rather than forcing a refresh
+    assert nango.forced_refreshes == 0
+    assert manager.metrics()["hits"] == 4
+
+
+def test_concurrent_callers_share_one_request(nango):
+    manager = NangoCredentialManager(base_url=nango.url, secret_key="stub")
+
+    async def burst():
+        return await asyncio.gather(*(manager.get_access_token("burst") for _ in range(10)))
+
+    tokens = run(burst())
+    assert len(set(tokens)) == 1
+    assert nango.requests == 1
+    assert manager.coalesced == 9
+
+
+def test_token_near_expiry_is_served_while_refreshed_in_the_background(nango):
+    manager = NangoCredentialManager(base_url=nango.url, secret_key="stub")
+
+    async def near_expiry():
+        nango.expires_in = manager.refresh_ahead - 10
+        stale = await manager.get_access_token("conn")
+        nango.expires_in = 3600.0
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        served = await manager.get_access_token("conn")
+        served_in = loop.time() - start
+        await asyncio.sleep(LATENCY * 4)
+        return stale, served, served_in, await manager.get_access_token("conn")
+
+    stale, served, served_in, refreshed = run(near_expiry())
+    assert served == stale and served_in < LATENCY / 2
+    assert refreshed != stale
+    assert nango.forced_refreshes == 1
+    assert nango.requests == 2
+
+
+def test_invalidated_token_is_fetched_again(nango):
+    manager = NangoCredentialManager(base_url=nango.url, secret_key="stub")
+
+    async def calls():
+        first = await manager.get_access_token("conn")
+        manager.invalidate("conn")
+        return first, await manager.get_access_token("conn")
+
+    first, second = run(calls())
+    assert first != second
+    assert nango.requests == 2
@@ -0,0 +1,56 @@
+"""PlaybackEngine's ring buffer around flushes."""
+import asyncio
+
+import numpy as np
+
+from audio.playback import PlaybackEngine
+
+
+class PausedOutputStream:
+    """Output stream whose callback only runs when the test calls pull()."""
+
+    def __init__(self, callback, blocksize, **kwargs):
+        self.callback = callback
+        self.blocksize = blocksize
+        self.active = False
+        self.latency = 0.0
+
+    def start(self):
+        self.active = True
+
+    def abort(self):
+        self.active = False
+
+    def close(self):
+        self.active = False
+
+    def pull(self) -> np.ndarray:
+        out = np.zeros((self.blocksize, 1), dtype=np.int16)
+        self.callback(out, self.blocksize, None, None)
+        return out.reshape(-1)
+
+
+def test_write_after_flush_waits_for_the_callback_to_skip_the_flushed_audio():
+    async def main():
+        engine = PlaybackEngine(samplerate=1000, block_size=10, buffer_seconds=0.1,
+                                stream_factory=PausedOutputStream)
+        engine.start()
+        stream = engine._stream
+        assert await engine.write(np.full(100, 1, dtype=np.int16)) is not None
+        assert engine.flush() == 100
+        assert engine.queued == 0
+
+        # The callback may still be reading the flushed frames, so they aren't free yet
+        assert await engine.write(np.full(10, 2, dtype=np.int16), max_wait=0.05) is None
+        assert engine.overruns == 1
+
+        writer = asyncio.ensure_future(engine.write(np.full(10, 2, dtype=np.int16)))
+        await asyncio.sleep(0.01)
+        assert not writer.done()
+        silent = stream.pull()
+        assert not silent.any()
+        assert await asyncio.wait_for(writer, 1.0) is not None
+        assert (stream.pull() == 2).all()
+        engine.close()
+
+    asyncio.run(main())
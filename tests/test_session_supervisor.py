@@ -0,0 +1,88 @@
+"""SessionSupervisor workers sharing the ticket journal directory and the ticket index."""
+import asyncio
+import functools
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from session_supervisor import SessionSupervisor
+from ticket_queue_benchmark import SHEET, StubSheets, ticket_row
+from tools.ticket_index import TicketIndex
+
+LINGER = 5.0
+
+
+class TicketWorker:
+    """Stands in for a worker's VoiceGateway: queues one ticket as soon as it starts."""
+
+    def __init__(self, sheets_url: str):
+        self.sheets_url = sheets_url
+        self.issue_no = None
+        self.port = None
+        self._queue = None
+        self._listener = None
+
+    async def start(self) -> None:
+        from tools.ticket_queue import TicketWriteQueue
+
+        # Default journal path, as every real worker uses; held back by the linger so the
+        # supervisor's other worker queues its ticket meanwhile
+        self._queue = TicketWriteQueue(linger=LINGER, sheets_api_url=self.sheets_url)
+        row = ticket_row(os.getpid() % 1000000, 0)
+        await self._queue.enqueue("conn", "sheet", SHEET, row)
+        self._listener = await asyncio.start_server(lambda reader, writer: writer.close(), "127.0.0.1", 0)
+        self.port = self._listener.sockets[0].getsockname()[1]
+
+    async def drain(self, timeout) -> None:
+        await self._queue.aclose(timeout)
+        self._listener.close()
+
+
+@pytest.fixture
+def sheets(tmp_path, monkeypatch):
+    stub = StubSheets(SimpleNamespace(append_latency=0.0, row_latency=0.0, error_rate=0.0,
+                                      timeout_rate=0.0, client_timeout=1.0))
+    # Inherited by the worker processes
+    monkeypatch.setenv("NANGO_BASE_URL", stub.url)
+    monkeypatch.setenv("NANGO_SECRET_KEY", "stub")
+    monkeypatch.setenv("TICKET_INDEX_PATH", str(tmp_path / "ticket_index.sqlite3"))
+    monkeypatch.setenv("TICKET_JOURNAL_PATH", str(tmp_path / "ticket_journal.jsonl"))
+    yield stub
+    stub.close()
+
+
+def test_workers_queue_tickets_at_the_same_time(sheets, tmp_path):
+    factory = functools.partial(TicketWorker, f"{sheets.url}/v4/spreadsheets")
+    supervisor = SessionSupervisor(workers=2, host="127.0.0.1", port=0, gateway_factory=factory,
+                                   drain_timeout=10.0)
+
+    def tickets(index) -> list:
+        return [(row["issue_no"], row["row_index"] > 0) for row in index._db.execute(
+            "SELECT issue_no, row_index FROM tickets ORDER BY issue_no")]
+
+    async def main():
+        await supervisor.start()
+        pids = [worker["pid"] for worker in supervisor.metrics()["workers"]]
+        index = TicketIndex()
+        try:
+            # Both workers' first tickets are queued and neither has been sent yet
+            queued = tickets(index)
+            deadline = time.monotonic() + LINGER + 10.0
+            while len(sheets.issue_numbers()) < 2 and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+            await asyncio.sleep(0.5)
+            written = tickets(index)
+        finally:
+            index.close()
+            await supervisor.aclose()
+        return pids, queued, written
+
+    pids, queued, written = asyncio.run(main())
+    issue_nos = sorted(ticket_row(pid % 1000000, 0)[0] for pid in pids)
+    assert queued == [(issue_no, False) for issue_no in issue_nos]
+    assert written == [(issue_no, True) for issue_no in issue_nos]
+    assert sorted(sheets.issue_numbers()) == issue_nos
+    # One worker owned the shared journal, the other journaled to its own file
+    assert os.path.exists(tmp_path / "ticket_journal.jsonl")
@@ -0,0 +1,77 @@
+"""TicketWriteQueue's provisional rows in a ticket index shared by several queues."""
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import tools.nango_credentials as nango
+import tools.ticket_index as ticket_index
+from ticket_queue_benchmark import SHEET, StubSheets, ticket_row
+from tools.http_client import aclose_http_client
+from tools.ticket_queue import TicketWriteQueue
+
+
+@pytest.fixture
+def sheets(tmp_path, monkeypatch):
+    stub = StubSheets(SimpleNamespace(append_latency=0.0, row_latency=0.0, error_rate=0.0,
+                                      timeout_rate=0.0, client_timeout=1.0))
+    monkeypatch.setattr(nango, "_manager", nango.NangoCredentialManager(base_url=stub.url, secret_key="stub"))
+    index = ticket_index.TicketIndex(path=str(tmp_path / "index.sqlite3"),
+                                     sheets_api_url=f"{stub.url}/v4/spreadsheets")
+    monkeypatch.setattr(ticket_index, "_index", index)
+    yield stub
+    index.close()
+    stub.close()
+
+
+def pending_rows(index) -> list:
+    return [row["issue_no"] for row in index._db.execute(
+        "SELECT issue_no FROM tickets WHERE row_index < 0 ORDER BY issue_no")]
+
+
+def test_two_queues_sharing_an_index_keep_each_others_provisional_rows(sheets, tmp_path):
+    index = ticket_index.get_ticket_index()
+
+    async def main():
+        # Like two supervisor workers: separate journals, one index, both on their first ticket
+        first = TicketWriteQueue(journal_path=str(tmp_path / "a.jsonl"),
+                                 sheets_api_url=f"{sheets.url}/v4/spreadsheets")
+        second = TicketWriteQueue(journal_path=str(tmp_path / "b.jsonl"),
+                                  sheets_api_url=f"{sheets.url}/v4/spreadsheets")
+        try:
+            await first.enqueue("conn", "sheet", SHEET, ticket_row(1, 0))
+            await second.enqueue("conn", "sheet", SHEET, ticket_row(2, 0))
+            queued = pending_rows(index)
+
+            assert await first.drain(5.0)
+            # The second queue's ticket is still provisional and still visible
+            still_queued = index.get_ticket("sheet", SHEET, ticket_row(2, 0)[0])
+            assert await second.drain(5.0)
+        finally:
+            await first.aclose()
+            await second.aclose()
+            await aclose_http_client()
+        return queued, still_queued
+
+    queued, still_queued = asyncio.run(main())
+    assert queued == [ticket_row(1, 0)[0], ticket_row(2, 0)[0]]
+    assert still_queued is not None
+    for store in (1, 2):
+        ticket = index.get_ticket("sheet", SHEET, ticket_row(store, 0)[0])
+        assert ticket is not None and ticket["row_index"] > 0
+    assert pending_rows(index) == []
+    assert sorted(sheets.issue_numbers()) == [ticket_row(1, 0)[0], ticket_row(2, 0)[0]]
+
+
+def test_provisional_row_is_replaced_not_duplicated(tmp_path):
+    index = ticket_index.TicketIndex(path=str(tmp_path / "index.sqlite3"))
+    try:
+        index.add_pending("sheet", SHEET, ticket_row(1, 0))
+        index.add_pending("sheet", SHEET, ticket_row(2, 0))
+        index.add_pending("sheet", SHEET, ticket_row(1, 0))
+        assert pending_rows(index) == [ticket_row(1, 0)[0], ticket_row(2, 0)[0]]
+        index.remove_pending("sheet", SHEET, ticket_row(1, 0)[0])
+        assert pending_rows(index) == [ticket_row(2, 0)[0]]
+    finally:
+        index.close()
@@ -0,0 +1,50 @@
+"""TTSPhraseCache plans for the responses the prompts have the agents say word for word."""
+import asyncio
+
+import pytest
+from agents.voice import TTSModelSettings
+
+from audio.tts_cache import TTSPhraseCache
+from prompts import SPOKEN_PHRASES
+from stub_voice import StubLatencies, StubVoiceModelProvider
+from tts_cache_benchmark import CountingTTSModel
+
+SETTINGS = TTSModelSettings(voice="alloy")
+
+
+@pytest.fixture
+def warm_cache(tmp_path):
+    cache = TTSPhraseCache(directory=str(tmp_path), phrases=SPOKEN_PHRASES)
+    model = CountingTTSModel(StubVoiceModelProvider(StubLatencies(tts_first_byte=0.0, tts_realtime_factor=0.0)))
+    stored = asyncio.run(cache.warm(model, SETTINGS))
+    yield cache, model, stored
+    cache.close()
+
+
+def kinds(parts) -> list:
+    return [kind if kind != "tts" else ("tts", value) for kind, value in parts]
+
+
+def test_greeting_is_served_from_the_cache(warm_cache):
+    cache, model, _ = warm_cache
+    parts = cache.plan("Hello! Thank you for contacting Vishal Mega Mart Support. "
+                       "Could you share your name and store location?", model.model_name, SETTINGS)
+    assert kinds(parts) == ["audio", "audio", "audio"]
+
+
+def test_ticket_confirmation_synthesizes_only_the_number(warm_cache):
+    cache, model, _ = warm_cache
+    text = ("Your ticket has been successfully created.\n\nTICKET NUMBER: 250215082900\n\n"
+            "Please note down this ticket number for future reference. You will need it to "
+            "check the status of your ticket.\n\nIs there anything else I can help you with today?")
+    parts = cache.plan(text, model.model_name, SETTINGS)
+    assert kinds(parts) == ["audio", "audio", ("tts", "250215082900"), "audio", "audio", "audio"]
+
+
+def test_warm_only_stores_phrases_that_can_be_served(warm_cache):
+    cache, model, stored = warm_cache
+    # One TTS request per sentence; the greeting's two sentences are stored separately
+    assert stored == model.requests == len(SPOKEN_PHRASES) + 1
+    for phrase in SPOKEN_PHRASES:
+        parts = cache.plan(phrase, model.model_name, SETTINGS)
+        assert all(kind == "audio" for kind, _ in parts), phrase
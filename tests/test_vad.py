@@ -0,0 +1,55 @@
+"""Endpointing of the VAD engines on a WAV fixture with a known end of speech."""
+import pytest
+
+from audio.backends import load_wav, save_wav
+from audio.vad import VoiceActivityDetector
+from vad_benchmark import SAMPLERATE, run_engine, synthesize_turn
+
+ENDPOINT_TIMEOUT = 0.3
+
+
+@pytest.fixture(scope="module", params=range(3))
+def fixture_wav(request, tmp_path_factory):
+    """A synthetic turn written to and read back from a 16-bit WAV, with its speech region."""
+    audio, speech_start, speech_end = synthesize_turn(seed=request.param)
+    path = str(tmp_path_factory.mktemp("vad") / f"turn-{request.param}.wav")
+    save_wav(path, audio, SAMPLERATE)
+    samples, samplerate = load_wav(path)
+    assert samplerate == SAMPLERATE
+    return samples, speech_start, speech_end
+
+
+def test_energy_zcr_endpoints_shortly_after_speech_ends(fixture_wav):
+    samples, speech_start, speech_end = fixture_wav
+    result = run_engine("energy_zcr", samples, SAMPLERATE, ENDPOINT_TIMEOUT)
+
+    assert result["onset"] is not None
+    assert speech_start <= result["onset"] < speech_start + 0.2
+    # Not clipped: the pauses between words must not end the turn early
+    assert result["endpoint"] is not None and result["endpoint"] > speech_end
+    # The timeout plus block and frame granularity
+    assert result["endpoint"] - speech_end < ENDPOINT_TIMEOUT + 0.15
+
+
+def test_energy_zcr_endpoints_before_the_level_threshold(fixture_wav):
+    samples, _, speech_end = fixture_wav
+    fast = run_engine("energy_zcr", samples, SAMPLERATE, ENDPOINT_TIMEOUT)
+    threshold = run_engine("threshold", samples, SAMPLERATE, ENDPOINT_TIMEOUT)
+
+    assert threshold["endpoint"] is not None and threshold["endpoint"] > speech_end
+    assert threshold["endpoint"] - fast["endpoint"] > 0.5
+
+
+def test_noise_alone_is_not_speech():
+    audio, _, _ = synthesize_turn(seed=0)
+    noise = audio[: int(0.7 * SAMPLERATE)]
+    result = run_engine("energy_zcr", noise, SAMPLERATE, ENDPOINT_TIMEOUT)
+    assert result["onset"] is None and result["endpoint"] is None
+
+
+def test_detector_without_process_cannot_be_created():
+    class Incomplete(VoiceActivityDetector):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,34 @@
+"""VoiceClient against a minimal gateway."""
+import asyncio
+import json
+
+import numpy as np
+from websockets.asyncio.server import serve
+
+from audio.websocket_transport import WIRE_ENCODING, WIRE_SAMPLERATE, control_message
+from voice_client import VoiceClient
+
+
+async def gateway(connection):
+    await connection.recv()
+    await connection.send(control_message("ready", session_id="s", encoding=WIRE_ENCODING,
+                                          samplerate=WIRE_SAMPLERATE))
+    await connection.send(json.dumps({"type": "notice", "text": "agent is typing"}))
+    await connection.send(np.full(240, 1000, dtype="<i2").tobytes())
+    await connection.wait_closed()
+
+
+def test_text_messages_dont_stop_the_audio():
+    async def main():
+        async with serve(gateway, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            async with VoiceClient(f"ws://127.0.0.1:{port}") as client:
+                for _ in range(100):
+                    if client.received:
+                        break
+                    await asyncio.sleep(0.01)
+                return client.connected, client.received_audio()
+
+    connected, audio = asyncio.run(main())
+    assert connected
+    assert audio.shape[0] == 240 and (audio == 1000).all()
@@ -0,0 +1,52 @@
+"""The audio transport interface and WebSocketOutputStream's pacing of response audio."""
+import asyncio
+
+import numpy as np
+import pytest
+
+from audio.backends import AudioTransport
+from audio.websocket_transport import WebSocketOutputStream
+
+BLOCK = 240  # 10 ms at 24 kHz
+
+
+def run_stream(script, idle_after: float) -> list:
+    """Play `script`, a list of (value, blocks), through the stream; return what was sent."""
+    blocks = [value for value, count in script for _ in range(count)]
+    sent = []
+
+    def callback(outdata, frames, time_info, status):
+        outdata[:] = blocks.pop(0) if blocks else 0
+
+    async def send(data: bytes):
+        sent.append(int(np.frombuffer(data, dtype="<i2")[0]))
+
+    async def main():
+        stream = WebSocketOutputStream(send, blocksize=BLOCK, callback=callback, lead=0.0,
+                                       idle_after=idle_after)
+        stream.start()
+        await asyncio.sleep(len(blocks) * BLOCK / 24000 + 0.5)
+        stream.close()
+
+    asyncio.run(main())
+    return sent
+
+
+def test_silence_within_a_response_is_sent():
+    sent = run_stream([(0, 5), (100, 5), (0, 10), (100, 5), (0, 30)], idle_after=0.15)
+    # Leading silence is idle; the pause keeps its length; trailing silence stops after 15 blocks
+    assert sent == [100] * 5 + [0] * 10 + [100] * 5 + [0] * 15
+
+
+def test_long_silence_is_skipped_and_timing_resumes():
+    sent = run_stream([(100, 2), (0, 20), (100, 2)], idle_after=0.05)
+    assert sent == ([100] * 2 + [0] * 5) * 2
+
+
+def test_transport_without_both_streams_cannot_be_created():
+    class InputOnly(AudioTransport):
+        def input_stream(self, **kwargs):
+            return None
+
+    with pytest.raises(TypeError):
+        InputOnly()
@@ -1,55 +1,122 @@
-from typing import Dict, Any, List, Union
+import asyncio
+from typing import Dict, Any, List, Literal, Union
 import os
-import requests
-from agents import function_tool
+import httpx
+from agents import custom_span, function_tool
+
+from observability.log import get_logger
+from tools.http_client import get_http_client
+from tools.nango_credentials import get_credential_manager
+from tools.ticket_ids import get_ticket_id_allocator
+from tools.ticket_index import COLUMNS, get_ticket_index, row_index_of_update
+from tools.ticket_queue import get_ticket_queue
+
+logger = get_logger(__name__)
+
+MAX_PROBLEM_LENGTH = 500
+
+
+def build_ticket_row(
+    issue_no: str,
+    submit_date: str,
+    submit_time: str,
+    location: str,
+    level1: str,
+    level2: str,
+    level3: str,
+    problem: str,
+    submit_by: str,
+    priority: str,
+) -> List[str]:
+    """
+    Lay out a new ticket as the sheet's 18 columns (A-R), validating the fields first.
+
+    Location and categories are upper-cased like the rest of the sheet. Columns filled in
+    later by the support team (WIP, solved, TAT, RCA) are left empty.
+
+    Raises:
+        ValueError: If a field is empty, the problem is too long or the priority unknown.
+    """
+    fields = {
+        "location": location.strip().upper(),
+        "level1": level1.strip().upper(),
+        "level2": level2.strip().upper(),
+        "level3": level3.strip().upper(),
+        "problem": problem.strip(),
+        "submit_by": submit_by.strip(),
+        "priority": priority.strip().upper(),
+    }
+    missing = [name for name, value in fields.items() if not value]
+    if missing:
+        raise ValueError(f"Missing ticket fields: {', '.join(missing)}")
+    if len(fields["problem"]) > MAX_PROBLEM_LENGTH:
+        raise ValueError(f"Problem description is longer than {MAX_PROBLEM_LENGTH} characters")
+    if fields["priority"] not in ("HIGH", "MEDIUM", "LOW"):
+        raise ValueError(f"Priority must be HIGH, MEDIUM or LOW, not {priority!r}")
+
+    row = dict.fromkeys(COLUMNS, "")
+    row.update(fields, issue_no=issue_no, submit_date=submit_date, submit_time=submit_time)
+    return [row[column] for column in COLUMNS]
+
 
 @function_tool(
     name_override="create_ticket",
-    description_override="To create a ticket in a Google Spreadsheet.",
+    description_override="Create a ticket in the ticket sheet and return its ticket number.",
     strict_mode=True
 )
-def create_ticket(
-    connection_id: str, 
-    spreadsheet_id: str, 
-    sheet_name: str, 
-    row_data: List[Union[str, int, float, None]]
+async def create_ticket(
+    connection_id: str,
+    spreadsheet_id: str,
+    sheet_name: str,
+    location: str,
+    level1: str,
+    level2: str,
+    level3: str,
+    problem: str,
+    submit_by: str,
+    priority: Literal["HIGH", "MEDIUM", "LOW"],
 ) -> Dict[str, Any]:
     """
-    To create a ticket in a Google Spreadsheet.
+    Create a ticket in the ticket sheet and return its ticket number.
 
     Args:
         connection_id: The Google connection ID from Nango.
         spreadsheet_id: The Google Spreadsheet ID.
-        sheet_name: Name of the sheet to insert data.
-        row_data: List representing the row to append.
+        sheet_name: Name of the ticket sheet.
+        location: Store location.
+        level1: Level-1 category, e.g. APPLICATION.
+        level2: Level-2 category, e.g. APPROVED REQUEST.
+        level3: Level-3 category, e.g. MOBILE NO.CHANGE IN CN.
+        problem: Short description of the problem in the user's words (under 500 characters).
+        submit_by: Name of the employee reporting the problem.
+        priority: HIGH, MEDIUM or LOW.
 
     Returns:
-        Dict containing the API response.
+        Dict with "status", the new "ticket_number", its "submit_date" and "submit_time",
+        the API "response" and "error".
     """
-    print("="*50)
-    print(f"::::[TOOL CALLED] CREATE TICKET:::::")
-    print(f"  - connection_id: {connection_id}")
-    print(f"  - spreadsheet_id: {spreadsheet_id}")
-    print(f"  - sheet_name: {sheet_name}")
-    print(f"  - row_data: {row_data}")
-    print("="*50)
-
-    def get_connection_credentials(id: str, providerConfigKey: str):
-        base_url = os.getenv("NANGO_BASE_URL")
-        secret_key = os.getenv("NANGO_SECRET_KEY")
-        url = f"{base_url}/connection/{id}"
-        params = {
-            "provider_config_key": providerConfigKey,
-            "refresh_token": "true",
-        }
+    logger.info(
+        "Tool called",
+        extra={
+            "tool": "create_ticket",
+            "connection_id": connection_id,
+            "spreadsheet_id": spreadsheet_id,
+            "sheet_name": sheet_name,
+            "location": location,
+            "level1": level1,
+            "level2": level2,
+            "level3": level3,
+            "submit_by": submit_by,
+            "priority": priority,
+        },
+    )
 
-        headers = {"Authorization": f"Bearer {secret_key}"}
-        response = requests.request("GET", url, headers=headers, params=params)
-        return response.json()
+    client = get_http_client()
+    credentials = get_credential_manager()
 
     class GoogleSheetsManager:
         @staticmethod
-        def append_row(
+        async def append_row(
             access_token: str, 
             spreadsheet_id: str, 
             sheet_name: str, 
@@ -76,7 +143,7 @@ def create_ticket(
                 payload = {"values": [row_data]}
 
                 # Make the API request to append data
-                response = requests.post(url, headers=headers, json=payload, timeout=10)
+                response = await client.post(url, headers=headers, json=payload)
                 response.raise_for_status()
 
                 if response.status_code == 200:
@@ -93,25 +160,70 @@ def create_ticket(
                     }
 
             except Exception as e:
+                if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 401:
+                    # Token revoked or rotated early; fetch a new one on the next call
+                    credentials.invalidate(connection_id, "google-sheet")
                 return {"status": "failed", "response": None, "error": str(e)}
 
     try:
-        # Retrieve access token using Nango
-        credentials = get_connection_credentials(
-            id=connection_id, 
-            providerConfigKey="google-sheet"
+        # Validate before a ticket number is used up
+        build_ticket_row("", "", "", location, level1, level2, level3, problem, submit_by, priority)
+    except ValueError as e:
+        logger.warning("Invalid ticket: %s", e, extra={"tool": "create_ticket"})
+        return {"status": "failed", "ticket_number": None, "response": None, "error": str(e)}
+
+    try:
+        # May wait on another process's write lock; keep that off the event loop
+        ticket = await asyncio.to_thread(get_ticket_id_allocator().allocate, spreadsheet_id, sheet_name)
+        row_data = build_ticket_row(
+            ticket["issue_no"], ticket["submit_date"], ticket["submit_time"],
+            location, level1, level2, level3, problem, submit_by, priority,
         )
-        access_token = credentials["credentials"]["access_token"]
+        created = {
+            "ticket_number": ticket["issue_no"],
+            "submit_date": ticket["submit_date"],
+            "submit_time": ticket["submit_time"],
+        }
+
+        if os.getenv("TICKET_WRITE_BEHIND", "true").lower() == "true":
+            # Journaled locally and confirmed right away; a background worker sends queued
+            # tickets to the sheet in batched appends
+            with custom_span("ticket_queue.enqueue"):
+                queued = await get_ticket_queue().enqueue(
+                    connection_id, spreadsheet_id, sheet_name, row_data
+                )
+            return {"status": "success", **created, "response": queued, "error": None}
+
+        # Retrieve access token using Nango; cached per connection and refreshed ahead of expiry
+        with custom_span("nango.credentials"):
+            access_token = await credentials.get_access_token(connection_id, "google-sheet")
 
         # Append the row to the spreadsheet
         sheets_manager = GoogleSheetsManager()
-        return sheets_manager.append_row(
-            access_token=access_token,
-            spreadsheet_id=spreadsheet_id,
-            sheet_name=sheet_name,
-            row_data=row_data,
-        )
+        with custom_span("sheets.append_row"):
+            result = await sheets_manager.append_row(
+                access_token=access_token,
+                spreadsheet_id=spreadsheet_id,
+                sheet_name=sheet_name,
+                row_data=row_data,
+            )
+
+        if result["status"] == "success":
+            # Status and duplicate checks read the local mirror; make the new ticket visible
+            # now. The ticket exists either way, so a mirror failure must not fail the call
+            try:
+                index = get_ticket_index()
+                row_index = row_index_of_update(result["response"].get("updates", {}).get("updatedRange"))
+                if row_index is not None:
+                    index.upsert_row(spreadsheet_id, sheet_name, row_index, row_data)
+                else:
+                    index.mark_stale(spreadsheet_id, sheet_name)
+            except Exception as e:
+                logger.warning("Ticket index update failed: %s", e, extra={"tool": "create_ticket"})
+            return {**result, **created}
+        return {**result, "ticket_number": None}
 
     except Exception as e:
         error_message = f"Error in Google Sheets append row script: {e}"
-        return {"status": "failed", "response": None, "error": error_message}
+        logger.error(error_message, extra={"tool": "create_ticket"})
+        return {"status": "failed", "ticket_number": None, "response": None, "error": error_message}
@@ -0,0 +1,77 @@
+from typing import Dict, Any
+from agents import custom_span, function_tool
+
+from observability.log import get_logger
+from tools.http_client import get_http_client
+from tools.nango_credentials import get_credential_manager
+from tools.ticket_index import get_ticket_index
+
+logger = get_logger(__name__)
+
+
+@function_tool(
+    name_override="find_recent_duplicates",
+    description_override="Find tickets for the same location and categories submitted within the last hours.",
+    strict_mode=True
+)
+async def find_recent_duplicates(
+    connection_id: str,
+    spreadsheet_id: str,
+    sheet_name: str,
+    location: str,
+    level1: str,
+    level2: str,
+    level3: str,
+    within_hours: float,
+) -> Dict[str, Any]:
+    """
+    Find tickets for the same location and categories submitted within the last hours.
+
+    Args:
+        connection_id: The Google connection ID from Nango.
+        spreadsheet_id: The Google Spreadsheet ID.
+        sheet_name: Name of the ticket sheet.
+        location: Store location (column B).
+        level1: Level-1 category (column C).
+        level2: Level-2 category (column D).
+        level3: Level-3 category (column E).
+        within_hours: How far back to look, normally 24.
+
+    Returns:
+        Dict with "status" and "duplicates", the matching tickets, newest first. Answered
+        from the ticket mirror; "stale" is True if the mirror may be missing changes made in
+        the sheet in the last minute or so.
+    """
+    logger.info(
+        "Tool called",
+        extra={
+            "tool": "find_recent_duplicates",
+            "spreadsheet_id": spreadsheet_id,
+            "sheet_name": sheet_name,
+            "location": location,
+            "level1": level1,
+            "level2": level2,
+            "level3": level3,
+            "within_hours": within_hours,
+        },
+    )
+
+    try:
+        index = get_ticket_index()
+        with custom_span("ticket_index.sync"):
+            freshness = await index.refresh_for_read(
+                get_http_client(),
+                lambda: get_credential_manager().get_access_token(connection_id, "google-sheet"),
+                spreadsheet_id,
+                sheet_name,
+            )
+
+        duplicates = index.find_recent_duplicates(
+            spreadsheet_id, sheet_name, location, level1, level2, level3, within_hours=within_hours
+        )
+        return {"status": "success", "duplicates": duplicates, "stale": freshness["stale"], "error": None}
+
+    except Exception as e:
+        error_message = f"Error in duplicate ticket check: {e}"
+        logger.error(error_message, extra={"tool": "find_recent_duplicates"})
+        return {"status": "failed", "duplicates": None, "error": error_message}
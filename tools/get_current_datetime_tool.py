@@ -1,16 +1,18 @@
 from agents import function_tool
 
+from observability.log import get_logger
+
+logger = get_logger(__name__)
+
 @function_tool(
     name_override="get_current_datetime",
     description_override="Get the current date and time in IST format.",
     strict_mode=True
 )
-def get_current_datetime():
+async def get_current_datetime():
     from datetime import datetime
     from zoneinfo import ZoneInfo
-    print("="*50)   
-    print("::::[TOOL CALLED] GET CURRENT DATETIME::::")
-    print("="*50)
+    logger.info("Tool called", extra={"tool": "get_current_datetime"})
     ist = ZoneInfo("Asia/Kolkata")
     current_datetime = datetime.now(ist)
     formatted_datetime = current_datetime.strftime("%d-%b-%y %I:%M %p IST")
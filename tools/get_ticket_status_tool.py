@@ -0,0 +1,72 @@
+from typing import Dict, Any
+from agents import custom_span, function_tool
+
+from observability.log import get_logger
+from tools.http_client import get_http_client
+from tools.nango_credentials import get_credential_manager
+from tools.ticket_index import get_ticket_index
+
+logger = get_logger(__name__)
+
+
+@function_tool(
+    name_override="get_ticket_status",
+    description_override="Get a ticket's details and status by its 12-digit ticket number.",
+    strict_mode=True
+)
+async def get_ticket_status(
+    connection_id: str,
+    spreadsheet_id: str,
+    sheet_name: str,
+    ticket_number: str,
+) -> Dict[str, Any]:
+    """
+    Get a ticket's details and status by its 12-digit ticket number.
+
+    Args:
+        connection_id: The Google connection ID from Nango.
+        spreadsheet_id: The Google Spreadsheet ID.
+        sheet_name: Name of the ticket sheet.
+        ticket_number: The 12-digit ticket number (Issue No).
+
+    Returns:
+        Dict with "status", the ticket fields and its derived "ticket_status"
+        (Resolved, In Progress or Open). Answered from the ticket mirror; "stale" is True
+        if the mirror may be missing changes made in the sheet in the last minute or so.
+    """
+    logger.info(
+        "Tool called",
+        extra={
+            "tool": "get_ticket_status",
+            "spreadsheet_id": spreadsheet_id,
+            "sheet_name": sheet_name,
+            "ticket_number": ticket_number,
+        },
+    )
+
+    try:
+        index = get_ticket_index()
+        with custom_span("ticket_index.sync"):
+            freshness = await index.refresh_for_read(
+                get_http_client(),
+                lambda: get_credential_manager().get_access_token(connection_id, "google-sheet"),
+                spreadsheet_id,
+                sheet_name,
+            )
+
+        ticket = index.get_ticket(spreadsheet_id, sheet_name, ticket_number.strip())
+        if ticket is None:
+            return {"status": "failed", "ticket": None, "error": "Ticket not found."}
+
+        if ticket["solved_date"]:
+            ticket["ticket_status"] = "Resolved"
+        elif ticket["wip_date"]:
+            ticket["ticket_status"] = "In Progress"
+        else:
+            ticket["ticket_status"] = "Open"
+        return {"status": "success", "ticket": ticket, "stale": freshness["stale"], "error": None}
+
+    except Exception as e:
+        error_message = f"Error in ticket status lookup: {e}"
+        logger.error(error_message, extra={"tool": "get_ticket_status"})
+        return {"status": "failed", "ticket": None, "error": error_message}
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import weakref
+from typing import Optional
+
+import httpx
+
+# httpx async clients are bound to the loop that created them
+_clients = weakref.WeakKeyDictionary()
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        float(os.getenv("HTTP_TIMEOUT", "10")),
+        connect=float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared async HTTP client for the running event loop.
+
+    The tools call Nango and the Google Sheets API through this client instead of
+    `requests`, so a slow response suspends only the tool call and the loop keeps
+    streaming TTS audio. Connections are pooled and kept alive between calls.
+    Timeouts come from HTTP_TIMEOUT (default 10 s) and HTTP_CONNECT_TIMEOUT (default 5 s).
+
+    Returns:
+        httpx.AsyncClient: Client owned by this module; close it with aclose_http_client().
+    """
+    loop = asyncio.get_running_loop()
+    client: Optional[httpx.AsyncClient] = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=_timeout(),
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=30.0),
+        )
+        _clients[loop] = client
+    return client
+
+
+async def aclose_http_client() -> None:
+    """Close the running loop's client, e.g. when the conversation ends."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,266 @@
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from observability.log import get_logger
+
+logger = get_logger(__name__)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a query for cache lookups: lower case, punctuation removed and
+    whitespace collapsed, so "PoS machine not printing?" and "pos machine  not printing"
+    share an entry.
+    """
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", query.lower())).strip()
+
+
+def hashed_trigram_embedding(text: str, dimensions: int = 512) -> np.ndarray:
+    """
+    Cheap local embedding for near-duplicate detection: character trigrams of the
+    normalized text hashed into a unit vector. Catches rephrasings that differ by a few
+    words or a typo ("weighing machine not printing" / "weighing machine is not printing")
+    without a model or a network call.
+
+    Args:
+        text: Normalized query.
+        dimensions: Vector size.
+
+    Returns:
+        np.ndarray: L2-normalized float32 vector.
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    padded = f"  {text} "
+    for i in range(len(padded) - 2):
+        vector[zlib.crc32(padded[i:i + 3].encode()) % dimensions] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class _Entry:
+    __slots__ = ("records", "expires_at", "document_ids", "embedding")
+
+    def __init__(self, records, expires_at, document_ids, embedding):
+        self.records = records
+        self.expires_at = expires_at
+        self.document_ids = document_ids
+        self.embedding = embedding
+
+
+class KnowledgeBaseCache:
+    """
+    In-process cache of knowledge base search results.
+
+    Entries are keyed on the normalized query and the filters that shape the result
+    (tenant, document, collection and limit), expire after `ttl` seconds and are evicted
+    least recently used first once `max_entries` is reached. Store staff ask the same few
+    questions all day, and a hit skips the hybrid Vespa query with its two server-side
+    embeddings.
+
+    With `similarity_threshold` set, a miss on the exact key falls back to the most
+    similar cached query with the same filters, compared with hashed_trigram_embedding.
+
+    When a KB document is re-indexed, call invalidate() with its tenant and document ID so
+    stale chunks are not served until the TTL runs out.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 600.0,
+        max_entries: int = 256,
+        similarity_threshold: Optional[float] = None,
+    ):
+        """
+        Args:
+            ttl: Seconds an entry is served for.
+            max_entries: Entries kept before the least recently used one is evicted.
+            similarity_threshold: Cosine similarity (0-1) at which a different query
+                counts as a near duplicate. None disables near-duplicate lookups.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(
+        query: str,
+        tenant_id: str,
+        limit: int,
+        document_id: Optional[str] = None,
+        collection_id: Optional[str] = None,
+    ) -> Tuple:
+        return (tenant_id, document_id, collection_id, limit, normalize_query(query))
+
+    def get(
+        self,
+        query: str,
+        tenant_id: str,
+        limit: int,
+        document_id: Optional[str] = None,
+        collection_id: Optional[str] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Look up cached records for a search.
+
+        Returns:
+            list or None: The cached records, or None on a miss.
+        """
+        key = self.make_key(query, tenant_id, limit, document_id, collection_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.records
+
+            if self.similarity_threshold is not None:
+                match = self._nearest(key, now)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.near_hits += 1
+                    logger.debug("Knowledge base near-duplicate hit",
+                                 extra={"query": key[-1], "cached_query": match[-1]})
+                    return self._entries[match].records
+
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        query: str,
+        tenant_id: str,
+        limit: int,
+        records: List[Dict[str, Any]],
+        document_id: Optional[str] = None,
+        collection_id: Optional[str] = None,
+    ) -> None:
+        """Store the records returned for a search."""
+        key = self.make_key(query, tenant_id, limit, document_id, collection_id)
+        document_ids = frozenset(r["id"] for r in records if "id" in r)
+        if document_id:
+            document_ids |= {document_id}
+        embedding = (
+            hashed_trigram_embedding(key[-1]) if self.similarity_threshold is not None else None
+        )
+        with self._lock:
+            self._entries[key] = _Entry(records, time.monotonic() + self.ttl, document_ids, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(
+        self,
+        tenant_id: Optional[str] = None,
+        document_id: Optional[str] = None,
+        collection_id: Optional[str] = None,
+    ) -> int:
+        """
+        Drop cached results, e.g. after a document has been re-indexed.
+
+        Without arguments the whole cache is cleared. With a document ID, every entry that
+        was filtered to that document or returned one of its chunks is dropped.
+
+        Args:
+            tenant_id: Only drop entries for this tenant.
+            document_id: Only drop entries filtered to or containing this document.
+            collection_id: Only drop entries filtered to this collection.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        with self._lock:
+            stale = [
+                key for key, entry in self._entries.items()
+                if (tenant_id is None or key[0] == tenant_id)
+                and (document_id is None or document_id in entry.document_ids)
+                # Unfiltered searches can return chunks from any collection
+                and (collection_id is None or key[2] in (collection_id, None))
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        logger.info("Knowledge base cache invalidated",
+                    extra={"tenant_id": tenant_id, "document_id": document_id,
+                           "collection_id": collection_id, "entries": len(stale)})
+        return len(stale)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Hit/miss counters since the cache was created."""
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.near_hits) / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+    def _nearest(self, key: Tuple, now: float) -> Optional[Tuple]:
+        embedding = hashed_trigram_embedding(key[-1])
+        best, best_score = None, self.similarity_threshold
+        for other, entry in self._entries.items():
+            if other[:4] != key[:4] or entry.embedding is None or entry.expires_at <= now:
+                continue
+            score = float(embedding @ entry.embedding)
+            if score >= best_score:
+                best, best_score = other, score
+        return best
+
+
+_cache: Optional[KnowledgeBaseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_kb_cache() -> KnowledgeBaseCache:
+    """
+    Return the process-wide cache, configured from KB_CACHE_TTL (seconds, default 600),
+    KB_CACHE_SIZE (entries, default 256) and KB_CACHE_SIMILARITY (near-duplicate threshold,
+    unset to disable).
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                similarity = os.getenv("KB_CACHE_SIMILARITY")
+                _cache = KnowledgeBaseCache(
+                    ttl=float(os.getenv("KB_CACHE_TTL", "600")),
+                    max_entries=int(os.getenv("KB_CACHE_SIZE", "256")),
+                    similarity_threshold=float(similarity) if similarity else None,
+                )
+    return _cache
+
+
+def invalidate_knowledge_base_cache(
+    tenant_id: Optional[str] = None,
+    document_id: Optional[str] = None,
+    collection_id: Optional[str] = None,
+) -> int:
+    """Invalidate the process-wide cache; see KnowledgeBaseCache.invalidate()."""
+    return get_kb_cache().invalidate(tenant_id, document_id, collection_id)
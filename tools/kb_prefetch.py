@@ -0,0 +1,200 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from observability.log import get_logger
+from tools.kb_cache import hashed_trigram_embedding, normalize_query
+from tools.kb_search import get_embeddings, get_validated_uuid
+
+logger = get_logger(__name__)
+
+
+class _Prefetch:
+    __slots__ = ("task", "filters", "embedding", "started_at", "finished_at", "claimed")
+
+    def __init__(self, filters: Tuple, embedding: np.ndarray):
+        self.task: Optional[asyncio.Task] = None
+        self.filters = filters
+        self.embedding = embedding
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.claimed = False
+
+
+class KnowledgeBasePrefetcher:
+    """
+    Speculative knowledge base searches started from the user's transcript.
+
+    Tech_Support_Agent searches the knowledge base before answering, so a technical turn
+    was STT, a model call that asks for search_knowledge_base, the Vespa query, then a
+    second model call. The workflow calls prefetch() with the transcript as soon as it
+    arrives, so the Vespa query runs alongside the first model call. When the model then
+    calls the tool, claim() hands it the in-flight or finished result if a prefetch has
+    the same filters and a query similar enough to the model's (cosine of
+    hashed_trigram_embedding at least `similarity_threshold`). Otherwise the tool queries
+    Vespa itself.
+
+    Results are fetched with `limit` and cut to the tool call's limit; prefetches are
+    dropped `ttl` seconds after they start.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.5,
+        limit: int = 5,
+        ttl: float = 30.0,
+        max_pending: int = 8,
+        search: Optional[Callable[..., Awaitable[List[Dict[str, Any]]]]] = None,
+    ):
+        """
+        Args:
+            similarity_threshold: Cosine similarity (0-1) between the transcript and the
+                model's query at which the prefetched result is used.
+            limit: Results fetched per prefetch; tool calls asking for more query Vespa.
+            ttl: Seconds a prefetch stays claimable.
+            max_pending: Prefetches kept at once; the oldest are dropped first.
+            search: Coroutine running the search, get_embeddings by default.
+        """
+        self.similarity_threshold = similarity_threshold
+        self.limit = limit
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.search = search or get_embeddings
+        self._pending: List[_Prefetch] = []
+        self._started = 0
+        self._hits = 0
+        self._misses = 0
+        self._unused = 0
+        self._failed = 0
+        self._saved = 0.0
+
+    def prefetch(
+        self,
+        query: str,
+        tenant_id: str,
+        document_id: Optional[str] = None,
+        collection_id: Optional[str] = None,
+    ) -> Optional[asyncio.Task]:
+        """Start searching for `query` on the running loop. Returns the task, or None if there is nothing to search."""
+        if not tenant_id or not normalize_query(query):
+            return None
+        self._prune(time.monotonic())
+        document_id, collection_id = get_validated_uuid(document_id), get_validated_uuid(collection_id)
+        entry = _Prefetch((tenant_id, document_id, collection_id),
+                          hashed_trigram_embedding(normalize_query(query)))
+        entry.task = asyncio.get_running_loop().create_task(
+            self._run(entry, query, tenant_id, document_id, collection_id)
+        )
+        entry.task.add_done_callback(self._done)
+        self._pending.append(entry)
+        self._started += 1
+        while len(self._pending) > self.max_pending:
+            self._drop(self._pending.pop(0))
+        return entry.task
+
+    async def claim(
+        self,
+        query: str,
+        tenant_id: str,
+        limit: int,
+        document_id: Optional[str] = None,
+        collection_id: Optional[str] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Result of a prefetch matching this search, waiting for it if still in flight.
+
+        Returns:
+            list or None: The records, or None if no prefetch matches or it failed.
+        """
+        now = time.monotonic()
+        self._prune(now)
+        loop = asyncio.get_running_loop()
+        embedding = hashed_trigram_embedding(normalize_query(query))
+        best, best_score = None, self.similarity_threshold
+        for entry in self._pending:
+            if (entry.filters != (tenant_id, document_id, collection_id) or limit > self.limit
+                    or entry.task.get_loop() is not loop):
+                continue
+            score = float(np.dot(entry.embedding, embedding))
+            if score >= best_score:
+                best, best_score = entry, score
+        if best is None:
+            self._misses += 1
+            return None
+
+        try:
+            # A cancelled tool call must not cancel the prefetch; another call may claim it
+            records = await asyncio.shield(best.task)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._misses += 1
+            logger.warning("Knowledge base prefetch failed, querying directly: %s", e)
+            return None
+
+        # The Vespa round trip, or the part of it that ran before the model asked
+        saved = min(now, best.finished_at) - best.started_at
+        best.claimed = True
+        self._hits += 1
+        self._saved += saved
+        logger.info("Knowledge base prefetch hit",
+                    extra={"similarity": round(best_score, 3), "saved_ms": round(saved * 1000, 1)})
+        return records[:limit]
+
+    def metrics(self) -> Dict[str, Any]:
+        claims = self._hits + self._misses
+        return {
+            "started": self._started,
+            "hits": self._hits,
+            "misses": self._misses,
+            "unused": self._unused,
+            "failed": self._failed,
+            "hit_rate": round(self._hits / claims, 3) if claims else None,
+            "saved_ms": round(self._saved * 1000, 1),
+            "saved_ms_per_hit": round(self._saved * 1000 / self._hits, 1) if self._hits else None,
+        }
+
+    async def _run(self, entry: _Prefetch, query: str, tenant_id: str,
+                   document_id: Optional[str], collection_id: Optional[str]) -> List[Dict[str, Any]]:
+        try:
+            return await self.search(query, tenant_id, self.limit,
+                                     document_id=document_id, collection_id=collection_id)
+        finally:
+            entry.finished_at = time.monotonic()
+
+    def _done(self, task: asyncio.Task) -> None:
+        # Retrieve the exception so an unclaimed failure isn't reported as never retrieved
+        if not task.cancelled() and task.exception() is not None:
+            self._failed += 1
+            logger.debug("Knowledge base prefetch error: %s", task.exception())
+
+    def _prune(self, now: float) -> None:
+        expired = [entry for entry in self._pending if now - entry.started_at > self.ttl]
+        for entry in expired:
+            self._pending.remove(entry)
+            self._drop(entry)
+
+    def _drop(self, entry: _Prefetch) -> None:
+        if not entry.claimed:
+            self._unused += 1
+
+
+_prefetcher: Optional[KnowledgeBasePrefetcher] = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_kb_prefetcher() -> KnowledgeBasePrefetcher:
+    """Return the process-wide KnowledgeBasePrefetcher, configured from the environment."""
+    global _prefetcher
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = KnowledgeBasePrefetcher(
+                    similarity_threshold=float(os.getenv("KB_PREFETCH_SIMILARITY", "0.5")),
+                    limit=int(os.getenv("KB_PREFETCH_LIMIT", "5")),
+                )
+    return _prefetcher
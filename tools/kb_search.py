@@ -0,0 +1,172 @@
+import uuid
+from typing import Any, Dict, List, Optional
+
+from agents import custom_span
+from vespa.application import VespaQueryResponse
+
+from observability.log import get_logger
+from tools.vespa_client import get_vespa_client
+
+logger = get_logger(__name__)
+
+
+def is_valid_uuid(value: str) -> bool:
+    """
+    Check if a string is a valid UUID.
+
+    Args:
+        value: String to validate
+
+    Returns:
+        bool: True if string is a valid UUID, False otherwise
+    """
+    if not value:
+        return False
+
+    try:
+        uuid_obj = uuid.UUID(value)
+        return str(uuid_obj) == value.lower()
+    except (ValueError, AttributeError, TypeError):
+        return False
+
+
+def get_validated_uuid(value: Optional[str]) -> Optional[str]:
+    """
+    Validate a UUID string and return it if valid, None otherwise.
+
+    Args:
+        value: UUID string to validate
+
+    Returns:
+        str or None: The validated UUID string if valid, None otherwise
+    """
+    if value and is_valid_uuid(value):
+        return value
+    return None
+
+
+def construct_hybrid_query(
+    tenant_id: str,
+    query: str,
+    limit: int,
+    document_id: Optional[str] = None,
+    document_ids: Optional[list[str]] = None,
+    collection_id: Optional[str] = None,
+    ranking_profile: str = "hybrid",
+) -> dict:
+    """
+    Construct a hybrid search query combining text, BM25, and vector search with filters.
+
+    Args:
+        tenant_id: The tenant ID to filter by (mandatory)
+        query: The search query text
+        limit: Maximum number of results to return
+        document_id: Optional single document ID to filter by
+        document_ids: Optional list of document IDs to filter by
+        collection_id: Optional collection ID to filter by
+        ranking_profile: Ranking profile to use (default: "hybrid")
+
+    Returns:
+        dict: Query parameters including YQL and body parameters
+    """
+    if not tenant_id:
+        raise ValueError("tenant_id is mandatory")
+
+    # Build the base conditions for hybrid search (text + vector)
+    base_conditions = [
+        "userQuery()",
+        "({targetHits: 100}nearestNeighbor(embedding, q))",
+    ]
+
+    # Add mandatory tenant filter
+    filters = [f"tenant_id contains '{tenant_id}'"]
+
+    # Handle document filtering logic
+    if document_id:
+        filters.append(f"id contains'{document_id}'")  # Exact match for ID
+    elif document_ids:
+        id_conditions = [f"id = '{id}'" for id in document_ids]
+        filters.append(f"({' or '.join(id_conditions)})")
+
+    # Add collection filter if provided
+    if collection_id:
+        filters.append(f"collection_id = '{collection_id}'")
+
+    # Construct the final YQL query
+    yql = f"""
+        select * from tenant_documents
+        where ({' or '.join(base_conditions)})
+        and ({' and '.join(filters)})
+        limit {limit}
+    """.strip()
+
+    logger.debug("Knowledge base YQL", extra={"yql": yql})
+
+    # Construct complete query parameters
+    query_params = {
+        "yql": yql,
+        "query": query,
+        "body": {
+            "input.query(q)": "embed(e5, @query)",  # For dense retrieval (E5 model)
+            "input.query(qt)": "embed(colbert, @query)",  # For late interaction (ColBERT model)
+        },
+        "ranking.features.query(match_features)": "max_sim cos_sim bm25(content)",
+    }
+
+    return query_params
+
+
+async def get_embeddings(
+    query: str,
+    tenant_id: str,
+    limit: int,
+    document_id: Optional[str] = None,
+    document_ids: Optional[list[str]] = None,
+    collection_id: Optional[str] = None,
+    ranking_profile: str = "hybrid",
+) -> List[Dict[str, Any]]:
+    """
+    Get embeddings with hybrid search capabilities using text, BM25, and vector search.
+
+    Args:
+        query: The search query text
+        tenant_id: The tenant ID to filter by (mandatory)
+        limit: Maximum number of results to return
+        document_id: Optional single document ID to filter by
+        document_ids: Optional list of document IDs to filter by
+        collection_id: Optional collection ID to filter by
+        ranking_profile: Ranking profile to use (default: "hybrid")
+
+    Returns:
+        list: Matching chunks with their content, title, id, chunk_id and source.
+    """
+    # Shared client: the keep-alive connection outlives this call
+    vespa = get_vespa_client()
+
+    # Get query parameters
+    query_params = construct_hybrid_query(
+        tenant_id=tenant_id,
+        query=query,
+        limit=limit,
+        document_id=document_id,
+        document_ids=document_ids,
+        collection_id=collection_id,
+        ranking_profile=ranking_profile,
+    )
+
+    # Execute the query
+    with custom_span("vespa.query"):
+        response: VespaQueryResponse = await vespa.query_async(**query_params)
+
+    assert response.is_successful()
+
+    records = []
+    for hit in response.hits:
+        record = {}
+        # Include more fields based on schema
+        for field in ["content", "title", "id", "chunk_id", "source"]:
+            if field in hit["fields"]:
+                record[field] = hit["fields"][field]
+        records.append(record)
+
+    return records
@@ -1,14 +1,21 @@
 from typing import Dict, Any
-import os
-import requests
-from agents import function_tool
+import httpx
+from agents import custom_span, function_tool
+
+from observability.log import get_logger
+from tools.http_client import get_http_client
+from tools.nango_credentials import get_credential_manager
+from tools.sheet_lookup import SheetLookup
+
+logger = get_logger(__name__)
+
 
 @function_tool(
     name_override="lookup_row_in_gsheet",
     description_override="To find a row by a lookup value in a Google Spreadsheet.",
     strict_mode=True
 )
-def lookup_row_in_gsheet(
+async def lookup_row_in_gsheet(
     connection_id: str,
     spreadsheet_id: str,
     sheet_name: str,
@@ -28,31 +35,24 @@ def lookup_row_in_gsheet(
     Returns:
         Dict containing the matched row and its index.
     """
-    print("="*50)
-    print(f"[TOOL CALLED] lookup_row_in_gsheet with parameters:")
-    print(f"  - connection_id: {connection_id}")
-    print(f"  - spreadsheet_id: {spreadsheet_id}")
-    print(f"  - sheet_name: {sheet_name}")
-    print(f"  - lookup_value: {lookup_value}")
-    print(f"  - lookup_column: {lookup_column}")
-    print("="*50)
-
-    def get_connection_credentials(id: str, providerConfigKey: str):
-        base_url = os.getenv("NANGO_BASE_URL")
-        secret_key = os.getenv("NANGO_SECRET_KEY")
-        url = f"{base_url}/connection/{id}"
-        params = {
-            "provider_config_key": providerConfigKey,
-            "refresh_token": "true",
-        }
-
-        headers = {"Authorization": f"Bearer {secret_key}"}
-        response = requests.request("GET", url, headers=headers, params=params)
-        return response.json()
+    logger.info(
+        "Tool called",
+        extra={
+            "tool": "lookup_row_in_gsheet",
+            "connection_id": connection_id,
+            "spreadsheet_id": spreadsheet_id,
+            "sheet_name": sheet_name,
+            "lookup_value": lookup_value,
+            "lookup_column": lookup_column,
+        },
+    )
+
+    client = get_http_client()
+    credentials = get_credential_manager()
 
     class GoogleSheetsManager:
         @staticmethod
-        def find_row(
+        async def find_row(
             access_token: str,
             spreadsheet_id: str,
             sheet_name: str,
@@ -70,55 +70,23 @@ def lookup_row_in_gsheet(
                 lookup_column: The column to search in.
 
             Returns:
-                Dict containing the matched row, its index, or an error message.
+                Dict containing the matched row and its index, or an error message.
             """
             try:
-                url = f"https://sheets.googleapis.com/v4/spreadsheets/{spreadsheet_id}/values/{sheet_name}!{lookup_column}:{lookup_column}"
-                headers = {
-                    "Authorization": f"Bearer {access_token}",
-                    "Content-Type": "application/json",
-                }
-
-                # Fetch all values in the lookup column
-                response = requests.get(url, headers=headers, timeout=10)
-                response.raise_for_status()
-
-                data = response.json().get("values", [])
-                if not data:
-                    return {
-                        "status": "failed",
-                        "row_index": None,
-                        "row_data": None,
-                        "error": "No data found in the sheet.",
-                    }
-
-                # Search for the lookup value
-                for index, row in enumerate(
-                    data, start=1
-                ):  # Google Sheets is 1-based index
-                    if row and row[0] == lookup_value:
-                        row_url = f"https://sheets.googleapis.com/v4/spreadsheets/{spreadsheet_id}/values/{sheet_name}!{index}:{index}"
-                        row_response = requests.get(
-                            row_url, headers=headers, timeout=10
-                        )
-                        row_response.raise_for_status()
-                        row_data = row_response.json().get("values", [[]])[0]
-
-                        return {
-                            "status": "success",
-                            "row_index": index,
-                            "row_data": row_data,
-                            "error": None,
-                        }
-
-                return {
-                    "status": "failed",
-                    "row_index": None,
-                    "row_data": None,
-                    "error": "Lookup value not found.",
-                }
+                # The column scan and a server-side filtered query run together, so the
+                # matching row usually arrives without a second round trip
+                return await SheetLookup(client).find_row(
+                    access_token=access_token,
+                    spreadsheet_id=spreadsheet_id,
+                    sheet_name=sheet_name,
+                    lookup_value=lookup_value,
+                    lookup_column=lookup_column,
+                )
 
             except Exception as e:
+                if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 401:
+                    # Token revoked or rotated early; fetch a new one on the next call
+                    credentials.invalidate(connection_id, "google-sheet")
                 return {
                     "status": "failed",
                     "row_index": None,
@@ -127,25 +95,24 @@ def lookup_row_in_gsheet(
                 }
 
     try:
-        # Retrieve access token using Nango
-
-        credentials = get_connection_credentials(
-            id=connection_id, providerConfigKey="google-sheet"
-        )
-        access_token = credentials["credentials"]["access_token"]
+        # Retrieve access token using Nango; cached per connection and refreshed ahead of expiry
+        with custom_span("nango.credentials"):
+            access_token = await credentials.get_access_token(connection_id, "google-sheet")
 
         # Find the row in the spreadsheet
         sheets_manager = GoogleSheetsManager()
-        return sheets_manager.find_row(
-            access_token=access_token,
-            spreadsheet_id=spreadsheet_id,
-            sheet_name=sheet_name,
-            lookup_value=lookup_value,
-            lookup_column=lookup_column,
-        )
+        with custom_span("sheets.find_row"):
+            return await sheets_manager.find_row(
+                access_token=access_token,
+                spreadsheet_id=spreadsheet_id,
+                sheet_name=sheet_name,
+                lookup_value=lookup_value,
+                lookup_column=lookup_column,
+            )
 
     except Exception as e:
         error_message = f"Error in Google Sheets find row script: {e}"
+        logger.error(error_message, extra={"tool": "lookup_row_in_gsheet"})
         return {
             "status": "failed",
             "row_index": None,
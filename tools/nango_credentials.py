@@ -0,0 +1,181 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from observability.log import get_logger
+from tools.http_client import get_http_client
+
+logger = get_logger(__name__)
+
+
+def parse_expires_at(value: Optional[str]) -> Optional[float]:
+    """
+    Convert Nango's `expires_at` (ISO 8601, e.g. "2024-03-08T09:43:03.725Z") to a Unix
+    timestamp. Returns None if it is missing or unparseable.
+    """
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class _Token:
+    __slots__ = ("access_token", "expires_at")
+
+    def __init__(self, access_token: str, expires_at: float):
+        self.access_token = access_token
+        self.expires_at = expires_at  # time.monotonic() deadline
+
+
+class NangoCredentialManager:
+    """
+    Shared cache of OAuth access tokens fetched from Nango, one per connection.
+
+    The tools used to call `{NANGO_BASE_URL}/connection/{id}?refresh_token=true` before every
+    Sheets request, adding a round trip and a forced token refresh to each ticket lookup
+    or creation. Here a token is fetched once and reused until it gets close to
+    `expires_at`:
+
+    - more than `refresh_ahead` seconds left: served from the cache;
+    - less than `refresh_ahead` but more than `min_validity` left: served from the cache
+      while a background task asks Nango for a refreshed token;
+    - less than `min_validity` left (or no token yet): the caller waits for Nango.
+
+    Concurrent callers that need the same connection share one in-flight request.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        refresh_ahead: float = 300.0,
+        min_validity: float = 60.0,
+        fallback_ttl: float = 300.0,
+    ):
+        """
+        Args:
+            base_url: Nango API URL. Falls back to the NANGO_BASE_URL environment variable.
+            secret_key: Nango secret key. Falls back to NANGO_SECRET_KEY.
+            refresh_ahead: Seconds before expiry at which a background refresh starts.
+            min_validity: Seconds of validity a served token must still have.
+            fallback_ttl: How long to reuse a token whose response has no expires_at.
+        """
+        self.base_url = base_url or os.getenv("NANGO_BASE_URL")
+        self.secret_key = secret_key or os.getenv("NANGO_SECRET_KEY")
+        self.refresh_ahead = refresh_ahead
+        self.min_validity = min_validity
+        self.fallback_ttl = fallback_ttl
+        self.hits = 0
+        self.fetches = 0
+        self.background_refreshes = 0
+        self.coalesced = 0
+        self._tokens: Dict[Tuple[str, str], _Token] = {}
+        # In-flight requests are tasks, so they belong to one event loop
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+    async def get_access_token(self, connection_id: str, provider_config_key: str = "google-sheet") -> str:
+        """
+        Return a valid access token for a connection.
+
+        Args:
+            connection_id: The Google connection ID from Nango.
+            provider_config_key: Nango integration the connection belongs to.
+
+        Returns:
+            str: OAuth2 access token.
+
+        Raises:
+            Exception: If Nango could not be reached or returned no token and no cached
+                token is still usable.
+        """
+        key = (connection_id, provider_config_key)
+        now = time.monotonic()
+        token = self._tokens.get(key)
+        if token is not None and token.expires_at - now > self.min_validity:
+            self.hits += 1
+            if token.expires_at - now <= self.refresh_ahead and key not in self._inflight:
+                self.background_refreshes += 1
+                self._start_fetch(key, force_refresh=True)
+            return token.access_token
+
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+        else:
+            # An expired token needs a refresh; for the first fetch Nango returns its stored
+            # token and only refreshes if that one is expired
+            task = self._start_fetch(key, force_refresh=token is not None)
+        return (await asyncio.shield(task)).access_token
+
+    def invalidate(self, connection_id: str, provider_config_key: str = "google-sheet") -> None:
+        """Forget a connection's token, e.g. after the Sheets API rejected it with 401."""
+        with self._lock:
+            self._tokens.pop((connection_id, provider_config_key), None)
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "connections": len(self._tokens),
+            "hits": self.hits,
+            "fetches": self.fetches,
+            "background_refreshes": self.background_refreshes,
+            "coalesced": self.coalesced,
+        }
+
+    def _start_fetch(self, key: Tuple[str, str], force_refresh: bool) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(self._fetch(key, force_refresh))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._fetch_done(key, t))
+        return task
+
+    def _fetch_done(self, key: Tuple[str, str], task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            # Waiting callers get the exception; a background refresh only logs it and the
+            # cached token is used until it runs out
+            logger.warning("Nango credentials request failed: %s", task.exception(),
+                           extra={"connection_id": key[0]})
+
+    async def _fetch(self, key: Tuple[str, str], force_refresh: bool) -> _Token:
+        connection_id, provider_config_key = key
+        self.fetches += 1
+        response = await get_http_client().get(
+            f"{self.base_url}/connection/{connection_id}",
+            headers={"Authorization": f"Bearer {self.secret_key}"},
+            params={
+                "provider_config_key": provider_config_key,
+                "refresh_token": "true" if force_refresh else "false",
+            },
+        )
+        response.raise_for_status()
+        credentials = response.json()["credentials"]
+
+        expires_at = parse_expires_at(credentials.get("expires_at"))
+        expires_in = expires_at - time.time() if expires_at is not None else self.fallback_ttl
+        token = _Token(credentials["access_token"], time.monotonic() + expires_in)
+        with self._lock:
+            self._tokens[key] = token
+        logger.debug("Nango access token fetched",
+                     extra={"connection_id": connection_id, "expires_in": round(expires_in),
+                            "forced_refresh": force_refresh})
+        return token
+
+
+_manager: Optional[NangoCredentialManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_credential_manager() -> NangoCredentialManager:
+    """Return the process-wide NangoCredentialManager, creating it on first use."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = NangoCredentialManager()
+    return _manager
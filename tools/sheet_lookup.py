@@ -0,0 +1,209 @@
+import asyncio
+import json
+import re
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+import httpx
+
+from observability.log import get_logger
+
+logger = get_logger(__name__)
+
+SHEETS_API_URL = "https://sheets.googleapis.com/v4/spreadsheets"
+QUERY_API_URL = "https://docs.google.com/spreadsheets/d"
+
+_COLUMN = re.compile(r"^[A-Z]{1,3}$")
+
+
+class QueryError(Exception):
+    """The visualization query endpoint rejected the query."""
+
+
+class QueryUnavailable(QueryError):
+    """The query endpoint can't be used for this spreadsheet at all, e.g. no Drive scope."""
+
+
+# Spreadsheets whose query endpoint failed; later lookups go straight to the values API
+_query_unavailable = set()
+
+
+def _cell_text(cell: Optional[dict]) -> str:
+    """Formatted text of a visualization API cell, matching what the values API returns."""
+    if not cell:
+        return ""
+    if cell.get("f") is not None:
+        return str(cell["f"])
+    value = cell.get("v")
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _trim(row: List[str]) -> List[str]:
+    """Drop trailing empty cells, as the values API does."""
+    end = len(row)
+    while end and row[end - 1] == "":
+        end -= 1
+    return row[:end]
+
+
+def _column_position(column: str) -> int:
+    """Zero-based position of a column letter, e.g. "A" -> 0, "AA" -> 26."""
+    position = 0
+    for letter in column:
+        position = position * 26 + ord(letter) - ord("A") + 1
+    return position - 1
+
+
+def _failed(error: str) -> Dict[str, Any]:
+    return {"status": "failed", "row_index": None, "row_data": None, "error": error}
+
+
+class SheetLookup:
+    """
+    Finds the first row of a sheet whose lookup column equals a value, in one round trip.
+
+    The tool used to download the whole lookup column, scan it in Python and then GET the
+    matching row, two round trips in a row. Here the column download and a query on
+    Google's side through the visualization query endpoint
+    (`/gviz/tq?tq=select * where A = '...' limit 1`), which returns only the matching
+    row, run at the same time.
+
+    The column scan is authoritative: it gives the row index, which the query endpoint
+    can't report, and it decides whether the value is there at all, since the query
+    endpoint nulls cells whose type differs from the column's majority type and so misses
+    values in mixed columns such as phone numbers. The query's row is used when it
+    matches what the scan found; if the query misses, fails or returns something else,
+    the row is fetched by index as before. Spreadsheets where the endpoint can't be used
+    at all (e.g. the token lacks the Drive scope) skip the query on later lookups.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        sheets_api_url: str = SHEETS_API_URL,
+        query_api_url: str = QUERY_API_URL,
+    ):
+        """
+        Args:
+            client: Shared async HTTP client.
+            sheets_api_url: Base URL of the Sheets values API.
+            query_api_url: Base URL of the visualization query endpoint.
+        """
+        self.client = client
+        self.sheets_api_url = sheets_api_url
+        self.query_api_url = query_api_url
+
+    async def find_row(
+        self,
+        access_token: str,
+        spreadsheet_id: str,
+        sheet_name: str,
+        lookup_value: str,
+        lookup_column: str,
+    ) -> Dict[str, Any]:
+        """
+        Args:
+            access_token: OAuth2 access token.
+            spreadsheet_id: ID of the spreadsheet.
+            sheet_name: Name of the sheet to search.
+            lookup_value: The value to search for.
+            lookup_column: Column letter to search in, e.g. "A".
+
+        Returns:
+            Dict with "status", "row_index", "row_data" and "error", as the tool returns.
+        """
+        headers = {"Authorization": f"Bearer {access_token}"}
+        column = lookup_column.strip().upper()
+        if not _COLUMN.match(column):
+            return _failed(f"Invalid lookup column: {lookup_column}")
+
+        query = None
+        if spreadsheet_id not in _query_unavailable:
+            query = asyncio.ensure_future(self._query(headers, spreadsheet_id, sheet_name, lookup_value, column))
+        try:
+            data = await self._column(headers, spreadsheet_id, sheet_name, column)
+            if not data:
+                return _failed("No data found in the sheet.")
+            index = next((i for i, row in enumerate(data, start=1)  # Google Sheets is 1-based index
+                          if row and row[0] == lookup_value), None)
+            if index is None:
+                return _failed("Lookup value not found.")
+
+            row = None
+            if query is not None:
+                try:
+                    row = await query
+                except (QueryError, httpx.HTTPError) as e:
+                    if isinstance(e, QueryUnavailable):
+                        _query_unavailable.add(spreadsheet_id)
+                    logger.info("Sheet query failed, fetching the row by index: %s", e,
+                                extra={"spreadsheet_id": spreadsheet_id, "sheet_name": sheet_name})
+            position = _column_position(column)
+            if row is None or position >= len(row) or row[position] != lookup_value:
+                row = await self._row(headers, spreadsheet_id, sheet_name, index)
+            return {"status": "success", "row_index": index, "row_data": row, "error": None}
+        finally:
+            if query is not None and not query.done():
+                query.cancel()
+
+    async def _query(self, headers, spreadsheet_id, sheet_name, lookup_value, column) -> Optional[List[str]]:
+        if "'" not in lookup_value:
+            literal = f"'{lookup_value}'"
+        elif '"' not in lookup_value:
+            literal = f'"{lookup_value}"'
+        else:
+            raise QueryError("value can't be quoted in a query")
+
+        response = await self.client.get(
+            f"{self.query_api_url}/{spreadsheet_id}/gviz/tq",
+            headers=headers,
+            params={
+                "sheet": sheet_name,
+                "headers": "1",
+                "tqx": "out:json",
+                "tq": f"select * where {column} = {literal} limit 1",
+            },
+        )
+        payload = self._parse(response)
+        if payload.get("status") == "error":
+            # e.g. a number column compared with a string; the row is fetched by index instead
+            error = (payload.get("errors") or [{}])[0]
+            raise QueryError(error.get("detailed_message") or error.get("message") or "query error")
+        rows = payload.get("table", {}).get("rows", [])
+        if rows:
+            return _trim([_cell_text(cell) for cell in rows[0].get("c", [])])
+        return None
+
+    @staticmethod
+    def _parse(response: httpx.Response) -> dict:
+        if response.status_code != 200:
+            raise QueryUnavailable(f"status {response.status_code}")
+        text = response.text
+        # Body is `google.visualization.Query.setResponse({...});` behind an XSSI prefix
+        start, end = text.find("{"), text.rfind("}")
+        if start < 0 or end < start:
+            raise QueryUnavailable("unexpected response body")
+        try:
+            return json.loads(text[start:end + 1])
+        except ValueError as e:
+            raise QueryUnavailable(f"unparseable response: {e}")
+
+    async def _column(self, headers, spreadsheet_id, sheet_name, column) -> list:
+        response = await self.client.get(
+            f"{self.sheets_api_url}/{spreadsheet_id}/values/{quote(f'{sheet_name}!{column}:{column}')}",
+            headers=headers,
+        )
+        response.raise_for_status()
+        return response.json().get("values", [])
+
+    async def _row(self, headers, spreadsheet_id, sheet_name, index: int) -> List[str]:
+        response = await self.client.get(
+            f"{self.sheets_api_url}/{spreadsheet_id}/values/{quote(f'{sheet_name}!{index}:{index}')}",
+            headers=headers,
+        )
+        response.raise_for_status()
+        return response.json().get("values", [[]])[0]
@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from observability.log import get_logger
+from tools.ticket_index import IST
+
+logger = get_logger(__name__)
+
+# YYMMDDHHMM followed by a two-digit sequence within the minute; 12 digits, like the
+# YYYYMMDDHHMM numbers staff already read out and the status lookup checks for
+_PREFIX_FORMAT = "%y%m%d%H%M"
+_PER_MINUTE = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ticket_ids (
+    scope TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL
+);
+"""
+
+
+class TicketIdAllocator:
+    """
+    Hands out ticket numbers that are unique and increasing across every process using
+    the same SQLite file.
+
+    The model used to build the number itself from get_current_datetime, which cost a tool
+    round trip and gave two stores filing in the same minute the same number. Here the
+    number is the IST minute plus a sequence: "250215082900", "250215082901", ... The last
+    number handed out is kept in the ticket index database and advanced under SQLite's
+    write lock (BEGIN IMMEDIATE), so concurrent processes never see the same value.
+
+    A number is never lower than the last one, even if the clock steps back. A minute that
+    runs out of sequence numbers borrows from the next one, and numbers already present
+    in the mirrored sheet are skipped.
+    """
+
+    def __init__(self, path: Optional[str] = None, busy_timeout: float = 5.0):
+        """
+        Args:
+            path: SQLite file. Falls back to the TICKET_INDEX_PATH environment variable
+                (default "ticket_index.sqlite3"), shared with the ticket index.
+            busy_timeout: Seconds to wait for another process holding the write lock.
+        """
+        self.path = path or os.getenv("TICKET_INDEX_PATH", "ticket_index.sqlite3")
+        self._db = sqlite3.connect(self.path, timeout=busy_timeout, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def allocate(
+        self,
+        spreadsheet_id: Optional[str] = None,
+        sheet_name: Optional[str] = None,
+        now: Optional[datetime] = None,
+    ) -> Dict[str, str]:
+        """
+        Allocate the next ticket number.
+
+        Args:
+            spreadsheet_id: With `sheet_name`, skip numbers already in that mirrored sheet.
+            sheet_name: Name of the ticket sheet.
+            now: Submission time; defaults to the current time.
+
+        Returns:
+            Dict with "issue_no" and the "submit_date" ("15-Feb-25") and "submit_time"
+            ("08:29 AM") for the ticket's Submit Date and Submit Time columns.
+        """
+        now = (now or datetime.now(IST)).astimezone(IST)
+        floor = int(now.strftime(_PREFIX_FORMAT)) * _PER_MINUTE
+
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT last_id FROM ticket_ids WHERE scope = 'issue_no'").fetchone()
+                candidate = floor if row is None else max(floor, self._next(row[0]))
+                while spreadsheet_id and sheet_name and self._taken(spreadsheet_id, sheet_name, candidate):
+                    candidate = self._next(candidate)
+                self._db.execute(
+                    "INSERT INTO ticket_ids VALUES ('issue_no', ?) "
+                    "ON CONFLICT (scope) DO UPDATE SET last_id = excluded.last_id",
+                    (candidate,),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+        issue_no = f"{candidate:012d}"
+        if candidate // _PER_MINUTE != floor // _PER_MINUTE:
+            logger.info("Ticket number ahead of the clock",
+                        extra={"issue_no": issue_no, "minute": now.strftime(_PREFIX_FORMAT)})
+        return {
+            "issue_no": issue_no,
+            "submit_date": now.strftime("%d-%b-%y"),
+            "submit_time": now.strftime("%I:%M %p"),
+        }
+
+    def close(self) -> None:
+        self._db.close()
+
+    @staticmethod
+    def _next(value: int) -> int:
+        """The number after `value`, moving to the next minute when the sequence runs out."""
+        if value % _PER_MINUTE < _PER_MINUTE - 1:
+            return value + 1
+        minute = datetime.strptime(f"{value // _PER_MINUTE:010d}", _PREFIX_FORMAT) + timedelta(minutes=1)
+        return int(minute.strftime(_PREFIX_FORMAT)) * _PER_MINUTE
+
+    def _taken(self, spreadsheet_id: str, sheet_name: str, candidate: int) -> bool:
+        try:
+            return self._db.execute(
+                "SELECT 1 FROM tickets WHERE spreadsheet_id = ? AND sheet_name = ? AND issue_no = ? LIMIT 1",
+                (spreadsheet_id, sheet_name, f"{candidate:012d}"),
+            ).fetchone() is not None
+        except sqlite3.OperationalError:
+            # No mirror yet
+            return False
+
+
+_allocator: Optional[TicketIdAllocator] = None
+_allocator_lock = threading.Lock()
+
+
+def get_ticket_id_allocator() -> TicketIdAllocator:
+    """Return the process-wide TicketIdAllocator, opening the database on first use."""
+    global _allocator
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                _allocator = TicketIdAllocator()
+    return _allocator
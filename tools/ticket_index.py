@@ -0,0 +1,381 @@
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+from zoneinfo import ZoneInfo
+
+import httpx
+
+from observability.log import get_logger
+from tools.sheet_lookup import SHEETS_API_URL
+
+logger = get_logger(__name__)
+
+IST = ZoneInfo("Asia/Kolkata")
+
+# Sheet columns A-R in order
+COLUMNS = [
+    "issue_no", "location", "level1", "level2", "level3", "problem", "submit_date",
+    "submit_time", "wip_date", "wip_time", "solved_date", "solved_time", "tat", "submit_by",
+    "solved_by", "rca", "rca_by", "priority",
+]
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS tickets (
+    spreadsheet_id TEXT NOT NULL,
+    sheet_name TEXT NOT NULL,
+    row_index INTEGER NOT NULL,
+    {", ".join(f"{column} TEXT" for column in COLUMNS)},
+    submitted_at REAL,
+    PRIMARY KEY (spreadsheet_id, sheet_name, row_index)
+);
+CREATE INDEX IF NOT EXISTS tickets_issue_no ON tickets (spreadsheet_id, sheet_name, issue_no);
+CREATE INDEX IF NOT EXISTS tickets_duplicates ON tickets (
+    spreadsheet_id, sheet_name, UPPER(TRIM(location)), UPPER(TRIM(level1)),
+    UPPER(TRIM(level2)), UPPER(TRIM(level3)), submitted_at
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    spreadsheet_id TEXT NOT NULL,
+    sheet_name TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    full_synced_at REAL NOT NULL,
+    PRIMARY KEY (spreadsheet_id, sheet_name)
+);
+"""
+
+_UPDATED_ROW = re.compile(r"![A-Z]+(\d+)(?::[A-Z]+\d+)?$")
+
+
+def parse_submitted_at(submit_date: Optional[str], submit_time: Optional[str]) -> Optional[float]:
+    """
+    Unix time of a ticket's Submit Date and Submit Time ("15-Feb-25", "08:29 AM" or
+    "08:29 AM IST"), read as IST. Returns None if either is missing or malformed.
+    """
+    if not submit_date or not submit_time:
+        return None
+    text = f"{submit_date.strip()} {submit_time.strip().removesuffix('IST').strip()}"
+    for fmt in ("%d-%b-%y %I:%M %p", "%d-%b-%Y %I:%M %p"):
+        try:
+            return datetime.strptime(text, fmt).replace(tzinfo=IST).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def row_index_of_update(updated_range: Optional[str]) -> Optional[int]:
+    """First row number of an append response's `updates.updatedRange`, e.g. "Tickets!A120:R120"."""
+    match = _UPDATED_ROW.search(updated_range or "")
+    return int(match.group(1)) if match else None
+
+
+class TicketIndex:
+    """
+    On-disk SQLite mirror of the ticket sheet.
+
+    Status checks and the duplicate check used to be done by the model through
+    lookup_row_in_gsheet calls on single columns, one tool round trip each. The mirror
+    answers both with an indexed query, on issue number and on (location, level1, level2,
+    level3, submit time).
+
+    sync() keeps it current with one Sheets request. The first sync, and every
+    `full_sync_interval` seconds after it, reads the whole sheet. In between it re-reads
+    only the last `refresh_window` rows plus anything appended since, which picks up new
+    tickets and status changes on recent ones. create_ticket writes its row straight into
+    the mirror. The read tools answer from the mirror as it is and sync in the background
+    (refresh_for_read()), so a slow or failing Sheets read never holds up an answer.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_staleness: float = 30.0,
+        refresh_window: int = 500,
+        full_sync_interval: float = 900.0,
+        sheets_api_url: str = SHEETS_API_URL,
+    ):
+        """
+        Args:
+            path: SQLite file. Falls back to the TICKET_INDEX_PATH environment variable
+                (default "ticket_index.sqlite3").
+            max_staleness: ensure_fresh() and refresh_for_read() sync if the last sync is
+                older than this (s).
+            refresh_window: Trailing rows re-read on an incremental sync.
+            full_sync_interval: Seconds between full re-reads of the sheet.
+            sheets_api_url: Base URL of the Sheets values API.
+        """
+        self.path = path or os.getenv("TICKET_INDEX_PATH", "ticket_index.sqlite3")
+        self.max_staleness = max_staleness
+        self.refresh_window = refresh_window
+        self.full_sync_interval = full_sync_interval
+        self.sheets_api_url = sheets_api_url
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._synced_at: Dict[Tuple[str, str], float] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._sync_errors: Dict[Tuple[str, str], str] = {}
+
+    async def ensure_fresh(self, client: httpx.AsyncClient, access_token: str,
+                           spreadsheet_id: str, sheet_name: str) -> None:
+        """
+        Sync if this process hasn't synced the sheet within `max_staleness` seconds.
+        Concurrent callers share one sync.
+        """
+        task = self._start_sync(spreadsheet_id, sheet_name,
+                                lambda: self.sync(client, access_token, spreadsheet_id, sheet_name))
+        if task is not None:
+            await asyncio.shield(task)
+
+    async def refresh_for_read(self, client: httpx.AsyncClient, get_token: Callable[[], Awaitable[str]],
+                               spreadsheet_id: str, sheet_name: str) -> Dict[str, Any]:
+        """
+        Get the mirror ready for a read without waiting on Nango or Sheets when it can answer.
+
+        If the mirror is stale, a sync (token fetch included) starts in the background and
+        the read goes ahead on the rows already mirrored. Only a sheet that has never been
+        mirrored waits for its first sync; its errors are raised. Background sync errors are
+        logged and reported in the next reads' freshness until a sync succeeds.
+
+        Args:
+            get_token: Coroutine function returning a Sheets access token.
+
+        Returns:
+            Dict with "stale" (the mirror may be missing recent changes), "synced_seconds_ago"
+            (None if this process hasn't synced the sheet) and "sync_error".
+        """
+        async def sync() -> int:
+            return await self.sync(client, await get_token(), spreadsheet_id, sheet_name)
+
+        task = self._start_sync(spreadsheet_id, sheet_name, sync)
+        if task is not None and not self.is_mirrored(spreadsheet_id, sheet_name):
+            await asyncio.shield(task)
+        return self.freshness(spreadsheet_id, sheet_name)
+
+    def is_mirrored(self, spreadsheet_id: str, sheet_name: str) -> bool:
+        """Whether the sheet has been synced into the mirror, by this or an earlier process."""
+        return self._db.execute(
+            "SELECT 1 FROM sync_state WHERE spreadsheet_id = ? AND sheet_name = ?",
+            (spreadsheet_id, sheet_name),
+        ).fetchone() is not None
+
+    def freshness(self, spreadsheet_id: str, sheet_name: str) -> Dict[str, Any]:
+        """How current the mirror of a sheet is; see refresh_for_read()."""
+        key = (spreadsheet_id, sheet_name)
+        synced_at = self._synced_at.get(key)
+        age = None if synced_at is None else time.monotonic() - synced_at
+        return {
+            "stale": age is None or age >= self.max_staleness,
+            "synced_seconds_ago": None if age is None else round(age, 1),
+            "sync_error": self._sync_errors.get(key),
+        }
+
+    def _start_sync(self, spreadsheet_id: str, sheet_name: str,
+                    sync: Callable[[], Awaitable[int]]) -> Optional[asyncio.Task]:
+        """The running sync of a stale sheet, started with `sync` if there is none; None if fresh."""
+        key = (spreadsheet_id, sheet_name)
+        if time.monotonic() - self._synced_at.get(key, float("-inf")) < self.max_staleness:
+            return None
+        task = self._inflight.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.get_running_loop().create_task(sync())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._sync_done(key, t))
+        return task
+
+    def _sync_done(self, key: Tuple[str, str], task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Retrieving the exception also keeps background syncs from logging "never retrieved"
+        error = None if task.cancelled() else task.exception()
+        if error is None:
+            self._sync_errors.pop(key, None)
+        else:
+            self._sync_errors[key] = str(error) or type(error).__name__
+            logger.warning("Ticket index sync failed",
+                           extra={"spreadsheet_id": key[0], "sheet_name": key[1], "error": str(error)})
+
+    async def sync(self, client: httpx.AsyncClient, access_token: str,
+                   spreadsheet_id: str, sheet_name: str) -> int:
+        """
+        Pull new and recently changed rows from the sheet.
+
+        Returns:
+            int: Rows written to the mirror.
+        """
+        state = self._db.execute(
+            "SELECT rows, full_synced_at FROM sync_state WHERE spreadsheet_id = ? AND sheet_name = ?",
+            (spreadsheet_id, sheet_name),
+        ).fetchone()
+        full = state is None or time.time() - state["full_synced_at"] > self.full_sync_interval
+        # Row 1 is the header
+        start = 2 if full else max(2, state["rows"] - self.refresh_window + 1)
+
+        response = await client.get(
+            f"{self.sheets_api_url}/{spreadsheet_id}/values/{quote(f'{sheet_name}!A{start}:R')}",
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+        response.raise_for_status()
+        values = response.json().get("values", [])
+        # A full sync writes every row; keep that off the event loop
+        await asyncio.to_thread(self._store, spreadsheet_id, sheet_name, start, values, full)
+        self._synced_at[(spreadsheet_id, sheet_name)] = time.monotonic()
+        logger.info("Ticket index synced",
+                    extra={"spreadsheet_id": spreadsheet_id, "sheet_name": sheet_name,
+                           "full": full, "start_row": start, "rows_read": len(values)})
+        return len(values)
+
+    def _store(self, spreadsheet_id: str, sheet_name: str, start: int, values: list, full: bool) -> None:
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                if full:
+                    # Provisional rows of queued tickets aren't in the sheet yet
+                    self._db.execute("DELETE FROM tickets WHERE spreadsheet_id = ? AND sheet_name = ? "
+                                     "AND row_index > 0", (spreadsheet_id, sheet_name))
+                self._db.executemany(
+                    self._upsert_sql(),
+                    [self._record(spreadsheet_id, sheet_name, start + i, row)
+                     for i, row in enumerate(values) if row],
+                )
+                rows = start + len(values) - 1
+                self._db.execute(
+                    "INSERT INTO sync_state VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (spreadsheet_id, sheet_name) DO UPDATE SET rows = excluded.rows, "
+                    "full_synced_at = CASE WHEN ? THEN excluded.full_synced_at ELSE full_synced_at END",
+                    (spreadsheet_id, sheet_name, rows, time.time(), full),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def upsert_row(self, spreadsheet_id: str, sheet_name: str, row_index: int,
+                   row: Sequence[Any]) -> None:
+        """Write one sheet row into the mirror, e.g. right after create_ticket appended it."""
+        with self._lock:
+            self._db.execute(self._upsert_sql(), self._record(spreadsheet_id, sheet_name, row_index, row))
+            self._db.execute(
+                "UPDATE sync_state SET rows = MAX(rows, ?) WHERE spreadsheet_id = ? AND sheet_name = ?",
+                (row_index, spreadsheet_id, sheet_name),
+            )
+
+    def add_pending(self, spreadsheet_id: str, sheet_name: str, row: Sequence[Any]) -> None:
+        """
+        Write a provisional row for a ticket that is queued but not yet in the sheet, so
+        status checks and the duplicate check see it. Full syncs keep provisional rows.
+
+        They are keyed by issue number, not by anything local to the queue: workers of a
+        SessionSupervisor share the mirror. Each gets its own negative row index, taken
+        under the database write lock so processes never pick the same one.
+        """
+        issue_no = str(row[0]).strip()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "DELETE FROM tickets WHERE spreadsheet_id = ? AND sheet_name = ? AND issue_no = ? "
+                    "AND row_index < 0", (spreadsheet_id, sheet_name, issue_no),
+                )
+                (lowest,) = self._db.execute(
+                    "SELECT MIN(row_index) FROM tickets WHERE spreadsheet_id = ? AND sheet_name = ?",
+                    (spreadsheet_id, sheet_name),
+                ).fetchone()
+                row_index = min(lowest or 0, 0) - 1
+                self._db.execute(self._upsert_sql(), self._record(spreadsheet_id, sheet_name, row_index, row))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def remove_pending(self, spreadsheet_id: str, sheet_name: str, issue_no: str) -> None:
+        """Drop a ticket's provisional row once it has been written or given up on."""
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM tickets WHERE spreadsheet_id = ? AND sheet_name = ? AND issue_no = ? "
+                "AND row_index < 0", (spreadsheet_id, sheet_name, issue_no.strip()),
+            )
+
+    def mark_stale(self, spreadsheet_id: str, sheet_name: str) -> None:
+        """Make the next ensure_fresh() sync, e.g. after a write whose row is unknown."""
+        self._synced_at.pop((spreadsheet_id, sheet_name), None)
+
+    def get_ticket(self, spreadsheet_id: str, sheet_name: str, issue_no: str) -> Optional[Dict[str, Any]]:
+        """The most recently added row with this issue number, or None."""
+        row = self._db.execute(
+            "SELECT * FROM tickets WHERE spreadsheet_id = ? AND sheet_name = ? AND issue_no = ? "
+            "ORDER BY row_index DESC LIMIT 1",
+            (spreadsheet_id, sheet_name, issue_no),
+        ).fetchone()
+        return self._ticket(row) if row else None
+
+    def find_recent_duplicates(
+        self,
+        spreadsheet_id: str,
+        sheet_name: str,
+        location: str,
+        level1: str,
+        level2: str,
+        level3: str,
+        within_hours: float = 24.0,
+        limit: int = 10,
+        now: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Tickets with the same location and categories submitted within `within_hours`,
+        newest first and at most `limit` of them. Matching ignores case and surrounding
+        whitespace.
+        """
+        since = (time.time() if now is None else now) - within_hours * 3600
+        rows = self._db.execute(
+            "SELECT * FROM tickets WHERE spreadsheet_id = ? AND sheet_name = ? "
+            "AND UPPER(TRIM(location)) = ? AND UPPER(TRIM(level1)) = ? "
+            "AND UPPER(TRIM(level2)) = ? AND UPPER(TRIM(level3)) = ? AND submitted_at >= ? "
+            "ORDER BY submitted_at DESC LIMIT ?",
+            (spreadsheet_id, sheet_name, *(_key(v) for v in (location, level1, level2, level3)),
+             since, limit),
+        ).fetchall()
+        return [self._ticket(row) for row in rows]
+
+    def close(self) -> None:
+        self._db.close()
+
+    @staticmethod
+    def _upsert_sql() -> str:
+        names = ["spreadsheet_id", "sheet_name", "row_index", *COLUMNS, "submitted_at"]
+        return f"INSERT OR REPLACE INTO tickets ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+
+    @staticmethod
+    def _record(spreadsheet_id: str, sheet_name: str, row_index: int, row: Sequence[Any]) -> tuple:
+        cells = [("" if cell is None else str(cell)) for cell in row[:len(COLUMNS)]]
+        cells += [""] * (len(COLUMNS) - len(cells))
+        cells[0] = cells[0].strip()
+        return (spreadsheet_id, sheet_name, row_index, *cells, parse_submitted_at(cells[6], cells[7]))
+
+    @staticmethod
+    def _ticket(row: sqlite3.Row) -> Dict[str, Any]:
+        return {column: row[column] for column in ("row_index", *COLUMNS)}
+
+
+def _key(value: Optional[str]) -> str:
+    return (value or "").strip().upper()
+
+
+_index: Optional[TicketIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_ticket_index() -> TicketIndex:
+    """Return the process-wide TicketIndex, opening the database on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = TicketIndex(max_staleness=float(os.getenv("TICKET_INDEX_MAX_STALENESS", "30")))
+    return _index
@@ -0,0 +1,487 @@
+import asyncio
+import glob
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import quote
+
+import httpx
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no advisory locks; only one process may use the journal there
+    fcntl = None
+
+from observability.log import get_logger
+from tools.http_client import get_http_client
+from tools.nango_credentials import get_credential_manager
+from tools.sheet_lookup import SHEETS_API_URL
+from tools.ticket_index import get_ticket_index, row_index_of_update
+
+logger = get_logger(__name__)
+
+
+class _QueuedTicket:
+    __slots__ = ("seq", "connection_id", "spreadsheet_id", "sheet_name", "row", "attempts",
+                 "uncertain", "not_before", "enqueued_at")
+
+    def __init__(self, seq, connection_id, spreadsheet_id, sheet_name, row, uncertain=False):
+        self.seq = seq
+        self.connection_id = connection_id
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_name = sheet_name
+        self.row = row
+        self.attempts = 0
+        # True if an append of this row may have reached Sheets without being recorded
+        self.uncertain = uncertain
+        self.not_before = 0.0
+        self.enqueued_at = time.monotonic()
+
+    @property
+    def issue_no(self) -> str:
+        return str(self.row[0]).strip()
+
+    @property
+    def target(self) -> tuple:
+        return (self.connection_id, self.spreadsheet_id, self.sheet_name)
+
+
+class TicketWriteQueue:
+    """
+    Durable write-behind queue between create_ticket and the Sheets API.
+
+    create_ticket used to post one `values:append` per ticket and wait for it, so the caller
+    heard silence whenever Sheets was slow and a burst of tickets went out one request at a
+    time. Now a ticket is appended to a local journal (fsynced) and confirmed at once; a
+    background task on the event loop sends queued rows for the same sheet in one append
+    request, at most `batch_size` at a time.
+
+    Failed appends are retried with exponential backoff and jitter. Sends are idempotent on
+    the issue number: a ticket that is already queued is not queued again, and before a
+    batch that may already have been applied (a timeout, a 5xx, or rows replayed from the
+    journal after a restart) is re-sent, the ticket index is synced and rows whose issue
+    number is already in the sheet are dropped from it.
+
+    Journal records are JSON lines: "enqueue" with the row, then "done" or "failed". On
+    start the journal is replayed and compacted to the still-pending tickets.
+
+    A journal belongs to one process at a time, held with an exclusive lock on
+    "<journal>.lock" for the life of the process. When several processes share a directory
+    (the workers of a SessionSupervisor, or a restarted worker while its predecessor still
+    drains), the first takes `journal_path` and the others journal to "<journal>.<pid>".
+    Each new queue also adopts the journals whose owner has exited: their pending tickets
+    are replayed into its own journal and the files removed.
+    """
+
+    def __init__(
+        self,
+        journal_path: Optional[str] = None,
+        batch_size: int = 50,
+        linger: float = 0.05,
+        max_attempts: int = 10,
+        base_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        sheets_api_url: str = SHEETS_API_URL,
+    ):
+        """
+        Args:
+            journal_path: Append-only journal. Falls back to the TICKET_JOURNAL_PATH
+                environment variable (default "ticket_journal.jsonl").
+            batch_size: Rows sent in one append request at most.
+            linger: Seconds to wait after the first queued ticket for more to batch with it.
+            max_attempts: Attempts before a ticket is given up on and journaled as failed.
+            base_backoff: Delay before the first retry (s); doubles per attempt.
+            max_backoff: Upper bound for the retry delay (s).
+            sheets_api_url: Base URL of the Sheets values API.
+        """
+        self.journal_path = journal_path or os.getenv("TICKET_JOURNAL_PATH", "ticket_journal.jsonl")
+        self.batch_size = batch_size
+        self.linger = linger
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.sheets_api_url = sheets_api_url
+
+        self.enqueued = 0
+        self.written = 0
+        self.skipped_duplicates = 0
+        self.failed = 0
+        self.batches = 0
+        self.retries = 0
+        self._write_latencies: List[float] = []
+
+        self._pending: "OrderedDict[str, _QueuedTicket]" = OrderedDict()
+        self._completed = set()
+        self._seq = 0
+        self._journal_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._base_path = self.journal_path
+        self._owner_lock = self._lock_journal(self.journal_path)
+        if self._owner_lock is None:
+            # Another live process owns the shared journal
+            self.journal_path = f"{self._base_path}.{os.getpid()}"
+            self._owner_lock = self._lock_journal(self.journal_path)
+        self._replay()
+        self._journal = open(self.journal_path, "a")
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def enqueue(
+        self,
+        connection_id: str,
+        spreadsheet_id: str,
+        sheet_name: str,
+        row: Sequence[Any],
+    ) -> Dict[str, Any]:
+        """
+        Persist a ticket row and queue it for the sheet.
+
+        Args:
+            connection_id: The Google connection ID from Nango.
+            spreadsheet_id: The Google Spreadsheet ID.
+            sheet_name: Name of the ticket sheet.
+            row: The row, Issue No first.
+
+        Returns:
+            dict: "issue_no", and "queued" False with "duplicate" True if a ticket with this
+                issue number was already queued or written.
+        """
+        row = ["" if cell is None else cell for cell in row]
+        issue_no = str(row[0]).strip() if row else ""
+        if not issue_no:
+            raise ValueError("row has no issue number")
+        if issue_no in self._pending or issue_no in self._completed:
+            self.skipped_duplicates += 1
+            return {"issue_no": issue_no, "queued": False, "duplicate": True}
+
+        self._seq += 1
+        ticket = _QueuedTicket(self._seq, connection_id, spreadsheet_id, sheet_name, row)
+        # Held back from the worker until it is in the journal; being pending already stops a
+        # second enqueue of the same issue number and journal compaction
+        ticket.not_before = float("inf")
+        self._pending[issue_no] = ticket
+        try:
+            await asyncio.to_thread(self._append_journal, [{
+                "op": "enqueue", "seq": ticket.seq, "issue_no": issue_no, "connection_id": connection_id,
+                "spreadsheet_id": spreadsheet_id, "sheet_name": sheet_name, "row": row, "ts": time.time(),
+            }])
+        except BaseException:
+            self._pending.pop(issue_no, None)
+            raise
+        ticket.not_before = 0.0
+        self.enqueued += 1
+        # Visible to get_ticket_status and the duplicate check before it reaches the sheet
+        self._update_index(lambda index: index.add_pending(spreadsheet_id, sheet_name, row))
+        self._ensure_worker()
+        self._wakeup.set()
+        return {"issue_no": issue_no, "queued": True, "duplicate": False}
+
+    def start(self) -> None:
+        """Start the worker on the running loop, e.g. to flush tickets replayed from the journal."""
+        self._ensure_worker()
+        if self._pending:
+            self._wakeup.set()
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued ticket has been written or given up on.
+
+        Returns:
+            bool: True if the queue is empty.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.start()
+        while self._pending and (deadline is None or time.monotonic() < deadline):
+            await asyncio.sleep(0.02)
+        return not self._pending
+
+    async def aclose(self, timeout: float = 5.0) -> None:
+        """
+        Flush what can be flushed within `timeout` and stop the worker. Tickets still queued
+        stay in the journal and are sent after the next start.
+        """
+        if self._pending:
+            await self.drain(timeout)
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._pending:
+            logger.warning("Tickets left in the journal", extra={"pending": len(self._pending)})
+
+    def metrics(self) -> Dict[str, Any]:
+        latencies = np.asarray(self._write_latencies) * 1000
+        return {
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "pending": len(self._pending),
+            "skipped_duplicates": self.skipped_duplicates,
+            "failed": self.failed,
+            "batches": self.batches,
+            "retries": self.retries,
+            "write_p50_ms": round(float(np.percentile(latencies, 50)), 1) if latencies.size else None,
+            "write_p99_ms": round(float(np.percentile(latencies, 99)), 1) if latencies.size else None,
+        }
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._worker = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                # Give the rest of a burst a moment to join the batch
+                await asyncio.sleep(self.linger)
+
+            now = time.monotonic()
+            ready = [t for t in self._pending.values() if t.not_before <= now]
+            if not ready:
+                self._wakeup.clear()
+                wait = min(t.not_before for t in self._pending.values()) - now
+                try:
+                    # Infinite while the only pending tickets are still being journaled
+                    await asyncio.wait_for(self._wakeup.wait(),
+                                           timeout=None if wait == float("inf") else wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            target = ready[0].target
+            batch = [t for t in ready if t.target == target][: self.batch_size]
+            try:
+                await self._send(batch)
+            except Exception as e:
+                self._retry(batch, e)
+            if not self._pending:
+                self._compact()
+
+    async def _send(self, batch: List[_QueuedTicket]) -> None:
+        connection_id, spreadsheet_id, sheet_name = batch[0].target
+        client = get_http_client()
+        credentials = get_credential_manager()
+        access_token = await credentials.get_access_token(connection_id, "google-sheet")
+
+        if any(t.uncertain for t in batch):
+            batch = await self._drop_written(client, access_token, batch)
+            if not batch:
+                return
+
+        response = await client.post(
+            f"{self.sheets_api_url}/{spreadsheet_id}/values/{quote(f'{sheet_name}!A:A')}:append",
+            params={"valueInputOption": "RAW", "insertDataOption": "INSERT_ROWS"},
+            headers={"Authorization": f"Bearer {access_token}"},
+            json={"values": [t.row for t in batch]},
+        )
+        if response.status_code == 401:
+            credentials.invalidate(connection_id, "google-sheet")
+        response.raise_for_status()
+
+        start = row_index_of_update(response.json().get("updates", {}).get("updatedRange"))
+        self.batches += 1
+        self._complete(batch, [start + i if start is not None else None for i in range(len(batch))])
+
+    async def _drop_written(self, client, access_token: str, batch: List[_QueuedTicket]) -> List[_QueuedTicket]:
+        """Remove tickets whose issue number the sheet already has."""
+        connection_id, spreadsheet_id, sheet_name = batch[0].target
+        index = get_ticket_index()
+        index.mark_stale(spreadsheet_id, sheet_name)
+        await index.ensure_fresh(client, access_token, spreadsheet_id, sheet_name)
+        written, remaining = [], []
+        for ticket in batch:
+            existing = index.get_ticket(spreadsheet_id, sheet_name, ticket.issue_no)
+            if existing is not None and existing["row_index"] > 0:
+                written.append((ticket, existing["row_index"]))
+            else:
+                remaining.append(ticket)
+        if written:
+            logger.info("Queued tickets already in the sheet, not resending",
+                        extra={"issue_nos": [t.issue_no for t, _ in written]})
+            self._complete([t for t, _ in written], [row for _, row in written])
+        return remaining
+
+    def _complete(self, tickets: List[_QueuedTicket], rows: List[Optional[int]]) -> None:
+        self._append_journal([
+            {"op": "done", "seq": t.seq, "issue_no": t.issue_no, "row_index": row}
+            for t, row in zip(tickets, rows)
+        ])
+        now = time.monotonic()
+        for ticket, row_index in zip(tickets, rows):
+            self._pending.pop(ticket.issue_no, None)
+            self._completed.add(ticket.issue_no)
+            self.written += 1
+            self._write_latencies.append(now - ticket.enqueued_at)
+
+            def move(index, ticket=ticket, row_index=row_index):
+                index.remove_pending(ticket.spreadsheet_id, ticket.sheet_name, ticket.issue_no)
+                if row_index is not None:
+                    index.upsert_row(ticket.spreadsheet_id, ticket.sheet_name, row_index, ticket.row)
+                else:
+                    index.mark_stale(ticket.spreadsheet_id, ticket.sheet_name)
+
+            self._update_index(move)
+
+    def _retry(self, batch: List[_QueuedTicket], error: Exception) -> None:
+        # Only a response rejecting the request proves the rows were not written
+        rejected = isinstance(error, httpx.HTTPStatusError) and error.response.status_code < 500
+        now = time.monotonic()
+        failed = []
+        for ticket in batch:
+            ticket.attempts += 1
+            ticket.uncertain = ticket.uncertain or not rejected
+            if ticket.attempts >= self.max_attempts:
+                failed.append(ticket)
+                continue
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (ticket.attempts - 1))
+            ticket.not_before = now + delay * random.uniform(0.5, 1.0)
+        self.retries += len(batch) - len(failed)
+        logger.warning("Ticket append failed, will retry: %s", error,
+                       extra={"tickets": len(batch), "attempts": batch[0].attempts})
+
+        if failed:
+            self._append_journal([{"op": "failed", "seq": t.seq, "issue_no": t.issue_no,
+                                   "error": str(error)} for t in failed])
+            for ticket in failed:
+                self._pending.pop(ticket.issue_no, None)
+                self.failed += 1
+                self._update_index(
+                    lambda index, t=ticket: index.remove_pending(t.spreadsheet_id, t.sheet_name, t.issue_no)
+                )
+            logger.error("Gave up on tickets", extra={"issue_nos": [t.issue_no for t in failed],
+                                                      "error": str(error)})
+
+    @staticmethod
+    def _update_index(update) -> None:
+        try:
+            update(get_ticket_index())
+        except Exception as e:
+            logger.warning("Ticket index update failed: %s", e)
+
+    def _append_journal(self, records: List[dict]) -> None:
+        data = "".join(json.dumps(record) + "\n" for record in records)
+        with self._journal_lock:
+            self._journal.write(data)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+    @staticmethod
+    def _lock_journal(path: str):
+        """Take the journal's owner lock; None if another process holds it."""
+        lock = open(f"{path}.lock", "a")
+        if fcntl is None:
+            return lock
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return None
+        return lock
+
+    def _replay(self) -> None:
+        # Our own journal, then those of processes that exited with tickets still queued
+        paths = [self.journal_path]
+        orphans = []
+        for path in [self._base_path] + sorted(glob.glob(f"{glob.escape(self._base_path)}.*")):
+            if path in paths or not (path == self._base_path or path.rsplit(".", 1)[1].isdigit()):
+                continue
+            lock = self._lock_journal(path)
+            if lock is not None:
+                paths.append(path)
+                orphans.append((path, lock))
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path) as journal:
+                for line in journal:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn final line from a crash mid-write
+                        continue
+                    self._seq = max(self._seq, record.get("seq", 0))
+                    if record["op"] == "enqueue":
+                        # It may have been sent before the restart
+                        self._pending[record["issue_no"]] = _QueuedTicket(
+                            record["seq"], record["connection_id"], record["spreadsheet_id"],
+                            record["sheet_name"], record["row"], uncertain=True,
+                        )
+                    else:
+                        self._pending.pop(record["issue_no"], None)
+                        if record["op"] == "done":
+                            self._completed.add(record["issue_no"])
+        if self._pending:
+            logger.info("Replayed queued tickets from the journal",
+                        extra={"pending": len(self._pending), "journals": len(paths)})
+        self._rewrite_journal()
+        # Only once their tickets are safely in our journal
+        for path, lock in orphans:
+            if os.path.exists(path):
+                os.remove(path)
+            os.remove(f"{path}.lock")
+            lock.close()
+
+    def _compact(self, min_size: int = 2 ** 20) -> None:
+        """Truncate the journal once nothing is pending and it has grown past `min_size`."""
+        if self._pending:
+            return
+        with self._journal_lock:
+            if self._journal.tell() >= min_size:
+                self._journal.close()
+                self._rewrite_journal()
+                self._journal = open(self.journal_path, "a")
+
+    def _rewrite_journal(self) -> None:
+        temporary = f"{self.journal_path}.tmp"
+        with open(temporary, "w") as journal:
+            for ticket in self._pending.values():
+                journal.write(json.dumps({
+                    "op": "enqueue", "seq": ticket.seq, "issue_no": ticket.issue_no,
+                    "connection_id": ticket.connection_id, "spreadsheet_id": ticket.spreadsheet_id,
+                    "sheet_name": ticket.sheet_name, "row": ticket.row,
+                }) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(temporary, self.journal_path)
+
+
+_queue: Optional[TicketWriteQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_ticket_queue() -> TicketWriteQueue:
+    """Return the process-wide TicketWriteQueue, replaying its journal on first use."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = TicketWriteQueue()
+    return _queue
+
+
+def resume_ticket_queue() -> None:
+    """Start flushing tickets left in the journal by a previous run, if there is one."""
+    journal_path = os.getenv("TICKET_JOURNAL_PATH", "ticket_journal.jsonl")
+    if _queue is not None or os.path.exists(journal_path) or glob.glob(f"{glob.escape(journal_path)}.*"):
+        get_ticket_queue().start()
+
+
+async def close_ticket_queue(timeout: float = 5.0) -> None:
+    """Flush and stop the queue on the running loop if it was used."""
+    if _queue is not None:
+        await _queue.aclose(timeout)
+        logger.info("Ticket queue metrics", extra=_queue.metrics())
@@ -0,0 +1,216 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from typing import Optional
+
+from vespa.application import Vespa, VespaQueryResponse
+
+from observability.log import get_logger
+
+logger = get_logger(__name__)
+
+
+class VespaClient:
+    """
+    Process-wide Vespa application with long-lived HTTP clients.
+
+    Creating `Vespa(...)` and opening `app.syncio()` per query set up a new TCP/TLS
+    connection for every knowledge base lookup. This keeps one keep-alive client for
+    synchronous callers and one async client per event loop, and reuses them across
+    queries.
+
+    Clients that have been idle longer than `idle_timeout` are replaced before the next
+    query, since Vespa and any load balancer in front of it close idle keep-alive connections.
+    If a query still fails at the transport level, the client is replaced and the query is
+    retried once.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        port: Optional[int] = None,
+        connections: int = 4,
+        idle_timeout: float = 55.0,
+        health_timeout: float = 2.0,
+    ):
+        """
+        Args:
+            url: Vespa endpoint. Falls back to the VESPA_URL environment variable.
+            port: Vespa port. Falls back to the VESPA_PORT environment variable.
+            connections: Connections kept in each client's pool.
+            idle_timeout: Seconds after which an unused client is reopened.
+            health_timeout: Timeout for health_check() requests.
+        """
+        self.url = url or os.getenv("VESPA_URL")
+        port = port if port is not None else os.getenv("VESPA_PORT")
+        self.port = int(port) if port else None
+        self.connections = connections
+        self.idle_timeout = idle_timeout
+        self.health_timeout = health_timeout
+        self.healthy: Optional[bool] = None
+        self.reconnects = 0
+        self.queries = 0
+
+        self._app: Optional[Vespa] = None
+        self._lock = threading.RLock()
+        self._sync_client = None
+        self._sync_last_used = 0.0
+        # httpx/httpr async clients are bound to the loop that created them
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    @property
+    def app(self) -> Vespa:
+        if self._app is None:
+            with self._lock:
+                if self._app is None:
+                    self._app = Vespa(url=self.url, port=self.port)
+        return self._app
+
+    def query(self, **params) -> VespaQueryResponse:
+        """
+        Run a query on the shared synchronous client.
+
+        Args:
+            **params: Arguments for VespaSync.query (yql, query, body, ...).
+
+        Returns:
+            VespaQueryResponse: The response.
+        """
+        self.queries += 1
+        for attempt in range(2):
+            client = self._get_sync_client()
+            try:
+                with self.app.syncio(session=client) as session:
+                    return session.query(**params)
+            except Exception as e:
+                self._drop_sync_client(client)
+                if attempt:
+                    raise
+                logger.warning("Vespa query failed, reconnecting: %s", e)
+
+    async def query_async(self, **params) -> VespaQueryResponse:
+        """
+        Run a query on the async client of the running event loop.
+
+        Args:
+            **params: Arguments for VespaAsync.query (yql, query, body, ...).
+
+        Returns:
+            VespaQueryResponse: The response.
+        """
+        self.queries += 1
+        for attempt in range(2):
+            client = await self._get_async_client()
+            try:
+                async with self.app.asyncio(client=client) as session:
+                    return await session.query(**params)
+            except Exception as e:
+                await self._drop_async_client(client)
+                if attempt:
+                    raise
+                logger.warning("Vespa query failed, reconnecting: %s", e)
+
+    def health_check(self) -> bool:
+        """
+        Check /ApplicationStatus over the shared client. Also warms up the connection.
+
+        Returns:
+            bool: True if Vespa answered with 200.
+        """
+        client = self._get_sync_client()
+        try:
+            response = client.get(f"{self.app.end_point}/ApplicationStatus", timeout=self.health_timeout)
+            self.healthy = response.status_code == 200
+        except Exception as e:
+            logger.warning("Vespa health check failed: %s", e)
+            self._drop_sync_client(client)
+            self.healthy = False
+        return self.healthy
+
+    async def health_check_async(self) -> bool:
+        """Async variant of health_check() on the running loop's client."""
+        client = await self._get_async_client()
+        try:
+            response = await client.get(
+                f"{self.app.end_point}/ApplicationStatus", timeout=self.health_timeout
+            )
+            self.healthy = response.status_code == 200
+        except Exception as e:
+            logger.warning("Vespa health check failed: %s", e)
+            await self._drop_async_client(client)
+            self.healthy = False
+        return self.healthy
+
+    def close(self) -> None:
+        """Close the synchronous client. Async clients are closed by aclose() on their loop."""
+        with self._lock:
+            client, self._sync_client = self._sync_client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self) -> None:
+        """Close the running loop's async client."""
+        entry = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[0].aclose()
+
+    def _get_sync_client(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._sync_client is not None and now - self._sync_last_used > self.idle_timeout:
+                # Probably closed on the server side by now; don't wait for the request to fail
+                self._sync_client.close()
+                self._sync_client = None
+                self.reconnects += 1
+            if self._sync_client is None:
+                self._sync_client = self.app.get_sync_session(connections=self.connections)
+            self._sync_last_used = now
+            return self._sync_client
+
+    def _drop_sync_client(self, client) -> None:
+        with self._lock:
+            if self._sync_client is client:
+                self._sync_client = None
+                self.reconnects += 1
+        try:
+            client.close()
+        except Exception:
+            pass
+
+    async def _get_async_client(self):
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        entry = self._async_clients.get(loop)
+        if entry is not None and now - entry[1] > self.idle_timeout:
+            await self._drop_async_client(entry[0])
+            entry = None
+        client = entry[0] if entry is not None else self.app.get_async_session(connections=self.connections)
+        self._async_clients[loop] = (client, now)
+        return client
+
+    async def _drop_async_client(self, client) -> None:
+        loop = asyncio.get_running_loop()
+        entry = self._async_clients.get(loop)
+        if entry is not None and entry[0] is client:
+            del self._async_clients[loop]
+            self.reconnects += 1
+        try:
+            await client.aclose()
+        except Exception:
+            pass
+
+
+_client: Optional[VespaClient] = None
+_client_lock = threading.Lock()
+
+
+def get_vespa_client() -> VespaClient:
+    """Return the process-wide VespaClient, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = VespaClient()
+    return _client
@@ -0,0 +1,227 @@
+"""
+Command-line client for the WebSocket voice gateway (voice_gateway.py).
+
+Talks to the agents from this machine's microphone and speaker, or plays a WAV file as
+the caller and saves what the agent said, e.g. to check a deployed gateway.
+
+Usage:
+    python voice_client.py --url ws://localhost:8765
+    python voice_client.py --url ws://localhost:8765 --wav question.wav --save answer.wav
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Optional
+from urllib.parse import quote
+
+import numpy as np
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import ConnectionClosed
+
+from audio.websocket_transport import WIRE_ENCODING, WIRE_SAMPLERATE, control_message, encode_pcm
+from observability.log import get_logger
+
+logger = get_logger(__name__)
+
+
+class VoiceClient:
+    """
+    One caller connected to the gateway.
+
+    Microphone audio is sent with send_audio() or stream(); response audio is kept in
+    `received` as (time.monotonic(), int16 samples) pairs and handed to `on_audio`.
+    `last_audio_at` is when the last non-silent block arrived.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        session_id: Optional[str] = None,
+        on_audio: Optional[Callable[[np.ndarray], Awaitable[None]]] = None,
+        keep_audio: bool = True,
+    ):
+        """
+        Args:
+            url: Gateway URL, e.g. "ws://localhost:8765".
+            session_id: Session name to ask for. The gateway picks one if omitted.
+            on_audio: Coroutine called with each block of response audio, e.g. to play it.
+            keep_audio: Keep the response audio in `received`.
+        """
+        self.url = url
+        self.session_id = session_id
+        self.on_audio = on_audio
+        self.keep_audio = keep_audio
+        self.received = []
+        self.last_audio_at: Optional[float] = None
+        self.bytes_sent = 0
+        self._connection: Optional[ClientConnection] = None
+        self._receiver: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "VoiceClient":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    @property
+    def connected(self) -> bool:
+        return self._receiver is not None and not self._receiver.done()
+
+    async def connect(self) -> str:
+        """
+        Open the connection and start the session.
+
+        Returns:
+            str: The session id the gateway assigned.
+        """
+        url = self.url
+        if self.session_id:
+            # In the URL as well as the start message, so a SessionSupervisor can route on it
+            url += ("&" if "?" in url else "?") + "session=" + quote(self.session_id)
+        self._connection = await connect(url, compression=None)
+        start = {"encoding": WIRE_ENCODING, "samplerate": WIRE_SAMPLERATE}
+        if self.session_id:
+            start["session_id"] = self.session_id
+        await self._connection.send(control_message("start", **start))
+        ready = json.loads(await self._connection.recv())
+        if ready.get("type") != "ready":
+            raise RuntimeError(f"Gateway refused the session: {ready}")
+        self.session_id = ready["session_id"]
+        self._receiver = asyncio.create_task(self._receive())
+        return self.session_id
+
+    async def send_audio(self, samples: np.ndarray) -> None:
+        """Send one block of float32 or int16 microphone audio."""
+        data = encode_pcm(samples)
+        await self._connection.send(data)
+        self.bytes_sent += len(data)
+
+    async def stream(self, samples: np.ndarray, block: float = 0.02, realtime: bool = True) -> None:
+        """
+        Send audio in `block`-second messages, paced like a live microphone.
+
+        Args:
+            samples: float32 or int16 audio at the wire sample rate.
+            block: Seconds of audio per message.
+            realtime: Pace the messages in real time rather than as fast as possible.
+        """
+        size = int(block * WIRE_SAMPLERATE)
+        next_deadline = time.monotonic()
+        for start in range(0, samples.shape[0], size):
+            await self.send_audio(samples[start:start + size])
+            if realtime:
+                next_deadline += block
+                delay = next_deadline - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+    async def mute(self, microphone: Optional[bool] = None, speaker: Optional[bool] = None) -> None:
+        fields = {}
+        if microphone is not None:
+            fields["microphone"] = microphone
+        if speaker is not None:
+            fields["speaker"] = speaker
+        await self._connection.send(control_message("mute", **fields))
+
+    def received_audio(self) -> np.ndarray:
+        """All response audio so far, back to back."""
+        if not self.received:
+            return np.zeros(0, dtype=np.int16)
+        return np.concatenate([samples for _, samples in self.received])
+
+    async def close(self) -> None:
+        """End the session and close the connection."""
+        if self._connection is None:
+            return
+        try:
+            await self._connection.send(control_message("stop"))
+        except ConnectionClosed:
+            pass
+        await self._connection.close()
+        if self._receiver is not None:
+            await asyncio.gather(self._receiver, return_exceptions=True)
+        self._connection = None
+
+    async def _receive(self) -> None:
+        try:
+            async for message in self._connection:
+                if not isinstance(message, bytes):
+                    logger.info("Gateway message", extra={"control": message})
+                    continue
+                received_at = time.monotonic()
+                samples = np.frombuffer(message, dtype="<i2")
+                if samples.any():
+                    # The gateway goes on sending silence for a while after a response
+                    self.last_audio_at = received_at
+                if self.keep_audio:
+                    self.received.append((received_at, samples))
+                if self.on_audio is not None:
+                    await self.on_audio(samples)
+        except ConnectionClosed:
+            pass
+
+
+async def talk(url: str) -> None:
+    """Live conversation through this machine's microphone and speaker."""
+    from audio.capture import CaptureService
+    from audio.playback import PlaybackEngine
+
+    player = PlaybackEngine(samplerate=WIRE_SAMPLERATE)
+    capture = CaptureService(samplerate=WIRE_SAMPLERATE, block_size=480)
+    player.start()
+    capture.start()
+    try:
+        async with VoiceClient(url, on_audio=player.write, keep_audio=False) as client:
+            print(f"Connected as {client.session_id}; press Ctrl+C to hang up")
+            while client.connected:
+                block = await capture.read_block(timeout=0.25)
+                if block is not None:
+                    await client.send_audio(block)
+    finally:
+        capture.close()
+        player.close()
+
+
+async def play_file(url: str, wav: str, save: Optional[str], listen: float) -> None:
+    """Play `wav` as the caller, wait `listen` seconds for the answer and save it."""
+    from audio.backends import load_wav, save_wav
+
+    audio, samplerate = load_wav(wav)
+    if samplerate != WIRE_SAMPLERATE:
+        raise SystemExit(f"{wav}: expected {WIRE_SAMPLERATE} Hz audio, got {samplerate} Hz")
+    async with VoiceClient(url) as client:
+        sent_at = time.monotonic()
+        # Keep the microphone open after the question, as a caller waiting for the answer would
+        await client.stream(np.concatenate((audio, np.zeros(int(listen * WIRE_SAMPLERATE), np.float32))))
+        answer = client.received_audio()
+        first = client.received[0][0] - sent_at - audio.shape[0] / WIRE_SAMPLERATE if client.received else None
+    print(f"Session {client.session_id}: {answer.shape[0] / WIRE_SAMPLERATE:.1f} s of response audio"
+          + (f", first audio {first * 1000:.0f} ms after the question ended" if first is not None else ""))
+    if save:
+        save_wav(save, answer, WIRE_SAMPLERATE)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="ws://localhost:8765")
+    parser.add_argument("--wav", help="Mono 16-bit 24 kHz WAV to say instead of using the microphone")
+    parser.add_argument("--save", help="Where to save the response audio when using --wav")
+    parser.add_argument("--listen", type=float, default=15.0, help="Seconds to wait for the answer with --wav")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    from observability.log import configure_logging
+    configure_logging(level=args.log_level)
+    try:
+        if args.wav:
+            asyncio.run(play_file(args.url, args.wav, args.save, args.listen))
+        else:
+            asyncio.run(talk(args.url))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,198 @@
+from dotenv import load_dotenv
+
+load_dotenv()
+import asyncio
+import json
+import os
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from websockets.asyncio.server import ServerConnection, serve
+from websockets.exceptions import ConnectionClosed
+
+from audio.websocket_transport import (
+    WIRE_ENCODING,
+    WIRE_SAMPLERATE,
+    WebSocketTransport,
+    control_message,
+)
+from observability.log import bind_log_context, get_logger
+from voice_server import VoiceServer
+
+logger = get_logger(__name__)
+
+
+def session_from_path(path: str) -> Optional[str]:
+    """The session id a client asked for in its URL, e.g. "/?session=counter-3"."""
+    values = parse_qs(urlsplit(path).query).get("session")
+    return values[0] if values else None
+
+
+class VoiceGateway:
+    """
+    WebSocket endpoint that lets remote clients, e.g. a browser at a store counter, talk to
+    the agents without a sound card on the server.
+
+    Every connection becomes a VoiceSession on the wrapped VoiceServer whose audio goes
+    through a WebSocketTransport. The protocol:
+
+    1. The client sends a text message
+       {"type": "start", "session_id": "...", "encoding": "pcm16", "samplerate": 24000};
+       session_id is optional and may be given in the URL as "?session=..." instead, which
+       lets a SessionSupervisor route the connection before it is accepted.
+    2. The server answers {"type": "ready", "session_id": ..., "encoding": ..., "samplerate": ...}
+       or closes the connection with an error reason.
+    3. Binary messages in both directions carry mono 16-bit little-endian PCM: microphone
+       audio from the client, response audio from the server, paced in real time.
+    4. Text messages {"type": "mute", "microphone": bool, "speaker": bool} and
+       {"type": "stop"} control the session. Closing the connection ends it too; the server
+       closes the connection when the session ends.
+    """
+
+    def __init__(
+        self,
+        server: Optional[VoiceServer] = None,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        lead: float = 0.1,
+        session_options: Optional[dict] = None,
+    ):
+        """
+        Args:
+            server: VoiceServer that runs the sessions. Defaults to one with OpenAI models.
+            host: Interface to listen on. Falls back to the GATEWAY_HOST environment
+                variable (default "0.0.0.0").
+            port: Port to listen on. Falls back to the GATEWAY_PORT environment variable
+                (default 8765); 0 picks a free port.
+            lead: Seconds of response audio sent ahead of real time to absorb network jitter.
+            session_options: Extra VoiceSession arguments for every session, e.g. agent.
+        """
+        self.server = server or VoiceServer()
+        self.host = host or os.getenv("GATEWAY_HOST", "0.0.0.0")
+        self.port = int(os.getenv("GATEWAY_PORT", "8765")) if port is None else port
+        self.lead = lead
+        self.session_options = session_options or {}
+        self._listener = None
+
+    async def __aenter__(self) -> "VoiceGateway":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def start(self) -> None:
+        """Start the VoiceServer and listen for clients."""
+        await self.server.start()
+        # PCM barely compresses, so per-message deflate would only cost CPU
+        self._listener = await serve(self.handle, self.host, self.port, compression=None)
+        self.port = self._listener.sockets[0].getsockname()[1]
+        logger.info("Voice gateway listening", extra={"host": self.host, "port": self.port})
+
+    async def serve_forever(self) -> None:
+        await self._listener.serve_forever()
+
+    async def drain(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop accepting clients, let the sessions in progress finish, then close.
+
+        Args:
+            timeout: Seconds to wait for the sessions before stopping them. None waits
+                as long as they last.
+        """
+        if self._listener is None:
+            return
+        self._listener.close(close_connections=False)
+        logger.info("Draining voice gateway", extra={"sessions": len(self.server.sessions)})
+        try:
+            # Shielded so a timeout doesn't cancel the sessions; aclose() stops them properly
+            await asyncio.wait_for(asyncio.shield(self.server.wait_closed()), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Sessions still running after the drain timeout, stopping them",
+                           extra={"sessions": len(self.server.sessions)})
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Stop accepting clients, end their sessions and close the VoiceServer."""
+        if self._listener is not None:
+            self._listener.close()
+            await self.server.aclose()
+            await self._listener.wait_closed()
+            self._listener = None
+
+    async def handle(self, connection: ServerConnection) -> None:
+        """Run one client's session for as long as the connection is open."""
+        try:
+            hello = json.loads(await asyncio.wait_for(connection.recv(), timeout=10.0))
+        except (asyncio.TimeoutError, ConnectionClosed, ValueError, TypeError):
+            await connection.close(1002, "Expected a start message")
+            return
+        if not isinstance(hello, dict) or hello.get("type") != "start":
+            await connection.close(1002, "Expected a start message")
+            return
+        encoding = hello.get("encoding", WIRE_ENCODING)
+        samplerate = hello.get("samplerate", WIRE_SAMPLERATE)
+        if encoding != WIRE_ENCODING or samplerate != WIRE_SAMPLERATE:
+            await connection.close(1003, f"Only {WIRE_ENCODING} at {WIRE_SAMPLERATE} Hz is supported")
+            return
+
+        transport = WebSocketTransport(connection, lead=self.lead)
+        try:
+            session = self.server.open_session(
+                session_id=hello.get("session_id") or session_from_path(connection.request.path),
+                transport=transport,
+                **self.session_options,
+            )
+        except ValueError as e:
+            await connection.close(1008, str(e))
+            return
+        log_context = bind_log_context(session=session.session_id)
+        logger.info("Client connected", extra={"remote": str(connection.remote_address)})
+        await connection.send(control_message(
+            "ready", session_id=session.session_id, encoding=WIRE_ENCODING, samplerate=WIRE_SAMPLERATE
+        ))
+
+        receiver = asyncio.create_task(self._receive(connection, transport, session))
+        closed = asyncio.create_task(session.wait_closed())
+        try:
+            await asyncio.wait({receiver, closed}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            receiver.cancel()
+            await self.server.close_session(session.session_id)
+            closed.cancel()
+            await connection.close()
+            logger.info("Client disconnected", extra=transport.metrics())
+            log_context.var.reset(log_context)
+
+    async def _receive(self, connection: ServerConnection, transport: WebSocketTransport, session) -> None:
+        try:
+            async for message in connection:
+                if isinstance(message, bytes):
+                    transport.receive(message)
+                    continue
+                try:
+                    control = json.loads(message)
+                except ValueError:
+                    control = None
+                if not isinstance(control, dict):
+                    logger.warning("Ignoring malformed control message")
+                    continue
+                if control.get("type") == "mute":
+                    if "microphone" in control:
+                        session.microphone_muted = bool(control["microphone"])
+                    if "speaker" in control:
+                        session.speaker_muted = bool(control["speaker"])
+                elif control.get("type") == "stop":
+                    session.stop()
+                    return
+        except ConnectionClosed:
+            pass
+
+
+async def main() -> None:
+    async with VoiceGateway() as gateway:
+        await gateway.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,156 @@
+import asyncio
+import os
+from typing import Dict, List, Optional
+
+from agents.voice import OpenAIVoiceModelProvider, TTSModelSettings, VoiceModelProvider
+
+from audio.tts_cache import CachingVoiceModelProvider, get_tts_cache
+from my_agents import Tech_Support_Agent, Ticket_Managment_Agent
+from observability.log import get_logger
+from observability.turn_tracing import install_agents_processor
+from prompts import prompt_token_report
+from tools.http_client import aclose_http_client
+from tools.kb_cache import get_kb_cache
+from tools.kb_prefetch import get_kb_prefetcher
+from tools.ticket_queue import close_ticket_queue, resume_ticket_queue
+from tools.vespa_client import get_vespa_client
+from voice_session import VoiceSession, default_tts_settings
+
+logger = get_logger(__name__)
+
+
+class VoiceServer:
+    """
+    Runs many VoiceSessions concurrently on one event loop, e.g. one per store counter.
+
+    Each session owns its microphone, speaker, workflow, memory and tracer. What is shared
+    belongs to the server and is opened once per process: the STT/TTS model provider and
+    the TTS phrase cache, the knowledge base connection, the ticket queue and the HTTP
+    client. Use it as `async with VoiceServer() as server:` and open sessions with
+    open_session(); leaving the block stops the sessions still running.
+    """
+
+    def __init__(
+        self,
+        model_provider: Optional[VoiceModelProvider] = None,
+        tts_settings: Optional[TTSModelSettings] = None,
+        tts_cache: Optional[bool] = None,
+    ):
+        """
+        Args:
+            model_provider: VoiceModelProvider for STT and TTS shared by the sessions.
+                Defaults to OpenAI.
+            tts_settings: Voice and instructions shared by the sessions.
+            tts_cache: Play the agents' fixed phrases from the TTS phrase cache. Falls back
+                to the TTS_CACHE environment variable (default "true").
+        """
+        model_provider = model_provider or OpenAIVoiceModelProvider()
+        if tts_cache is None:
+            tts_cache = os.getenv("TTS_CACHE", "true").lower() == "true"
+        self.tts_cache = get_tts_cache() if tts_cache else None
+        if self.tts_cache is not None:
+            # Sentences the agents say word for word are played from disk instead of synthesized
+            model_provider = CachingVoiceModelProvider(model_provider, self.tts_cache)
+        self.model_provider = model_provider
+        self.tts_settings = tts_settings or default_tts_settings()
+        self.sessions: Dict[str, VoiceSession] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._warmups: List[asyncio.Task] = []
+        self._started = False
+
+    async def __aenter__(self) -> "VoiceServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def start(self) -> None:
+        """Open the shared resources on the running loop."""
+        if self._started:
+            return
+        self._started = True
+        for prompt_size in prompt_token_report([Tech_Support_Agent, Ticket_Managment_Agent]):
+            logger.info("Agent prompt size", extra=prompt_size)
+        # Per-turn stage timings; the agents SDK reports STT, model, tool and TTS spans to
+        # the tracer each session activates, including from the tasks the pipeline starts
+        install_agents_processor()
+        # Open the knowledge base connection now rather than on the first question
+        if os.getenv("VESPA_URL"):
+            self._warmups.append(asyncio.create_task(get_vespa_client().health_check_async()))
+        # Tickets a previous run confirmed but didn't get into the sheet
+        resume_ticket_queue()
+        # Synthesize the fixed phrases not on disk yet while the first users start talking
+        if self.tts_cache is not None:
+            self._warmups.append(asyncio.create_task(
+                self.model_provider.get_tts_model(None).warm(self.tts_settings)
+            ))
+
+    def open_session(self, session: Optional[VoiceSession] = None, **options) -> VoiceSession:
+        """
+        Start a session on the running loop.
+
+        Args:
+            session: Session to run. Defaults to VoiceSession(**options).
+            **options: VoiceSession arguments, e.g. session_id, input_device or agent.
+
+        Returns:
+            VoiceSession: The running session; use its mute and stop controls.
+        """
+        if not self._started:
+            raise RuntimeError("VoiceServer.start() must be awaited before opening sessions")
+        session = session or VoiceSession(**options)
+        if session.session_id in self.sessions:
+            raise ValueError(f"Session {session.session_id} is already open")
+        session.model_provider = session.model_provider or self.model_provider
+        session.tts_settings = session.tts_settings or self.tts_settings
+        self.sessions[session.session_id] = session
+        task = asyncio.create_task(session.run())
+        task.add_done_callback(lambda _: self._forget(session))
+        self._tasks[session.session_id] = task
+        logger.info("Session opened", extra={"session": session.session_id, "sessions": len(self.sessions)})
+        return session
+
+    def get_session(self, session_id: str) -> VoiceSession:
+        return self.sessions[session_id]
+
+    async def close_session(self, session_id: str) -> None:
+        """Stop a session and wait for it to close its audio streams."""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return
+        session.stop()
+        await session.wait_closed()
+
+    async def wait_closed(self) -> None:
+        """Wait until every open session has ended."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def metrics(self) -> dict:
+        return {"sessions": [session.metrics() for session in self.sessions.values()]}
+
+    async def aclose(self) -> None:
+        """Stop every session, then close the shared resources."""
+        for session in list(self.sessions.values()):
+            session.stop()
+        await self.wait_closed()
+        for warmup in self._warmups:
+            warmup.cancel()
+        self._warmups.clear()
+        if os.getenv("VESPA_URL"):
+            # The async client belongs to this event loop, which ends with the server
+            await get_vespa_client().aclose()
+        if self.tts_cache is not None:
+            logger.info("TTS phrase cache metrics", extra=self.tts_cache.metrics())
+        # Queued tickets are written through the HTTP client, so flush them first
+        await close_ticket_queue()
+        await aclose_http_client()
+        logger.info("Knowledge base cache metrics", extra=get_kb_cache().metrics())
+        logger.info("Knowledge base prefetch metrics", extra=get_kb_prefetcher().metrics())
+        self._started = False
+
+    def _forget(self, session: VoiceSession) -> None:
+        self.sessions.pop(session.session_id, None)
+        self._tasks.pop(session.session_id, None)
+        logger.info("Session closed", extra={"session": session.session_id, "sessions": len(self.sessions)})
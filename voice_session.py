@@ -0,0 +1,784 @@
+import asyncio
+import logging
+import os
+import uuid
+from typing import Callable, Optional
+
+import numpy as np
+from agents.run import Runner
+from agents.voice import (
+    AudioInput,
+    SingleAgentVoiceWorkflow,
+    SingleAgentWorkflowCallbacks,
+    StreamedAudioInput,
+    STTModelSettings,
+    TTSModelSettings,
+    OpenAIVoiceModelProvider,
+    VoiceModelProvider,
+    VoicePipeline,
+    VoicePipelineConfig,
+)
+from agents.voice.workflow import VoiceWorkflowHelper
+
+from audio.backends import AudioTransport, SoundDeviceTransport
+from audio.barge_in import BargeInDetector
+from audio.capture import CaptureService
+from audio.playback import PlaybackEngine
+from audio.ring_buffer import AudioRingBuffer
+from audio.vad import LevelThresholdVAD, create_vad
+from conversation_memory import ConversationMemory
+from my_agents import DOCUMENT_ID, TENANT_ID, Tech_Support_Agent
+from observability.log import SampledLogger, bind_log_context, get_logger
+from observability.turn_tracing import (
+    TurnTracer,
+    current_tracer,
+    log_stage_stats,
+    mark_stage,
+    stage_span,
+)
+from tools.kb_prefetch import get_kb_prefetcher
+
+logger = get_logger(__name__)
+
+
+def get_input_device():
+    """Get the default input device with proper error handling."""
+    # Imported here so the module loads on machines without PortAudio, e.g. when the
+    # conversation is driven by fake streams in benchmarks
+    import sounddevice as sd
+
+    try:
+        devices = sd.query_devices()
+        default_input = sd.default.device[0]  # Get default input device ID
+
+        # If default device is not set, find the first input device
+        if default_input is None:
+            for device in devices:
+                if device['max_input_channels'] > 0:
+                    return device['index']
+            raise RuntimeError("No input devices found")
+
+        return default_input
+    except Exception as e:
+        # List all available devices for debugging
+        logger.error("Error getting input device: %s\nAvailable devices:\n%s", e, sd.query_devices())
+        raise
+
+
+def default_tts_settings() -> TTSModelSettings:
+    return TTSModelSettings(
+        voice="alloy",
+        instructions="Speak in a friendly, conversational tone."
+    )
+
+
+class WorkflowCallbacks(SingleAgentWorkflowCallbacks):
+    def on_run(self, workflow: SingleAgentVoiceWorkflow, transcription: str) -> None:
+        tracer = current_tracer()
+        if tracer is not None:
+            if tracer.current is None:
+                # Streamed input: the turn starts when its transcript arrives
+                tracer.start_turn(input_mode="streamed")
+            tracer.mark("transcript")
+        logger.info("Transcription", extra={"transcription": transcription})
+
+    def on_agent_response(self, workflow: SingleAgentVoiceWorkflow, response: str) -> None:
+        mark_stage("llm_done")
+        logger.info("Agent response", extra={"response": response})
+
+    def on_error(self, workflow: SingleAgentVoiceWorkflow, error: Exception) -> None:
+        logger.error("Error in workflow: %s", error)
+
+
+class StatefulWorkflow(SingleAgentVoiceWorkflow):
+    """Voice workflow that keeps the conversation in a ConversationMemory between turns."""
+
+    def __init__(self, agent, callbacks=None, memory=None):
+        super().__init__(agent, callbacks)
+        self._memory = memory or ConversationMemory()
+        self._prefetch = os.getenv("KB_PREFETCH", "true").lower() == "true"
+
+
+    async def run(self, input_text):
+        # Add user message to history
+        self._memory.add_user(input_text)
+
+        # The agent searches the knowledge base before answering; start that search from
+        # the transcript now so it runs alongside the model call that asks for it
+        if (self._prefetch and TENANT_ID
+                and any(tool.name == "search_knowledge_base" for tool in self._current_agent.tools)):
+            get_kb_prefetcher().prefetch(input_text, tenant_id=TENANT_ID, document_id=DOCUMENT_ID)
+
+        # Call callbacks
+        if self._callbacks and hasattr(self._callbacks, "on_run"):
+            self._callbacks.on_run(self, input_text)
+
+        # The Runner sends the current agent's instructions as the system prompt, so the
+        # input is only the conversation
+        custom_input_history = self._memory.input_items()
+
+        # Run the agent with our custom input history
+        result = Runner.run_streamed(self._current_agent, custom_input_history)
+
+        # Get the full response for state tracking
+        full_response = ""
+
+        # Stream the text from the result
+        async for chunk in VoiceWorkflowHelper.stream_text_from(result):
+            if not full_response:
+                mark_stage("first_token")
+            full_response += chunk
+            yield chunk
+
+
+        # Add the response, with any tool calls and results behind it, to history
+        self._memory.complete_turn([item.to_input_item() for item in result.new_items])
+
+        # Call callbacks
+        if self._callbacks and hasattr(self._callbacks, "on_agent_response"):
+            self._callbacks.on_agent_response(self, full_response)
+
+        # Update the current agent
+        self._current_agent = result.last_agent
+
+
+class VoiceSession:
+    """
+    One voice conversation: its microphone, speaker, workflow, memory and turn tracer.
+
+    Everything a conversation needs lives on the session, so any number of them can run on
+    one event loop, e.g. one per store counter under a VoiceServer. run() opens the audio
+    streams and loops over turns until stop() is called, then closes them.
+
+    stop() and the mute controls only set flags that the session checks at least every
+    0.25 s, so they can be called from any thread.
+    """
+
+    def __init__(
+        self,
+        session_id: Optional[str] = None,
+        agent=None,
+        model_provider: Optional[VoiceModelProvider] = None,
+        tts_settings: Optional[TTSModelSettings] = None,
+        vad_engine: Optional[str] = None,
+        endpoint_timeout: float = 0.3,
+        input_mode: Optional[str] = None,
+        barge_in_enabled: Optional[bool] = None,
+        input_device: Optional[int] = None,
+        transport: Optional[AudioTransport] = None,
+        capture_stream_factory: Optional[Callable] = None,
+        playback_stream_factory: Optional[Callable] = None,
+        tracer: Optional[TurnTracer] = None,
+        memory: Optional[ConversationMemory] = None,
+    ):
+        """
+        Args:
+            session_id: Name used in logs and turn traces. Defaults to a random id.
+            agent: Agent that answers first. Defaults to Tech_Support_Agent.
+            model_provider: VoiceModelProvider for STT and TTS. A VoiceServer supplies its
+                shared one; standalone sessions default to OpenAI.
+            tts_settings: Voice and instructions for TTS.
+            vad_engine: Voice activity detector used for endpointing, "energy_zcr" (default)
+                or "threshold" for the original level detector. Falls back to the
+                VAD_ENGINE environment variable.
+            endpoint_timeout: Seconds of silence after speech that end a turn with "energy_zcr".
+            input_mode: "streamed" (default) sends microphone audio to STT while the user is
+                talking; "buffered" captures the whole utterance first. Falls back to the
+                STT_INPUT_MODE environment variable. If streaming fails, the conversation
+                continues in buffered mode.
+            barge_in_enabled: Let the user interrupt a response by speaking over it. Falls
+                back to the BARGE_IN environment variable (default "true").
+            input_device: Input device index. None uses the system default input.
+            transport: Where the audio comes from and goes to, e.g. a WebSocketTransport
+                for a remote client. Defaults to the local sound card.
+            capture_stream_factory: Replaces the transport's input stream, e.g. with
+                fake_input_stream_factory(...) to run from recorded audio.
+            playback_stream_factory: Replaces the transport's output stream, e.g. with FakeOutputStream.
+            tracer: TurnTracer for per-turn stage timings. Defaults to one exporting to the
+                TURN_TRACE_FILE environment variable.
+            memory: Conversation context kept between turns.
+        """
+        self.session_id = session_id or uuid.uuid4().hex[:8]
+        self.agent = agent or Tech_Support_Agent
+        self.model_provider = model_provider
+        self.tts_settings = tts_settings
+        self.vad_engine = vad_engine or os.getenv("VAD_ENGINE", "energy_zcr")
+        self.endpoint_timeout = endpoint_timeout
+        self.input_mode = input_mode or os.getenv("STT_INPUT_MODE", "streamed")
+        if barge_in_enabled is None:
+            barge_in_enabled = os.getenv("BARGE_IN", "true").lower() == "true"
+        self.barge_in_enabled = barge_in_enabled
+        self.input_device = input_device
+        self.transport = transport or SoundDeviceTransport()
+        self.capture_stream_factory = capture_stream_factory
+        self.playback_stream_factory = playback_stream_factory
+        self.tracer = tracer or TurnTracer(export_path=os.getenv("TURN_TRACE_FILE"), session=self.session_id)
+        # Conversation context kept between turns: recent turns within a token budget, older
+        # ones summarized in the background, the caller's name, store and ticket number pinned
+        self.memory = memory or ConversationMemory()
+
+        self.running = True
+        self.microphone_muted = False
+        self._speaker_muted = False
+        self.capture: Optional[CaptureService] = None
+        self.player: Optional[PlaybackEngine] = None
+        self._capture_buffer: Optional[AudioRingBuffer] = None
+        # The level of every capture block is useful when tuning the VAD but far too much to log
+        self._level_log = SampledLogger(logger, interval=1.0)
+        self._closed = asyncio.Event()
+
+    @property
+    def speaker_muted(self) -> bool:
+        return self._speaker_muted
+
+    @speaker_muted.setter
+    def speaker_muted(self, value: bool) -> None:
+        self._speaker_muted = value
+        # Dropping frames in the playback engine is cheaper than stopping the stream
+        if self.player is not None:
+            self.player.muted = value
+
+    def stop(self) -> None:
+        """Ask the session to end; run() returns once the current step notices."""
+        if self.running:
+            logger.info("Stopping conversation...", extra={"session": self.session_id})
+        self.running = False
+
+    def mute_states(self) -> dict:
+        return {"microphone_muted": self.microphone_muted, "speaker_muted": self.speaker_muted}
+
+    async def wait_closed(self) -> None:
+        """Wait until run() has finished and the audio streams are closed."""
+        await self._closed.wait()
+
+    def metrics(self) -> dict:
+        return {
+            "session": self.session_id,
+            "running": self.running,
+            "turns": len(self.tracer.turns),
+            "capture_overruns": self.capture.overruns if self.capture else None,
+            "playback": self.player.metrics() if self.player else None,
+            "memory": self.memory.metrics(),
+        }
+
+    async def run(self) -> None:
+        """Run the conversation until stop() is called."""
+        log_context = bind_log_context(session=self.session_id)
+        tracer_context = self.tracer.activate()
+        logger.info("Starting continuous voice conversation...")
+
+        workflow = StatefulWorkflow(self.agent, callbacks=WorkflowCallbacks(), memory=self.memory)
+        pipeline = VoicePipeline(
+            workflow=workflow,
+            config=VoicePipelineConfig(
+                model_provider=self.model_provider or OpenAIVoiceModelProvider(),
+                tts_settings=self.tts_settings or default_tts_settings(),
+                stt_settings=STTModelSettings(
+                    language="en",
+                    # Only used by streamed input: end the turn after a short pause
+                    turn_detection={
+                        "type": "server_vad",
+                        "silence_duration_ms": int(self.endpoint_timeout * 1000),
+                        "prefix_padding_ms": 300,
+                    },
+                )
+            )
+        )
+
+        try:
+            # One audio player for the entire conversation. Responses are queued into its
+            # jitter buffer and played from the output callback, so the event loop never
+            # blocks on the sound card
+            self.player = PlaybackEngine(
+                samplerate=24000,
+                stream_factory=self.playback_stream_factory or self.transport.output_stream,
+            )
+            self.player.muted = self.speaker_muted
+            self.player.start()
+
+            # Keep one microphone stream open for the whole session; blocks arrive from the
+            # PortAudio callback and are consumed by capture_audio_until_silence on this loop
+            device = self.input_device
+            if (device is None and self.capture_stream_factory is None
+                    and isinstance(self.transport, SoundDeviceTransport)):
+                import sounddevice as sd
+                device = get_input_device()
+                logger.info("Using input device", extra={"device": sd.query_devices(device)['name']})
+            self.capture = CaptureService(samplerate=24000, block_size=1024, device=device,
+                                          stream_factory=self.capture_stream_factory or self.transport.input_stream)
+            self.capture.start()
+
+            if self.vad_engine == "energy_zcr":
+                vad = create_vad(self.vad_engine, samplerate=24000, endpoint_timeout=self.endpoint_timeout)
+            else:
+                vad = create_vad(self.vad_engine, samplerate=24000, block_size=1024, silence_duration=1.0)
+            logger.info("Using voice activity detection", extra={"vad_engine": self.vad_engine})
+
+            barge_in = BargeInDetector(samplerate=24000) if self.barge_in_enabled else None
+
+            if self.input_mode == "streamed":
+                try:
+                    await self.run_streamed_conversation(pipeline, barge_in=barge_in)
+                except Exception as e:
+                    logger.warning("Streaming transcription failed, falling back to buffered "
+                                   "audio capture: %s", e)
+
+            await self.run_buffered_conversation(pipeline, vad, barge_in=barge_in)
+        except KeyboardInterrupt:
+            logger.info("Exiting voice conversation...")
+        except Exception as e:
+            logger.exception("Error in voice conversation: %s", e)
+        finally:
+            self.running = False
+            # Clean up resources. Closing a stream joins its audio thread, which would stall
+            # the other sessions on this loop, so it happens on a worker thread
+            if self.capture:
+                try:
+                    await asyncio.to_thread(self.capture.close)
+                    self.capture = None
+                except Exception:
+                    pass
+            if self.player:
+                try:
+                    logger.info("Playback metrics", extra=self.player.metrics())
+                    await asyncio.to_thread(self.player.close)
+                    self.player = None
+                except Exception:
+                    pass
+            await self.memory.aclose()
+            logger.info("Conversation memory metrics", extra=self.memory.metrics())
+            log_stage_stats(self.tracer.close())
+            logger.info("Conversation ended")
+            self._closed.set()
+            tracer_context.var.reset(tracer_context)
+            log_context.var.reset(log_context)
+
+    async def run_buffered_conversation(self, pipeline, vad, barge_in=None):
+        """
+        Run the conversation one captured utterance at a time.
+
+        Args:
+            pipeline: VoicePipeline wrapping the StatefulWorkflow.
+            vad: VoiceActivityDetector that ends each utterance.
+            barge_in: Optional BargeInDetector that lets the user interrupt responses.
+        """
+        tracer = self.tracer
+        preroll = None
+        while self.running:
+            logger.info("New conversation turn")
+            tracer.start_turn(input_mode="buffered")
+
+            # Capture audio until silence is detected
+            audio_data = await self.capture_audio_until_silence(vad=vad, preroll=preroll)
+            preroll = None
+
+            # Check if conversation was stopped during audio capture
+            if not self.running:
+                logger.info("Conversation stopped during audio capture")
+                break
+
+            if audio_data is None:
+                tracer.discard_turn()
+                logger.warning("Failed to capture audio. Please check your microphone.")
+                await asyncio.sleep(1)
+                continue
+
+            # Check if audio has actual content
+            audio_level = np.abs(audio_data).mean()
+            logger.debug("Audio level", extra={"level": float(audio_level)})
+
+            if audio_level < 5:
+                tracer.discard_turn()
+                logger.info("No significant audio detected. Please speak louder or check your microphone.")
+                continue
+
+            logger.info("Running pipeline with existing workflow...")
+
+            # Create audio input from captured audio
+            audio_input = AudioInput(buffer=audio_data)
+
+            # Run the pipeline with the new audio input
+            result = await pipeline.run(audio_input)
+            logger.info("Processing response...")
+            if barge_in:
+                # Keep listening while the response plays so the user can interrupt it
+                barge_in.reset()
+                barge_in_triggered = asyncio.Event()
+                monitor = asyncio.create_task(self.monitor_barge_in(barge_in, barge_in_triggered))
+                try:
+                    if await self.play_response_events(result, barge_in=barge_in,
+                                                       barge_in_triggered=barge_in_triggered):
+                        preroll = barge_in.preroll()
+                finally:
+                    monitor.cancel()
+            else:
+                await self.play_response_events(result)
+            tracer.end_turn()
+
+    async def capture_audio_until_silence(self, silence_duration=1.0, samplerate=24000, vad=None, preroll=None):
+        """
+        Capture audio until the voice activity detector reports the end of the utterance.
+
+        Args:
+            silence_duration: Seconds of silence that end the utterance when no `vad` is given.
+            samplerate: Sample rate of the capture stream.
+            vad: VoiceActivityDetector used for endpointing. Defaults to the original
+                level-threshold detector with `silence_duration`.
+            preroll: float32 audio that already belongs to this utterance, e.g. the words that
+                interrupted the previous response. Queued blocks are kept instead of drained.
+        """
+        capture_service = self.capture
+        try:
+            # Check if conversation is still running before starting
+            if not self.running:
+                logger.info("Conversation is not running, skipping audio capture")
+                return None
+
+            # If microphone is muted, return None
+            if self.microphone_muted:
+                logger.info("Microphone is muted, skipping audio capture")
+                return None
+
+            if capture_service is None or not capture_service.active:
+                logger.warning("Capture service is not running, skipping audio capture")
+                return None
+
+            block_size = capture_service.block_size
+
+            if vad is None:
+                vad = LevelThresholdVAD(samplerate=samplerate, block_size=block_size,
+                                        silence_duration=silence_duration)
+            vad.reset()
+
+            # Set a timeout for the entire recording (30 seconds)
+            max_iterations = int(30 * samplerate / block_size)
+
+            # Reuse one preallocated int16 buffer across turns; it holds the full 30 seconds
+            # so it never wraps within a turn
+            capacity = max_iterations * block_size
+            if self._capture_buffer is None or self._capture_buffer.capacity != capacity:
+                self._capture_buffer = AudioRingBuffer(capacity, block_size=block_size)
+            self._capture_buffer.clear()
+            audio_buffer = self._capture_buffer
+
+            logger.info("Listening... (speak now)", extra={"vad": type(vad).__name__})
+
+            if preroll is not None and len(preroll):
+                # The user barged in: start from the interrupting speech and keep every block
+                # queued since then
+                vad.process(preroll)
+                audio_buffer.write(preroll)
+            else:
+                # The input stream stays open between turns; drop whatever was queued while the
+                # bot was speaking so this turn starts from fresh audio
+                capture_service.drain()
+            mark_stage("listen_start")
+
+            # Main recording loop
+            blocks_read = 0
+            while blocks_read < max_iterations:
+                # Check if conversation is still running or if microphone was muted during recording
+                if not self.running or self.microphone_muted:
+                    logger.info("Conversation stopped or microphone muted, ending audio capture")
+                    break
+
+                # Wait for the next block from the capture callback without blocking the event loop.
+                # The short timeout lets us notice stop/mute requests while the room is silent.
+                flat_data = await capture_service.read_block(timeout=0.25)
+                if flat_data is None:
+                    if not capture_service.active:
+                        logger.warning("Capture stream closed, ending audio capture")
+                        break
+                    continue
+                blocks_read += 1
+
+                decision = vad.process(flat_data)
+                if decision.is_speech and vad.speech_detected:
+                    mark_stage("speech_detected")
+                if not decision.keep_audio:
+                    continue
+
+                if decision.gated:
+                    # Add zeros instead to maintain timing
+                    audio_buffer.write_silence(len(flat_data))
+                else:
+                    audio_buffer.write(flat_data)
+
+                # Sampled so the per-block level costs nothing unless DEBUG is on
+                self._level_log.log("Current audio level", level=round(decision.level, 6))
+
+                # Stop once speech was heard and the detector saw the end of the utterance
+                if decision.endpoint:
+                    mark_stage("endpoint")
+                    logger.info("Detected end of speech, stopping...")
+                    break
+
+            if capture_service.overruns:
+                logger.warning("Capture queue overruns", extra={"overruns": capture_service.overruns})
+
+            # Check if we timed out without detecting speech
+            if not vad.speech_detected:
+                logger.info("Timeout reached - no speech detected")
+                return None
+
+            # Check if we have any audio data
+            if len(audio_buffer) == 0:
+                logger.info("No audio data captured")
+                return None
+
+            # Samples were scaled to int16 as they were written, so this is a view, not a copy
+            audio_data = audio_buffer.view()
+
+            logger.info("Finished recording", extra={"samples": len(audio_data)})
+            return audio_data
+
+        except Exception as e:
+            logger.exception("Error in audio capture: %s", e)
+            return None
+
+    def flush_player(self):
+        """Discard audio already queued for playback."""
+        if self.player is None:
+            return
+        dropped = self.player.flush()
+        logger.info("Dropped queued audio", extra={"seconds": round(dropped / self.player.samplerate, 2)})
+
+    async def monitor_barge_in(self, detector, triggered):
+        """
+        Listen to the microphone while a response plays and set `triggered` on barge-in.
+
+        Args:
+            detector: BargeInDetector fed with playback and microphone audio.
+            triggered: asyncio.Event to set when the user starts speaking.
+        """
+        capture_service = self.capture
+        capture_service.drain()
+        while self.running and capture_service.active:
+            block = await capture_service.read_block(timeout=0.25)
+            if block is None or self.microphone_muted:
+                continue
+            if detector.process(block):
+                mark_stage("barge_in")
+                logger.info("Barge-in detected, interrupting response")
+                triggered.set()
+                return
+
+    async def play_response_events(self, result, on_turn_started=None, on_turn_ended=None,
+                                   barge_in=None, barge_in_triggered=None, end_on_barge_in=True):
+        """
+        Play TTS audio and log response text from a pipeline result until the session ends.
+
+        Args:
+            result: StreamedAudioResult returned by VoicePipeline.run.
+            on_turn_started: Optional callable invoked when the pipeline starts speaking a turn.
+            on_turn_ended: Optional callable invoked with the turn's response text when it ends.
+            barge_in: Optional BargeInDetector that is told about every block played.
+            barge_in_triggered: asyncio.Event set by whoever watches the microphone when the
+                user interrupts.
+            end_on_barge_in: Stop consuming the result on barge-in (single-turn input). When
+                False (streamed input) the rest of the current turn is skipped instead.
+
+        Returns:
+            bool: True if playback was interrupted by the user.
+        """
+        player = self.player
+        response_text = ""
+        interrupted = False
+        skip_turn_audio = False
+        events = result.stream()
+        barge_in_wait = (
+            asyncio.ensure_future(barge_in_triggered.wait()) if barge_in_triggered else None
+        )
+        # Checked once per response: per-event debug records cost nothing when DEBUG is off
+        debug = logger.isEnabledFor(logging.DEBUG)
+
+        async def playback_finished():
+            """Wait for queued audio to play out. Returns False if the user barged in first."""
+            drained = asyncio.ensure_future(player.wait_drained())
+            if barge_in_wait is None or barge_in_wait.done():
+                await drained
+                return True
+            await asyncio.wait({drained, barge_in_wait}, return_when=asyncio.FIRST_COMPLETED)
+            if drained.done():
+                return True
+            drained.cancel()
+            return False
+
+        try:
+            while True:
+                next_event = asyncio.ensure_future(events.__anext__())
+                if barge_in_wait is not None:
+                    # Wake up on barge-in even while waiting for the model or TTS
+                    await asyncio.wait({next_event, barge_in_wait}, return_when=asyncio.FIRST_COMPLETED)
+                    if barge_in_wait.done() and not skip_turn_audio:
+                        interrupted = True
+                        self.flush_player()
+                        if end_on_barge_in:
+                            next_event.cancel()
+                            try:
+                                await next_event
+                            except (asyncio.CancelledError, StopAsyncIteration):
+                                pass
+                            break
+                        skip_turn_audio = True
+                try:
+                    event = await next_event
+                except StopAsyncIteration:
+                    break
+
+                # Check if conversation was stopped during response
+                if not self.running:
+                    logger.info("Conversation stopped during response")
+                    break
+
+                if event.type == "voice_stream_event_audio":
+                    mark_stage("first_audio")
+                    if not skip_turn_audio:
+                        # Queues the audio and returns right away; the output callback plays it
+                        play_at = await player.write(event.data)
+                        if barge_in is not None and play_at is not None:
+                            barge_in.note_playback(event.data, now=play_at)
+                    if debug:
+                        logger.debug("Audio event", extra={"shape": getattr(event.data, "shape", None)})
+                elif event.type == "raw_response_event" and event.data.type == "response.output_text.delta":
+                    # Collect the response text
+                    response_text += event.data.delta
+                    if debug:
+                        logger.debug("Text delta", extra={"delta": event.data.delta})
+                elif event.type == "voice_stream_event_lifecycle":
+                    if debug:
+                        logger.debug("Lifecycle event", extra={"lifecycle": event.event})
+                    if event.event == "turn_started" and on_turn_started:
+                        on_turn_started()
+                    elif event.event == "turn_ended":
+                        # The turn's audio is queued, not yet heard; keep listening for
+                        # barge-in until it has played out
+                        finished = True
+                        if not skip_turn_audio:
+                            with stage_span("playback_drain"):
+                                finished = await playback_finished()
+                            if finished:
+                                mark_stage("drained")
+                        if not finished:
+                            interrupted = True
+                            self.flush_player()
+                            if end_on_barge_in:
+                                break
+                            skip_turn_audio = True
+                        if on_turn_ended:
+                            on_turn_ended(response_text)
+                        response_text = ""
+                        if skip_turn_audio:
+                            # The interrupted turn is over; arm barge-in again for the next one
+                            skip_turn_audio = False
+                            barge_in_triggered.clear()
+                            barge_in_wait = asyncio.ensure_future(barge_in_triggered.wait())
+                    elif event.event == "session_ended":
+                        if response_text:
+                            logger.info("Complete response", extra={"response": response_text})
+                        logger.info("Session ended, ready for next turn...")
+                        break
+                elif event.type == "voice_stream_event_error":
+                    raise event.error
+                else:
+                    if debug:
+                        logger.debug("Unknown event", extra={"event_type": getattr(event, "type", None)})
+        finally:
+            if barge_in_wait is not None:
+                barge_in_wait.cancel()
+            # Closing the generator cancels any TTS still being synthesized for an interrupted turn
+            await events.aclose()
+
+        return interrupted
+
+    async def stream_microphone(self, streamed_input, bot_speaking, barge_in=None, barge_in_triggered=None):
+        """
+        Forward capture blocks to a StreamedAudioInput as they arrive.
+
+        Blocks are dropped while the microphone is muted or while the bot is speaking, so the
+        transcription session's turn detection doesn't hear the bot's own voice. With a
+        BargeInDetector, speech over the bot ends that: the interrupting audio is sent on and
+        `barge_in_triggered` is set. When the conversation stops, None is pushed to end the
+        transcription session.
+
+        Args:
+            streamed_input: StreamedAudioInput feeding the pipeline.
+            bot_speaking: asyncio.Event set while a response is being played.
+            barge_in: Optional BargeInDetector.
+            barge_in_triggered: asyncio.Event set on barge-in.
+        """
+        capture_service = self.capture
+        try:
+            capture_service.drain()
+            while self.running and capture_service.active:
+                block = await capture_service.read_block(timeout=0.25)
+                if block is None or self.microphone_muted:
+                    continue
+                if bot_speaking.is_set():
+                    if barge_in is None or not barge_in.process(block):
+                        continue
+                    mark_stage("barge_in")
+                    logger.info("Barge-in detected, interrupting response")
+                    bot_speaking.clear()
+                    barge_in_triggered.set()
+                    # Send the words that triggered the barge-in, not just what follows
+                    await streamed_input.add_audio((barge_in.preroll() * 32767).astype(np.int16))
+                    continue
+                # The block is reused by the capture service, so hand the pipeline its own copy
+                await streamed_input.add_audio((block * 32767).astype(np.int16))
+        finally:
+            await streamed_input.add_audio(None)
+
+    async def run_streamed_conversation(self, pipeline, barge_in=None):
+        """
+        Run the conversation with one streamed transcription session.
+
+        Microphone blocks are sent to STT while the user is still talking and the transcription
+        session detects the end of each turn, so the workflow gets the transcript shortly after
+        the user stops speaking instead of after a full capture/upload/transcribe cycle.
+
+        Args:
+            pipeline: VoicePipeline wrapping the StatefulWorkflow.
+            barge_in: Optional BargeInDetector that lets the user interrupt responses.
+        """
+        streamed_input = StreamedAudioInput()
+        bot_speaking = asyncio.Event()
+        barge_in_triggered = asyncio.Event() if barge_in else None
+
+        def on_turn_started():
+            if barge_in:
+                barge_in.reset()
+            bot_speaking.set()
+
+        def on_turn_ended(response_text):
+            if response_text:
+                logger.info("Complete response", extra={"response": response_text})
+            if bot_speaking.is_set():
+                # Anything captured while the bot was talking belongs to the bot, not the user
+                self.capture.drain()
+                bot_speaking.clear()
+            tracer = current_tracer()
+            if tracer is not None:
+                tracer.end_turn()
+            logger.info("Turn ended, listening...")
+
+        logger.info("Streaming microphone audio into transcription...")
+        pump = asyncio.create_task(
+            self.stream_microphone(streamed_input, bot_speaking, barge_in, barge_in_triggered)
+        )
+        try:
+            result = await pipeline.run(streamed_input)
+            await self.play_response_events(
+                result,
+                on_turn_started=on_turn_started,
+                on_turn_ended=on_turn_ended,
+                barge_in=barge_in,
+                barge_in_triggered=barge_in_triggered,
+                end_on_barge_in=False,
+            )
+        finally:
+            pump.cancel()
+            try:
+                await pump
+            except asyncio.CancelledError:
+                pass